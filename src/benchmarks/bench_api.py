@@ -0,0 +1,86 @@
+"""
+In-process load generator for the FastAPI app in main.py.
+
+Requests go through httpx's ASGI transport straight into the app, so the numbers
+cover routing, validation, serialization and the service, but no network. For
+each dataset size, main.py is (re)loaded on a seeded temporary data file and a
+fixed number of requests per scenario is sent by `concurrency` concurrent clients.
+
+Needs httpx (already required by fastapi.testclient).
+
+Usage (from src/): python -m benchmarks.bench_api [--sizes 1000,10000] [--requests 500] [--concurrency 16]
+"""
+import argparse
+import asyncio
+import importlib
+import os
+import tempfile
+import time
+from typing import Callable, Iterator, List, Tuple
+
+import httpx
+
+from .bench_service import parse_sizes, seed_store
+from .harness import BenchResult, print_results
+
+# (http method, url) pairs for the i-th request of a scenario.
+Scenario = Callable[[int, int], Tuple[str, str]]
+
+SCENARIOS: List[Tuple[str, Scenario]] = [
+    ("api.create", lambda i, size: ("POST", f"/payments/load{i:08d}?amount=10&payment_method=paypal")),
+    ("api.pay", lambda i, size: ("POST", f"/payments/p{(2 * i) % size:08d}/pay")),
+    ("api.list_page", lambda i, size: ("GET", f"/payments?status=REGISTRADO&limit=100&cursor=p{(i * 97) % size:08d}")),
+]
+
+
+async def _drive(client: httpx.AsyncClient, requests: Iterator[Tuple[str, str]], latencies: List[float]) -> None:
+    for method, url in requests:
+        t0 = time.perf_counter()
+        response = await client.request(method, url)
+        latencies.append(time.perf_counter() - t0)
+        if response.status_code >= 500:
+            raise RuntimeError(f"{method} {url} -> {response.status_code}: {response.text}")
+
+
+async def load(app, name: str, size: int, scenario: Scenario, n_requests: int, concurrency: int) -> BenchResult:
+    """Send n_requests built by scenario with concurrency concurrent clients."""
+    requests = (scenario(i, size) for i in range(n_requests))
+    latencies: List[float] = []
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        start = time.perf_counter()
+        await asyncio.gather(*(_drive(client, requests, latencies) for _ in range(concurrency)))
+        seconds = time.perf_counter() - start
+    return BenchResult.from_latencies(name, size, latencies, seconds)
+
+
+async def _bench_size(size: int, storage_kind: str, n_requests: int, concurrency: int) -> List[BenchResult]:
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, {"sqlite": "payments.db", "binary": "payments.bin"}.get(storage_kind, "payments.json"))
+        seed_store(storage_kind, path, size)
+        os.environ["PAYMENTS_STORAGE"] = storage_kind
+        os.environ["PAYMENTS_DATA_PATH"] = path
+        import main
+        main = importlib.reload(main)
+        try:
+            return [await load(main.app, name, size, scenario, min(n_requests, size // 2), concurrency)
+                    for name, scenario in SCENARIOS]
+        finally:
+            await main.async_payment_service.close()
+
+
+def run(sizes: List[int], storage_kind: str = "json", n_requests: int = 500, concurrency: int = 16) -> List[BenchResult]:
+    results: List[BenchResult] = []
+    for size in sizes:
+        results.extend(asyncio.run(_bench_size(size, storage_kind, n_requests, concurrency)))
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--sizes", type=parse_sizes, default=[1000, 10000, 100000])
+    parser.add_argument("--storage", choices=["json", "wal", "binary", "sqlite"], default="json")
+    parser.add_argument("--requests", type=int, default=500)
+    parser.add_argument("--concurrency", type=int, default=16)
+    args = parser.parse_args()
+    print_results(run(args.sizes, args.storage, args.requests, args.concurrency))
@@ -0,0 +1,71 @@
+"""
+Compares the in-memory representation used by the JSON/WAL storage backends:
+pydantic Payment objects (before) vs CompactPayment records (after).
+
+Reports bytes per payment held in memory and the throughput of serializing the
+whole store the way JsonFilePaymentStorage does on every save.
+
+Usage (from src/): python -m benchmarks.bench_compact_store [n_payments]
+"""
+import json
+import sys
+import time
+import tracemalloc
+
+from payments import Payment, PaymentMethod, PaymentStatus
+from payments.storage.base_payment_storage import payment_to_record
+from payments.storage.compact_payment import CompactPayment
+
+_METHODS = list(PaymentMethod)
+_STATUSES = list(PaymentStatus)
+
+
+def _build_payments(n):
+    return [
+        Payment(payment_id=f"{i:08d}", amount=float(i % 10000) + 0.5,
+                payment_method=_METHODS[i % len(_METHODS)], status=_STATUSES[i % len(_STATUSES)])
+        for i in range(n)
+    ]
+
+
+def _bytes_per_payment(build, n):
+    ids = [f"{i:08d}" for i in range(n)]  # ids are shared by both layouts, keep them out of the measure
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    store = build(ids)
+    after = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return (after - before) / n, store
+
+
+def _save_seconds(store, to_record):
+    start = time.perf_counter()
+    data = {pid: to_record(p) for pid, p in store.items()}
+    json.dumps(data, indent=4, ensure_ascii=False)
+    return time.perf_counter() - start
+
+
+def main(n):
+    template = _build_payments(n)
+
+    def build_pydantic(ids):
+        return {pid: Payment(payment_id=pid, amount=p.amount, payment_method=p.payment_method, status=p.status)
+                for pid, p in zip(ids, template)}
+
+    def build_compact(ids):
+        return {pid: CompactPayment(pid, p.amount, i % len(_METHODS), i % len(_STATUSES))
+                for i, (pid, p) in enumerate(zip(ids, template))}
+
+    pydantic_bytes, pydantic_store = _bytes_per_payment(build_pydantic, n)
+    compact_bytes, compact_store = _bytes_per_payment(build_compact, n)
+    pydantic_save = _save_seconds(pydantic_store, payment_to_record)
+    compact_save = _save_seconds(compact_store, CompactPayment.to_record)
+
+    print(f"payments: {n}")
+    print(f"{'layout':<10} {'bytes/payment':>14} {'save (s)':>10} {'payments/s':>12}")
+    print(f"{'pydantic':<10} {pydantic_bytes:>14.0f} {pydantic_save:>10.3f} {n / pydantic_save:>12.0f}")
+    print(f"{'compact':<10} {compact_bytes:>14.0f} {compact_save:>10.3f} {n / compact_save:>12.0f}")
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 100_000)
@@ -0,0 +1,106 @@
+"""
+Microbenchmarks for PaymentService and the validation strategies.
+
+For each dataset size the store is seeded with that many payments (one bulk
+write), then the benchmarks time service startup, single writes, paginated
+reads, bulk pay, and per-payment vs batch validation.
+
+The json backend rewrites the whole file on every write, so single-write
+benchmarks at 1M payments take seconds per operation; use --storage wal or
+sqlite, or a small --ops, for the largest sizes.
+
+Usage (from src/): python -m benchmarks.bench_service [--sizes 1000,10000] [--storage json] [--ops 200]
+See benchmarks.run for saving and comparing baselines.
+"""
+import argparse
+import os
+import tempfile
+from typing import List
+
+from payments import Payment, PaymentFilter, PaymentMethod, PaymentService, PaymentStatus, PaymentStatusCounts
+from payments.storage import create_payment_storage
+from payments.validation_strategies import CreditCardValidationStrategy, PayPalValidationStrategy
+from .harness import BenchResult, measure, measure_bulk, print_results
+
+_METHODS = list(PaymentMethod)
+BULK_PAY_SIZE = 1000
+
+
+def build_payments(n: int, prefix: str = "p") -> List[Payment]:
+    """n REGISTRADO payments with ids in sorted order and amounts spread under the limits."""
+    return [
+        Payment(payment_id=f"{prefix}{i:08d}", amount=float(i % 12000) + 0.5,
+                payment_method=_METHODS[i % len(_METHODS)], status=PaymentStatus.REGISTRADO)
+        for i in range(n)
+    ]
+
+
+def seed_store(storage_kind: str, path: str, n: int) -> None:
+    storage = create_payment_storage(storage_kind, path)
+    storage.save_many(build_payments(n))
+    storage.close()
+
+
+def bench_service(size: int, storage_kind: str = "json", ops: int = 200) -> List[BenchResult]:
+    results: List[BenchResult] = []
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, {"sqlite": "payments.db", "binary": "payments.bin"}.get(storage_kind, "payments.json"))
+        seed_store(storage_kind, path, size)
+
+        holder = {}
+        def start():
+            holder["svc"] = PaymentService(storage=create_payment_storage(storage_kind, path))
+            return holder["svc"].status_counts
+        results.append(measure_bulk("service.startup", size, start, size))
+        svc: PaymentService = holder["svc"]
+
+        new_ids = iter(f"n{i:08d}" for i in range(ops))
+        results.append(measure("service.create_payment", size,
+                               lambda: svc.create_payment(next(new_ids), 10.0, PaymentMethod.PAYPAL), ops))
+
+        pay_ids = iter(f"p{i:08d}" for i in range(0, size, 2))
+        results.append(measure("service.pay_payment", size, lambda: svc.pay_payment(next(pay_ids)),
+                               min(ops, size // 2)))
+
+        page_filter = PaymentFilter(status=PaymentStatus.REGISTRADO)
+        cursors = iter(f"p{i:08d}" for i in range(0, size, max(1, size // ops)))
+        results.append(measure("service.list_payments", size,
+                               lambda: svc.list_payments(page_filter, next(cursors, None), 100), ops))
+
+        batch = [f"p{i:08d}" for i in range(1, size, 2)][:BULK_PAY_SIZE]
+        results.append(measure_bulk("service.pay_payments", size, lambda: svc.pay_payments(batch), len(batch)))
+        svc.close()
+    return results
+
+
+def bench_strategies(size: int) -> List[BenchResult]:
+    payments = build_payments(size)
+    counts = PaymentStatusCounts.from_payments(payments)
+    results: List[BenchResult] = []
+    for name, strategy in (("paypal", PayPalValidationStrategy()), ("credit_card", CreditCardValidationStrategy())):
+        results.append(measure_bulk(f"strategy.{name}.validate", size,
+                                    lambda: [strategy.validate(p, counts) for p in payments], size))
+        results.append(measure_bulk(f"strategy.{name}.validate_batch", size,
+                                    lambda: strategy.validate_batch(payments, counts), size))
+    return results
+
+
+def run(sizes: List[int], storage_kind: str = "json", ops: int = 200) -> List[BenchResult]:
+    results: List[BenchResult] = []
+    for size in sizes:
+        results.extend(bench_strategies(size))
+        results.extend(bench_service(size, storage_kind, ops))
+    return results
+
+
+def parse_sizes(raw: str) -> List[int]:
+    return [int(s) for s in raw.split(",") if s]
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--sizes", type=parse_sizes, default=[1000, 10000, 100000])
+    parser.add_argument("--storage", choices=["json", "wal", "binary", "sqlite"], default="json")
+    parser.add_argument("--ops", type=int, default=200)
+    args = parser.parse_args()
+    print_results(run(args.sizes, args.storage, args.ops))
@@ -0,0 +1,113 @@
+"""
+Shared pieces of the benchmark suite: timing, result records, and saving and
+comparing baselines.
+
+A baseline is a JSON file {"<name>@<size>": {"ops_per_sec", "p50_ms", "p99_ms"}}.
+compare() flags a result as a regression when its throughput dropped, or its p99
+latency grew, by more than the given tolerance relative to the baseline.
+"""
+import json
+import time
+from dataclasses import asdict, dataclass
+from typing import Callable, Dict, Iterable, List, Optional, Sequence
+
+
+@dataclass
+class BenchResult:
+    name: str
+    size: int
+    ops: int
+    seconds: float
+    p50_ms: float
+    p99_ms: float
+
+    @property
+    def key(self) -> str:
+        return f"{self.name}@{self.size}"
+
+    @property
+    def ops_per_sec(self) -> float:
+        return self.ops / self.seconds if self.seconds > 0 else float("inf")
+
+    @classmethod
+    def from_latencies(cls, name: str, size: int, latencies: Sequence[float], seconds: Optional[float] = None,
+                       ops: Optional[int] = None) -> "BenchResult":
+        """Build a result from per-operation latencies in seconds (wall time defaults to their sum)."""
+        return cls(
+            name=name,
+            size=size,
+            ops=len(latencies) if ops is None else ops,
+            seconds=sum(latencies) if seconds is None else seconds,
+            p50_ms=percentile(latencies, 50) * 1000,
+            p99_ms=percentile(latencies, 99) * 1000,
+        )
+
+
+@dataclass
+class Regression:
+    key: str
+    metric: str
+    baseline: float
+    current: float
+
+    def __str__(self) -> str:
+        return f"{self.key}: {self.metric} {self.baseline:.3f} -> {self.current:.3f}"
+
+
+def percentile(values: Sequence[float], pct: float) -> float:
+    """Nearest-rank percentile; 0.0 for no values."""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    rank = max(1, -(-len(ordered) * pct // 100))
+    return ordered[int(rank) - 1]
+
+
+def measure(name: str, size: int, operation: Callable[[], object], ops: int) -> BenchResult:
+    """Call operation ops times, timing each call."""
+    latencies: List[float] = []
+    start = time.perf_counter()
+    for _ in range(ops):
+        t0 = time.perf_counter()
+        operation()
+        latencies.append(time.perf_counter() - t0)
+    return BenchResult.from_latencies(name, size, latencies, time.perf_counter() - start)
+
+
+def measure_bulk(name: str, size: int, operation: Callable[[], object], items: int) -> BenchResult:
+    """Time one call processing items items; latency percentiles are per call."""
+    start = time.perf_counter()
+    operation()
+    seconds = time.perf_counter() - start
+    return BenchResult.from_latencies(name, size, [seconds], seconds, ops=items)
+
+
+def print_results(results: Iterable[BenchResult]) -> None:
+    print(f"{'benchmark':<36} {'size':>9} {'ops':>8} {'ops/s':>12} {'p50 ms':>9} {'p99 ms':>9}")
+    for r in results:
+        print(f"{r.name:<36} {r.size:>9} {r.ops:>8} {r.ops_per_sec:>12.0f} {r.p50_ms:>9.3f} {r.p99_ms:>9.3f}")
+
+
+def save_baseline(results: Iterable[BenchResult], path: str) -> None:
+    data = {r.key: {**asdict(r), "ops_per_sec": r.ops_per_sec} for r in results}
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(data, f, indent=4)
+
+
+def load_baseline(path: str) -> Dict[str, dict]:
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def compare(results: Iterable[BenchResult], baseline: Dict[str, dict], tolerance: float = 0.2) -> List[Regression]:
+    """Return the regressions of results against a baseline; benchmarks missing from it are skipped."""
+    regressions = []
+    for r in results:
+        base = baseline.get(r.key)
+        if base is None:
+            continue
+        if r.ops_per_sec < base["ops_per_sec"] * (1 - tolerance):
+            regressions.append(Regression(r.key, "ops_per_sec", base["ops_per_sec"], r.ops_per_sec))
+        if r.p99_ms > base["p99_ms"] * (1 + tolerance):
+            regressions.append(Regression(r.key, "p99_ms", base["p99_ms"], r.p99_ms))
+    return regressions
@@ -0,0 +1,54 @@
+"""
+Runs the service/strategy microbenchmarks and the API load test, optionally
+saving the results as a baseline or comparing them against one.
+
+Usage (from src/):
+    python -m benchmarks.run --sizes 1000,10000,100000 --save baseline.json
+    python -m benchmarks.run --sizes 1000,10000,100000 --compare baseline.json [--tolerance 0.2]
+
+Exits with status 1 when --compare finds a regression (throughput down, or p99
+latency up, by more than the tolerance). Timings are noisy on shared machines:
+compare runs made on the same host, and prefer several ops per benchmark.
+"""
+import argparse
+import sys
+
+from . import bench_api, bench_service
+from .bench_service import parse_sizes
+from .harness import compare, load_baseline, print_results, save_baseline
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Payments benchmark suite")
+    parser.add_argument("--sizes", type=parse_sizes, default=[1000, 10000, 100000],
+                        help="comma-separated dataset sizes (up to 1000000)")
+    parser.add_argument("--storage", choices=["json", "wal", "binary", "sqlite"], default="json")
+    parser.add_argument("--ops", type=int, default=200, help="operations per service microbenchmark")
+    parser.add_argument("--requests", type=int, default=500, help="requests per API scenario")
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--skip-api", action="store_true", help="only run the microbenchmarks")
+    parser.add_argument("--save", metavar="PATH", help="write the results as a baseline")
+    parser.add_argument("--compare", metavar="PATH", help="compare the results with a baseline")
+    parser.add_argument("--tolerance", type=float, default=0.2)
+    args = parser.parse_args(argv)
+
+    results = bench_service.run(args.sizes, args.storage, args.ops)
+    if not args.skip_api:
+        results += bench_api.run(args.sizes, args.storage, args.requests, args.concurrency)
+    print_results(results)
+
+    if args.save:
+        save_baseline(results, args.save)
+        print(f"baseline saved to {args.save}")
+    if args.compare:
+        regressions = compare(results, load_baseline(args.compare), args.tolerance)
+        for regression in regressions:
+            print(f"REGRESSION {regression}")
+        if regressions:
+            return 1
+        print("no regressions")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
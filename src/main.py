@@ -2,43 +2,392 @@
 FastAPI application for managing payments.
 Provides endpoints for creating, updating, paying, and reverting payments.
 """
+import os
 from pathlib import Path
 
-from fastapi import FastAPI, HTTPException, Path as FPath, Query, status
+from fastapi import FastAPI, Header, HTTPException, Path as FPath, Query, Response, status
+from fastapi.responses import JSONResponse, PlainTextResponse, StreamingResponse
 
+from payments.admission_control import AdmissionClassStats, AdmissionController, AdmissionLimit, AdmissionMiddleware
+from payments.async_payment_service import AsyncPaymentService
+from payments.idempotency_cache import IdempotencyCache, IdempotencyKeyConflict
+from payments.metrics import REGISTRY as METRICS_REGISTRY
+from payments.pay_job import PayJob, PayQueueStats
+from payments.pay_pipeline import AsyncPayPipeline
+from payments.payment_stats import PaymentStats
+from payments.payment_event import PaymentEvent
+from payments.payment_event_log import EventSequenceExpired
 from payments.payment_service import PaymentService
-from typing import List
+from payments.storage import create_payment_storage
+from payments.validation_strategies import PaymentMethodValidationStrategyFactory
+from typing import AsyncIterator, Dict, List, Optional, Sequence
+from payments.batch_models import BatchItemResult, PaymentCreateRequest
 from payments.payment import Payment
+from payments.payment_filter import PaymentFilter
+from payments.payment_method import parse_payment_method
+from payments.payment_status import parse_payment_status
+from payments.payment_service import BatchResult
+
+DEFAULT_PAGE_SIZE = 100
+MAX_PAGE_SIZE = 1000
+EXPORT_CHUNK_SIZE = 1000
+IDEMPOTENCY_CACHE_SIZE = 10000
+IDEMPOTENCY_TTL_SECONDS = 24 * 3600
+MAX_EVENTS_PAGE = 1000
+MAX_EVENTS_WAIT_SECONDS = 30
+SSE_HEARTBEAT_SECONDS = 15
+MAX_PAY_JOB_WAIT_SECONDS = 30
+# Default admission limits per endpoint class as "max_concurrent,max_queue,queue_timeout";
+# classes listed first get freed slots first.
+DEFAULT_ADMISSION_LIMITS = {
+    "read": "64,256,1",
+    "pay": "16,128,2",
+    "write": "16,64,2",
+    "bulk": "2,4,5",
+}
+DEFAULT_ADMISSION_TOTAL = 64
 
 _data_dir = Path(__file__).resolve().parent / "data"
 _data_dir.mkdir(exist_ok=True)
-_data_file = str(_data_dir / "payments.json")
+_storage_kind = os.environ.get("PAYMENTS_STORAGE", "json")
+_data_file = os.environ.get("PAYMENTS_DATA_PATH") or str(
+    _data_dir / {"sqlite": "payments.db", "binary": "payments.bin"}.get(_storage_kind, "payments.json")
+)
+
+# Set PAYMENTS_MULTIPROCESS=1 when running several uvicorn workers on the same data file.
+_process_lock_path = _data_file + ".lock" if os.environ.get("PAYMENTS_MULTIPROCESS") == "1" else None
+
+# PAYMENTS_ASYNC_PAY=1 makes POST /payments/{id}/pay enqueue the job durably and answer 202 Accepted;
+# jobs are decided in acceptance order, with up to PAYMENTS_PAY_WORKERS batches being written at once.
+# The queue belongs to one process.
+_async_pay = os.environ.get("PAYMENTS_ASYNC_PAY") == "1"
+if _async_pay and _process_lock_path is not None:
+    raise RuntimeError("PAYMENTS_ASYNC_PAY=1 cannot be combined with PAYMENTS_MULTIPROCESS=1")
+
+# PAYMENTS_VALIDATION_RULES points to a JSON file overriding the default validation rules.
+_rules_path = os.environ.get("PAYMENTS_VALIDATION_RULES")
 
 app = FastAPI()
-payment_service = PaymentService(_data_file)
+payment_service = PaymentService(
+    # PAYMENTS_LAZY_LOAD=1 serves requests before the data file is fully parsed.
+    # PAYMENTS_ARCHIVE=1 moves settled payments out of the hot data file into compressed segments.
+    storage=create_payment_storage(_storage_kind, _data_file, lazy=os.environ.get("PAYMENTS_LAZY_LOAD") == "1",
+                                   archive=os.environ.get("PAYMENTS_ARCHIVE") == "1"),
+    process_lock_path=_process_lock_path,
+    validation_factory=PaymentMethodValidationStrategyFactory.from_file(_rules_path) if _rules_path else None,
+)
+async_payment_service = AsyncPaymentService(payment_service)
+pay_pipeline = AsyncPayPipeline(
+    async_payment_service, _data_file + ".payq", workers=int(os.environ.get("PAYMENTS_PAY_WORKERS", "4")),
+) if _async_pay else None
+# Outcomes of create/pay requests sent with an Idempotency-Key header, replayed on retries.
+idempotency_cache = IdempotencyCache(IDEMPOTENCY_CACHE_SIZE, IDEMPOTENCY_TTL_SECONDS)
+
+
+def _endpoint_class(method: str, path: str) -> Optional[str]:
+    """Admission class of a request; None for unlimited ones (health, metrics, long-polls)."""
+    if not path.startswith("/payments") or path.startswith(("/payments/events", "/payments/jobs")):
+        return None
+    if method != "POST":
+        return "read"
+    if path in ("/payments:batchCreate", "/payments:batchPay"):
+        return "bulk"
+    return "pay" if path.endswith("/pay") else "write"
+
+
+# Admission control sheds excess load with 503 + Retry-After instead of queueing it without bound.
+# PAYMENTS_ADMISSION_<CLASS> (READ, PAY, WRITE, BULK) overrides a class limit, PAYMENTS_ADMISSION_TOTAL
+# caps requests running at once across classes, and PAYMENTS_ADMISSION=0 turns it off.
+admission_controller = AdmissionController(
+    {name: AdmissionLimit.parse(os.environ.get(f"PAYMENTS_ADMISSION_{name.upper()}", default), priority)
+     for priority, (name, default) in enumerate(DEFAULT_ADMISSION_LIMITS.items())},
+    max_total=int(os.environ.get("PAYMENTS_ADMISSION_TOTAL", DEFAULT_ADMISSION_TOTAL)),
+) if os.environ.get("PAYMENTS_ADMISSION") != "0" else None
+if admission_controller is not None:
+    app.add_middleware(AdmissionMiddleware, controller=admission_controller, classify=_endpoint_class)
+
+
+@app.on_event("startup")
+async def start_pay_pipeline():
+    if pay_pipeline is not None:
+        await pay_pipeline.start()
+
+
+@app.on_event("shutdown")
+async def close_payment_service():
+    if pay_pipeline is not None:
+        await pay_pipeline.close()
+    await async_payment_service.close()
 
 @app.get("/")
 def root():
     return {"message": "Payments API is running!"}
 
+@app.get("/metrics", response_class=PlainTextResponse)
+def metrics():
+    """
+    Service metrics in the Prometheus text format: per-stage timings (load,
+    validation, serialization, write, fsync, commit), write latency, data file
+    sizes, and pay/commit counters by payment method and status.
+    """
+    return PlainTextResponse(METRICS_REGISTRY.render(), media_type="text/plain; version=0.0.4")
+
+@app.get("/admission", response_model=Dict[str, AdmissionClassStats])
+def get_admission_stats() -> Dict[str, AdmissionClassStats]:
+    """
+    Limits, in-flight and queued requests, and rejection counters per endpoint class.
+    Response: Dict[str, AdmissionClassStats]
+    """
+    if admission_controller is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Admission control is not enabled")
+    return admission_controller.stats()
+
 @app.get("/payments", response_model=List[Payment])
-async def get_all_payments() -> List[Payment]:
+async def get_all_payments(
+    response: Response,
+    payment_status: Optional[str] = Query(None, alias="status", description="Only payments with this status"),
+    payment_method: Optional[str] = Query(None, description="Only payments with this method"),
+    min_amount: Optional[float] = Query(None, description="Only payments with amount >= min_amount"),
+    max_amount: Optional[float] = Query(None, description="Only payments with amount <= max_amount"),
+    limit: Optional[int] = Query(None, ge=1, le=MAX_PAGE_SIZE, description="Page size; enables pagination"),
+    cursor: Optional[str] = Query(None, description="X-Next-Cursor value of the previous page"),
+    response_format: str = Query("json", alias="format", pattern="^(json|ndjson)$", description="ndjson streams every match"),
+):
     """
-    Returns a list of all payments.
+    Returns the payments matching the filters.
+    With limit or cursor, returns one page ordered by payment_id and sets the
+    X-Next-Cursor header when more results may follow.
+    With format=ndjson, streams every match as one JSON object per line.
     Response: List[Payment]
     """
     try:
-        payments_dict = payment_service.load_all_payments()
-        return list(payments_dict.values())  
+        payment_filter = _payment_filter(payment_status, payment_method, min_amount, max_amount)
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+    try:
+        if response_format == "ndjson":
+            return StreamingResponse(_stream_payments(payment_filter), media_type="application/x-ndjson")
+        if limit is not None or cursor is not None:
+            page_size = limit or DEFAULT_PAGE_SIZE
+            page = await async_payment_service.list_payments(payment_filter, cursor, page_size)
+            if len(page) == page_size:
+                response.headers["X-Next-Cursor"] = page[-1].payment_id
+            return page
+        snapshot = await async_payment_service.snapshot()
+        return [r.to_payment() for _, r in snapshot.items() if payment_filter.matches(r)]
     except Exception as e:
         raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=str(e))
 
 
+def _payment_filter(payment_status: Optional[str], payment_method: Optional[str],
+                    min_amount: Optional[float], max_amount: Optional[float]) -> PaymentFilter:
+    """Build a PaymentFilter from raw query values; raises ValueError on invalid ones."""
+    return PaymentFilter(
+        status=parse_payment_status(payment_status) if payment_status is not None else None,
+        payment_method=parse_payment_method(payment_method) if payment_method is not None else None,
+        min_amount=min_amount,
+        max_amount=max_amount,
+    )
+
+
+async def _stream_payments(payment_filter: PaymentFilter) -> AsyncIterator[bytes]:
+    """Yield matching payments as NDJSON, one page at a time so memory stays bounded."""
+    after = None
+    while True:
+        page = await async_payment_service.list_payments(payment_filter, after, EXPORT_CHUNK_SIZE)
+        if page:
+            yield "".join(p.model_dump_json() + "\n" for p in page).encode("utf-8")
+        if len(page) < EXPORT_CHUNK_SIZE:
+            return
+        after = page[-1].payment_id
+
+
+@app.get("/payments/events", response_model=List[PaymentEvent])
+async def get_payment_events(
+    response: Response,
+    after: str = Query("0", description="Cursor of the last event already processed (0: from the start)"),
+    limit: int = Query(100, ge=1, le=MAX_EVENTS_PAGE),
+    wait: float = Query(0, ge=0, le=MAX_EVENTS_WAIT_SECONDS, description="Seconds to wait for new events (long poll)"),
+) -> List[PaymentEvent]:
+    """
+    Returns the payment change events after the given cursor, oldest first.
+    With wait, an empty result is only returned after waiting that long for new
+    events. X-Last-Sequence is the cursor to pass as after in the next call.
+    Responds 410 when the cursor is no longer retained or comes from another
+    process or an earlier run: resync with GET /payments.
+    Response: List[PaymentEvent]
+    """
+    try:
+        sequence = payment_service.events.parse_cursor(after)
+        events = await payment_service.events.wait_and_read(sequence, limit, wait)
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+    except EventSequenceExpired as e:
+        raise HTTPException(status_code=status.HTTP_410_GONE, detail=str(e))
+    response.headers["X-Last-Sequence"] = events[-1].cursor if events else payment_service.events.cursor(sequence)
+    return events
+
+
+@app.get("/payments/events/stream")
+async def stream_payment_events(
+    after: Optional[str] = Query(None, description="Cursor of the last event already processed"),
+    last_event_id: Optional[str] = Header(None, alias="Last-Event-ID", description="Set by EventSource on reconnect"),
+) -> StreamingResponse:
+    """
+    Server-sent events feed of payment changes: one event per transition, with
+    its cursor as event id, so EventSource clients resume where they left off.
+    Without after or Last-Event-ID the feed starts with new events only.
+    """
+    cursor = last_event_id if last_event_id is not None else after
+    try:
+        start = (payment_service.events.parse_cursor(cursor) if cursor is not None
+                 else payment_service.events.last_sequence)
+        payment_service.events.read(start, 0)
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+    except EventSequenceExpired as e:
+        raise HTTPException(status_code=status.HTTP_410_GONE, detail=str(e))
+    return StreamingResponse(_sse_events(start), media_type="text/event-stream",
+                             headers={"Cache-Control": "no-cache"})
+
+
+async def _sse_events(after: int) -> AsyncIterator[str]:
+    while True:
+        try:
+            events = await payment_service.events.wait_and_read(after, MAX_EVENTS_PAGE, SSE_HEARTBEAT_SECONDS)
+        except EventSequenceExpired as e:
+            yield f"event: expired\ndata: {e}\n\n"
+            return
+        if not events:
+            yield ": keep-alive\n\n"
+            continue
+        for event in events:
+            yield f"id: {event.cursor}\nevent: {event.type.value}\ndata: {event.model_dump_json()}\n\n"
+        after = events[-1].sequence
+
+
+@app.get("/payments/jobs", response_model=PayQueueStats)
+def get_pay_queue_stats() -> PayQueueStats:
+    """
+    Depth and lag of the asynchronous pay queue (PAYMENTS_ASYNC_PAY=1).
+    Response: PayQueueStats
+    """
+    if pay_pipeline is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Asynchronous pay is not enabled")
+    return pay_pipeline.stats()
+
+
+@app.get("/payments/jobs/{job_id}", response_model=PayJob)
+async def get_pay_job(
+    job_id: str = FPath(..., description="Job ID returned by POST /payments/{payment_id}/pay"),
+    wait: float = Query(0, ge=0, le=MAX_PAY_JOB_WAIT_SECONDS, description="Seconds to wait for the result"),
+) -> PayJob:
+    """
+    Returns an asynchronous pay job; with wait, returns as soon as it finishes or
+    once that many seconds passed. status_code and payment/error hold the outcome.
+    Response: PayJob
+    """
+    job = await pay_pipeline.wait(job_id, wait) if pay_pipeline is not None else None
+    if job is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Job not found")
+    return job
+
+
+@app.get("/payments/stats", response_model=PaymentStats)
+def get_payment_stats(
+    bucket: Optional[int] = Query(None, ge=1, description="Bucket size in seconds, a multiple of 60"),
+    since: Optional[float] = Query(None, description="Only buckets starting at or after this time (epoch seconds)"),
+) -> PaymentStats:
+    """
+    Returns count, sum, min and max of amount per payment method and status,
+    maintained incrementally on every write. With bucket, also returns the
+    payments that entered each status per time bucket (transitions committed
+    by this server process since it started).
+    Response: PaymentStats
+    """
+    try:
+        return payment_service.stats(bucket, since)
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+
+
+@app.get("/payments/{payment_id}", response_model=Payment, responses={304: {"description": "Not modified"}})
+async def get_payment(
+    payment_id: str = FPath(..., description="Payment ID"),
+    if_none_match: Optional[str] = Header(None, alias="If-None-Match", description="ETag of a cached copy"),
+) -> Payment:
+    """
+    Returns one payment with an ETag derived from its content, so it is the same on
+    every server process and across restarts. Send the ETag back in If-None-Match to
+    get 304 Not Modified while the payment is unchanged.
+    Response: Payment
+    """
+    try:
+        payment, version = await async_payment_service.get_versioned_payment(payment_id)
+    except KeyError as e:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=str(e))
+    etag = f'"{version}"'
+    if if_none_match is not None and _etag_matches(if_none_match, etag):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers={"ETag": etag})
+    return Response(payment.model_dump_json(), media_type="application/json", headers={"ETag": etag})
+
+
+def _etag_matches(if_none_match: str, etag: str) -> bool:
+    """Weak comparison of an If-None-Match header (a list of tags, or *) against etag."""
+    if if_none_match.strip() == "*":
+        return True
+    return any(tag.strip().removeprefix("W/") == etag for tag in if_none_match.split(","))
+
+
+@app.post("/payments:batchCreate", response_model=List[BatchItemResult])
+async def batch_create_payments(items: List[PaymentCreateRequest]) -> List[BatchItemResult]:
+    """
+    Registers several payments at once; valid items are persisted together.
+    Request: [{payment_id: str, amount: float, payment_method: str}]
+    Response: List[BatchItemResult], one per item and in the same order
+    """
+    try:
+        results = await async_payment_service.create_payments(
+            [(item.payment_id, item.amount, item.payment_method) for item in items]
+        )
+        return _batch_results([item.payment_id for item in items], results, status.HTTP_201_CREATED)
+    except Exception as e:
+        raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=str(e))
+
+
+@app.post("/payments:batchPay", response_model=List[BatchItemResult])
+async def batch_pay_payments(payment_ids: List[str]) -> List[BatchItemResult]:
+    """
+    Attempts to process several payments in order; changes are persisted together.
+    Request: [payment_id: str]
+    Response: List[BatchItemResult], one per item and in the same order
+    """
+    try:
+        results = await async_payment_service.pay_payments(payment_ids)
+        return _batch_results(payment_ids, results, status.HTTP_200_OK)
+    except Exception as e:
+        raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=str(e))
+
+
+def _batch_results(payment_ids: Sequence[str], results: Sequence[BatchResult], success_code: int) -> List[BatchItemResult]:
+    """Map service batch results to per-item responses using the single-endpoint status codes."""
+    out = []
+    for payment_id, result in zip(payment_ids, results):
+        if isinstance(result, ValueError):
+            out.append(BatchItemResult(payment_id=payment_id, status_code=status.HTTP_400_BAD_REQUEST, error=str(result)))
+        elif isinstance(result, KeyError):
+            out.append(BatchItemResult(payment_id=payment_id, status_code=status.HTTP_404_NOT_FOUND, error=str(result)))
+        else:
+            out.append(BatchItemResult(payment_id=payment_id, status_code=success_code, payment=result))
+    return out
+
+
 @app.post("/payments/{payment_id}", status_code=status.HTTP_201_CREATED, response_model=Payment)
 async def create_payment(
     payment_id: str = FPath(..., description="Payment ID"),
     amount: float = Query(..., description="Payment amount"),
     payment_method: str = Query(..., description="Payment method"),
+    idempotency_key: Optional[str] = Header(None, alias="Idempotency-Key", description="Replays the first response for retries"),
 ) -> Payment:
     """
     Registers a new payment.
@@ -46,7 +395,12 @@ async def create_payment(
     Response: Payment
     """
     try:
-        return payment_service.create_payment(payment_id, amount, payment_method)
+        return await idempotency_cache.run(
+            idempotency_key, ("create", payment_id, amount, payment_method),
+            lambda: async_payment_service.create_payment(payment_id, amount, payment_method),
+        )
+    except IdempotencyKeyConflict as e:
+        raise HTTPException(status_code=status.HTTP_422_UNPROCESSABLE_ENTITY, detail=str(e))
     except ValueError as e:
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
     except KeyError as e:
@@ -67,7 +421,7 @@ async def update_payment(
     Response: Payment
     """
     try:
-        return payment_service.update_payment(payment_id, amount, payment_method)
+        return await async_payment_service.update_payment(payment_id, amount, payment_method)
     except ValueError as e:
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
     except KeyError as e:
@@ -76,14 +430,29 @@ async def update_payment(
         raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=str(e))
 
 
-@app.post("/payments/{payment_id}/pay", response_model=Payment)
-async def pay_payment(payment_id: str = FPath(..., description="Payment ID")) -> Payment:
+@app.post("/payments/{payment_id}/pay", response_model=Payment, responses={202: {"model": PayJob}})
+async def pay_payment(
+    payment_id: str = FPath(..., description="Payment ID"),
+    idempotency_key: Optional[str] = Header(None, alias="Idempotency-Key", description="Replays the first response for retries"),
+) -> Payment:
     """
     Attempts to process the payment.
-    Response: Payment
+    Response: Payment, or with PAYMENTS_ASYNC_PAY=1 202 Accepted with the PayJob
+    to poll at the Location header (GET /payments/jobs/{job_id}).
     """
     try:
-        return payment_service.pay_payment(payment_id)
+        if pay_pipeline is not None:
+            job = await idempotency_cache.run(
+                idempotency_key, ("pay", payment_id), lambda: pay_pipeline.submit(payment_id),
+            )
+            return JSONResponse(job.model_dump(mode="json"), status_code=status.HTTP_202_ACCEPTED,
+                                headers={"Location": f"/payments/jobs/{job.job_id}"})
+        return await idempotency_cache.run(
+            idempotency_key, ("pay", payment_id),
+            lambda: async_payment_service.pay_payment(payment_id),
+        )
+    except IdempotencyKeyConflict as e:
+        raise HTTPException(status_code=status.HTTP_422_UNPROCESSABLE_ENTITY, detail=str(e))
     except ValueError as e:
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
     except KeyError as e:
@@ -99,7 +468,7 @@ async def revert_payment(payment_id: str = FPath(..., description="Payment ID"))
     Response: Payment
     """
     try:
-        return payment_service.revert_payment(payment_id)
+        return await async_payment_service.revert_payment(payment_id)
     except ValueError as e:
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
     except KeyError as e:
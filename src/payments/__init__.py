@@ -3,6 +3,8 @@
 from .payment import Payment
 from .payment_status import PaymentStatus
 from .payment_method import PaymentMethod
+from .payment_filter import PaymentFilter
+from .payment_status_counts import PaymentStatusCounts
 from .payment_service import PaymentService
 
 # You can also define what gets imported with 'from payments import *'
@@ -10,5 +12,7 @@ __all__ = [
     "Payment",
     "PaymentStatus",
     "PaymentMethod",
+    "PaymentFilter",
+    "PaymentStatusCounts",
     "PaymentService",
 ]
@@ -0,0 +1,223 @@
+import asyncio
+import json
+import math
+import time
+from collections import deque
+from dataclasses import dataclass
+from typing import Any, Awaitable, Callable, Deque, Dict, Mapping, Optional
+from pydantic import BaseModel
+from .metrics import ADMISSION_IN_FLIGHT, ADMISSION_QUEUED, ADMISSION_REJECTED, ADMISSION_WAIT_SECONDS
+
+
+class AdmissionRejected(Exception):
+    """The request was shed because its class is saturated; retry after retry_after seconds."""
+
+    def __init__(self, endpoint_class: str, reason: str, retry_after: int) -> None:
+        super().__init__(f"{endpoint_class} requests are saturated ({reason}), retry in {retry_after}s")
+        self.endpoint_class = endpoint_class
+        self.reason = reason
+        self.retry_after = retry_after
+
+
+@dataclass(frozen=True)
+class AdmissionLimit:
+    """
+    Limits of one endpoint class.
+
+    Attributes:
+        max_concurrent (int): Requests of the class running at once.
+        max_queue (int): Requests allowed to wait for a slot; more are rejected at once.
+        queue_timeout (float): Seconds a request may wait before it is rejected.
+        priority (int): Lower values get freed slots first.
+    """
+    max_concurrent: int
+    max_queue: int
+    queue_timeout: float
+    priority: int = 0
+
+    @classmethod
+    def parse(cls, text: str, priority: int = 0) -> "AdmissionLimit":
+        """Parse "max_concurrent,max_queue,queue_timeout", e.g. "64,256,1.5"."""
+        try:
+            concurrent, queue, timeout = (part.strip() for part in text.split(","))
+            limit = cls(int(concurrent), int(queue), float(timeout), priority)
+        except ValueError:
+            raise ValueError(f"Invalid admission limit {text!r}, expected max_concurrent,max_queue,queue_timeout")
+        if limit.max_concurrent < 1 or limit.max_queue < 0 or limit.queue_timeout < 0:
+            raise ValueError(f"Invalid admission limit {text!r}")
+        return limit
+
+    @property
+    def retry_after(self) -> int:
+        """Seconds clients are told to wait after a rejection."""
+        return max(1, math.ceil(self.queue_timeout))
+
+
+class AdmissionClassStats(BaseModel):
+    """
+    Counters of one endpoint class, for tuning its limits.
+
+    Attributes:
+        max_concurrent (int): Configured concurrency limit.
+        max_queue (int): Configured queue bound.
+        queue_timeout (float): Configured queue deadline in seconds.
+        in_flight (int): Requests running now.
+        queued (int): Requests waiting now.
+        admitted (int): Requests admitted since startup.
+        queued_total (int): Admitted or rejected requests that had to wait.
+        rejected_queue_full (int): Requests rejected because the queue was full.
+        rejected_timeout (int): Requests rejected because their deadline passed in the queue.
+    """
+    max_concurrent: int
+    max_queue: int
+    queue_timeout: float
+    in_flight: int
+    queued: int
+    admitted: int
+    queued_total: int
+    rejected_queue_full: int
+    rejected_timeout: int
+
+
+class _ClassState:
+    __slots__ = ("name", "limit", "in_flight", "waiters", "admitted", "queued_total", "rejected_queue_full",
+                 "rejected_timeout")
+
+    def __init__(self, name: str, limit: AdmissionLimit) -> None:
+        self.name = name
+        self.limit = limit
+        self.in_flight = 0
+        self.waiters: Deque[asyncio.Future] = deque()
+        self.admitted = 0
+        self.queued_total = 0
+        self.rejected_queue_full = 0
+        self.rejected_timeout = 0
+
+
+class AdmissionController:
+    """
+    Per-endpoint-class concurrency limits with bounded, deadline-limited wait queues.
+
+    A request runs when its class and the whole process (max_total) have a free
+    slot; otherwise it waits in its class queue, FIFO, for at most queue_timeout.
+    A full queue or an expired deadline raises AdmissionRejected, so overload turns
+    into fast 503s instead of requests piling up behind the storage. Freed slots go
+    to the waiting class with the lowest priority value first, which keeps reads
+    served while bulk writes wait. Must be used from a single event loop.
+    """
+    def __init__(self, limits: Mapping[str, AdmissionLimit], max_total: Optional[int] = None,
+                 clock: Callable[[], float] = time.monotonic) -> None:
+        self._classes = {name: _ClassState(name, limit) for name, limit in limits.items()}
+        self._by_priority = sorted(self._classes.values(), key=lambda state: state.limit.priority)
+        self.max_total = max_total if max_total is not None else sum(l.max_concurrent for l in limits.values())
+        self._clock = clock
+        self._in_flight = 0
+
+    async def acquire(self, endpoint_class: str) -> None:
+        """Wait for a slot of endpoint_class; raises AdmissionRejected when shed. Pair with release()."""
+        state = self._classes[endpoint_class]
+        if not state.waiters and self._has_slot(state):
+            self._start(state)
+            return
+        if len(state.waiters) >= state.limit.max_queue:
+            self._reject(state, "queue_full")
+        future = asyncio.get_running_loop().create_future()
+        state.waiters.append(future)
+        state.queued_total += 1
+        ADMISSION_QUEUED.inc(state.name)
+        started = self._clock()
+        try:
+            await asyncio.wait_for(asyncio.shield(future), state.limit.queue_timeout)
+        except (asyncio.TimeoutError, asyncio.CancelledError) as e:
+            if not future.done():
+                future.cancel()
+                state.waiters.remove(future)
+                ADMISSION_QUEUED.dec(state.name)
+                if isinstance(e, asyncio.CancelledError):
+                    raise
+                self._reject(state, "timeout")
+            # The slot was granted just as the wait ended.
+            if isinstance(e, asyncio.CancelledError):
+                self.release(endpoint_class)
+                raise
+        ADMISSION_WAIT_SECONDS.observe(self._clock() - started, state.name)
+
+    def release(self, endpoint_class: str) -> None:
+        """Give back a slot obtained from acquire() and hand it to the next waiter."""
+        state = self._classes[endpoint_class]
+        state.in_flight -= 1
+        self._in_flight -= 1
+        ADMISSION_IN_FLIGHT.dec(state.name)
+        self._dispatch()
+
+    def stats(self) -> Dict[str, AdmissionClassStats]:
+        """Limits and counters of every endpoint class."""
+        return {name: AdmissionClassStats(
+            max_concurrent=state.limit.max_concurrent, max_queue=state.limit.max_queue,
+            queue_timeout=state.limit.queue_timeout, in_flight=state.in_flight, queued=len(state.waiters),
+            admitted=state.admitted, queued_total=state.queued_total,
+            rejected_queue_full=state.rejected_queue_full, rejected_timeout=state.rejected_timeout,
+        ) for name, state in self._classes.items()}
+
+    def _has_slot(self, state: _ClassState) -> bool:
+        return state.in_flight < state.limit.max_concurrent and self._in_flight < self.max_total
+
+    def _start(self, state: _ClassState) -> None:
+        state.in_flight += 1
+        state.admitted += 1
+        self._in_flight += 1
+        ADMISSION_IN_FLIGHT.inc(state.name)
+
+    def _dispatch(self) -> None:
+        for state in self._by_priority:
+            while state.waiters and self._has_slot(state):
+                future = state.waiters.popleft()
+                ADMISSION_QUEUED.dec(state.name)
+                self._start(state)
+                future.set_result(None)
+            if self._in_flight >= self.max_total:
+                return
+
+    def _reject(self, state: _ClassState, reason: str) -> None:
+        if reason == "timeout":
+            state.rejected_timeout += 1
+        else:
+            state.rejected_queue_full += 1
+        ADMISSION_REJECTED.inc(state.name, reason)
+        raise AdmissionRejected(state.name, reason, state.limit.retry_after)
+
+
+class AdmissionMiddleware:
+    """
+    ASGI middleware running HTTP requests under an AdmissionController.
+
+    classify(method, path) returns the endpoint class of a request, or None to let
+    it through unlimited (health checks, metrics, long-polls). The slot is held
+    until the response, streamed or not, is fully sent. Shed requests get a 503
+    with a Retry-After header.
+    """
+    def __init__(self, app: Callable[..., Awaitable[None]], controller: AdmissionController,
+                 classify: Callable[[str, str], Optional[str]]) -> None:
+        self.app = app
+        self.controller = controller
+        self.classify = classify
+
+    async def __call__(self, scope: Dict[str, Any], receive: Callable, send: Callable) -> None:
+        endpoint_class = self.classify(scope["method"], scope["path"]) if scope["type"] == "http" else None
+        if endpoint_class is None:
+            await self.app(scope, receive, send)
+            return
+        try:
+            await self.controller.acquire(endpoint_class)
+        except AdmissionRejected as e:
+            body = json.dumps({"detail": str(e)}).encode()
+            await send({"type": "http.response.start", "status": 503, "headers": [
+                (b"content-type", b"application/json"), (b"content-length", str(len(body)).encode()),
+                (b"retry-after", str(e.retry_after).encode()),
+            ]})
+            await send({"type": "http.response.body", "body": body})
+            return
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            self.controller.release(endpoint_class)
@@ -0,0 +1,284 @@
+import asyncio
+from contextlib import AsyncExitStack, asynccontextmanager
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, Iterable, List, Optional, Sequence, Tuple, TypeVar, Union
+from .payment import Payment
+from .payment_filter import PaymentFilter
+from .payment_method import PaymentMethod
+from .payment_service import BatchResult, Change, CreateItem, PaymentService, _resolve_payment_method, payment_version
+from .storage import PaymentSnapshot
+
+_PendingWrite = Tuple[List[Change], asyncio.Future]
+T = TypeVar("T")
+
+
+class AsyncPaymentService:
+    """
+    Asyncio front-end for PaymentService.
+
+    Transitions are decided on the event loop when the backend answers reads from
+    memory (in a thread otherwise) and handed to a single writer task, which
+    persists everything queued meanwhile with one storage.save_many call.
+    Each coroutine returns once its write is on disk, and a payment id stays locked
+    until then, so callers never observe uncommitted state. Decisions do see the
+    transitions staged by other requests before those are on disk (e.g. a pending
+    creation counts for the credit card rule); if such a write fails, every request
+    decided while it was staged fails with the same error and is rolled back too,
+    since its outcome may depend on it. Once in use, writes
+    should go only through this front-end, not the wrapped service directly.
+    When the service is shared between processes, each write must hold the
+    inter-process lock from decision to disk, so calls run the synchronous
+    service in a thread instead of being batched.
+    """
+    def __init__(self, service: PaymentService, max_batch_size: int = 512) -> None:
+        self.service = service
+        self.max_batch_size = max_batch_size
+        self._locks: Dict[str, List] = {}
+        self._queue: Optional[asyncio.Queue] = None
+        self._writer: Optional[asyncio.Task] = None
+        # Staged transitions not on disk yet, per request (keyed by id of its change list).
+        self._unflushed: Dict[int, List[Change]] = {}
+        # Requests rolled back because a write they may depend on failed, with that error.
+        self._failed: Dict[int, Tuple[List[Change], BaseException]] = {}
+
+    async def load_all_payments(self) -> Dict[str, Payment]:
+        """Return all payments keyed by id."""
+        return await asyncio.to_thread(self.service.load_all_payments)
+
+    async def snapshot(self) -> PaymentSnapshot:
+        """Return a consistent, read-only view of every payment (see PaymentService.snapshot)."""
+        return await asyncio.to_thread(self.service.snapshot)
+
+    async def get_payment(self, payment_id: str) -> Payment:
+        """Return a payment by id; raises KeyError if it does not exist."""
+        if self.service.storage.in_memory and not self.service.is_shared:
+            return self.service._get_payment(payment_id)
+        return await asyncio.to_thread(self.service.get_payment, payment_id)
+
+    async def get_versioned_payment(self, payment_id: str) -> Tuple[Payment, str]:
+        """Return a payment and its version tag (see PaymentService.get_versioned_payment)."""
+        payment = await self.get_payment(payment_id)
+        return payment, payment_version(payment)
+
+    async def list_payments(self, payment_filter: Optional[PaymentFilter] = None, after: Optional[str] = None, limit: int = 100) -> List[Payment]:
+        """Return a page of payments matching the filter (see PaymentService.list_payments)."""
+        return await asyncio.to_thread(self.service.list_payments, payment_filter, after, limit)
+
+    async def create_payment(self, payment_id: str, amount: float, payment_method: Union[PaymentMethod, str]) -> Payment:
+        """Create and persist a new payment."""
+        if self.service.is_shared:
+            return await asyncio.to_thread(self.service.create_payment, payment_id, amount, payment_method)
+        payment_method = _resolve_payment_method(payment_method)
+        async with self._hold(payment_id):
+            new, changes = await self._decide(self._plan_create, payment_id, amount, payment_method)
+            await self._enqueue(changes)
+        return new
+
+    async def update_payment(self, payment_id: str, amount: Optional[float], payment_method: Optional[Union[PaymentMethod, str]]) -> Payment:
+        """Update mutable fields of a registered payment."""
+        if self.service.is_shared:
+            return await asyncio.to_thread(self.service.update_payment, payment_id, amount, payment_method)
+        async with self._hold(payment_id):
+            updated, changes = await self._decide(self._plan_update, payment_id, amount, payment_method)
+            await self._enqueue(changes)
+        return updated
+
+    async def pay_payment(self, payment_id: str) -> Payment:
+        """Process payment and set status to PAGADO or FALLIDO."""
+        if self.service.is_shared:
+            return await asyncio.to_thread(self.service.pay_payment, payment_id)
+        async with self._hold(payment_id):
+            paid, changes = await self._decide(self._plan_pay, payment_id)
+            await self._enqueue(changes)
+        return paid
+
+    async def revert_payment(self, payment_id: str) -> Payment:
+        """Revert a failed payment to REGISTRADO."""
+        if self.service.is_shared:
+            return await asyncio.to_thread(self.service.revert_payment, payment_id)
+        async with self._hold(payment_id):
+            reverted, changes = await self._decide(self._plan_revert, payment_id)
+            await self._enqueue(changes)
+        return reverted
+
+    async def create_payments(self, items: Sequence[CreateItem]) -> List[BatchResult]:
+        """Create several payments; valid items are written together in one flush."""
+        if self.service.is_shared:
+            return await asyncio.to_thread(self.service.create_payments, items)
+        async with self._hold_many(item[0] for item in items):
+            results, changes = await self._decide(self.service._plan_creates, items)
+            await self._enqueue(changes)
+        return results
+
+    async def pay_payments(self, payment_ids: Sequence[str]) -> List[BatchResult]:
+        """Process several payments in order; changes are written together in one flush."""
+        results, written = await self.begin_pay_payments(payment_ids)
+        await written
+        return results
+
+    async def begin_pay_payments(self, payment_ids: Sequence[str]) -> Tuple[List[BatchResult], Awaitable[None]]:
+        """
+        Decide and stage pay_payments and queue the write, without waiting for it.
+        Returns the results and an awaitable that completes once they are on disk;
+        it must be awaited, as the payment ids stay locked until then. Batches begun
+        one after the other are decided in that order.
+        """
+        if self.service.is_shared:
+            return await asyncio.to_thread(self.service.pay_payments, payment_ids), _done()
+        stack = AsyncExitStack()
+        await stack.enter_async_context(self._hold_many(payment_ids))
+        try:
+            results, changes = await self._decide(self.service._plan_pays, payment_ids)
+        except BaseException:
+            await stack.aclose()
+            raise
+        return results, self._written(self._enqueue(changes), stack)
+
+    async def close(self) -> None:
+        """Flush pending writes, stop the writer task and close the service."""
+        if self._writer is not None:
+            await self._queue.join()
+            self._writer.cancel()
+            try:
+                await self._writer
+            except asyncio.CancelledError:
+                pass
+            self._writer = None
+        self.service.close()
+
+    @asynccontextmanager
+    async def _hold(self, payment_id: str) -> AsyncIterator[None]:
+        entry = self._locks.get(payment_id)
+        if entry is None:
+            entry = self._locks[payment_id] = [asyncio.Lock(), 0]
+        entry[1] += 1
+        try:
+            async with entry[0]:
+                yield
+        finally:
+            entry[1] -= 1
+            if entry[1] == 0:
+                del self._locks[payment_id]
+
+    @asynccontextmanager
+    async def _hold_many(self, payment_ids: Iterable[str]) -> AsyncIterator[None]:
+        async with AsyncExitStack() as stack:
+            for payment_id in sorted(set(payment_ids)):
+                await stack.enter_async_context(self._hold(payment_id))
+            yield
+
+    async def _decide(self, plan: Callable[..., Tuple[T, List[Change]]], *args: Any) -> Tuple[T, List[Change]]:
+        """
+        Run plan(*args), which reads the store and stages transitions, under the commit lock.
+        It runs on the loop only when that cannot block: the backend answers reads from
+        memory and the counts and rollups are built. Otherwise (SQLite, archives, a lazy
+        index still loading, the first write) it runs in a thread.
+        """
+        service = self.service
+        if service.storage.in_memory and service._status_counts is not None and service._rollups is not None:
+            return self._locked(plan, *args)
+        return await asyncio.to_thread(self._locked, plan, *args)
+
+    def _locked(self, plan: Callable[..., Tuple[T, List[Change]]], *args: Any) -> Tuple[T, List[Change]]:
+        with self.service._commit_lock:
+            result, changes = plan(*args)
+            if changes:
+                self._unflushed[id(changes)] = changes
+            return result, changes
+
+    def _plan_create(self, payment_id: str, amount: float, payment_method: PaymentMethod) -> Tuple[Payment, List[Change]]:
+        new = self.service._new_payment(payment_id, amount, payment_method)
+        return new, self._staged(new, None)
+
+    def _plan_update(self, payment_id: str, amount: Optional[float],
+                     payment_method: Optional[Union[PaymentMethod, str]]) -> Tuple[Payment, List[Change]]:
+        payment = self.service._get_payment(payment_id)
+        updated = self.service._updated_payment(payment, amount, payment_method)
+        if updated is None:
+            return payment, []
+        return updated, self._staged(updated, payment)
+
+    def _plan_pay(self, payment_id: str) -> Tuple[Payment, List[Change]]:
+        payment = self.service._get_payment(payment_id)
+        paid = self.service._paid_payment(payment)
+        return paid, self._staged(paid, payment)
+
+    def _plan_revert(self, payment_id: str) -> Tuple[Payment, List[Change]]:
+        payment = self.service._get_payment(payment_id)
+        reverted = self.service._reverted_payment(payment)
+        if reverted is None:
+            return payment, []
+        return reverted, self._staged(reverted, payment)
+
+    def _staged(self, payment: Payment, previous: Optional[Payment]) -> List[Change]:
+        self.service._stage(payment, previous)
+        return [(payment, previous)]
+
+    async def _written(self, future: asyncio.Future, stack: AsyncExitStack) -> None:
+        async with stack:
+            await future
+
+    def _enqueue(self, changes: List[Change]) -> asyncio.Future:
+        """Queue the write of already staged changes; the future resolves once they are on disk."""
+        loop = asyncio.get_running_loop()
+        if self._writer is None or self._writer.done() or self._writer.get_loop() is not loop:
+            self._queue = asyncio.Queue()
+            self._writer = loop.create_task(self._write_batches())
+        future = loop.create_future()
+        failed = self._failed.pop(id(changes), None)
+        if failed is not None:
+            future.set_exception(failed[1])
+        elif not changes:
+            future.set_result(None)
+        else:
+            self._queue.put_nowait((changes, future))
+        return future
+
+    async def _write_batches(self) -> None:
+        while True:
+            batch: List[_PendingWrite] = [await self._queue.get()]
+            while len(batch) < self.max_batch_size and not self._queue.empty():
+                batch.append(self._queue.get_nowait())
+            rolled_back = [(future, self._failed.pop(id(changes), None)) for changes, future in batch]
+            for future, failed in rolled_back:
+                if failed is not None and not future.done():
+                    future.set_exception(failed[1])
+            writes = [changes for (changes, _), (_, failed) in zip(batch, rolled_back) if failed is None]
+            try:
+                if writes:
+                    await asyncio.to_thread(self._flush, writes)
+            except Exception as e:
+                for _, future in batch:
+                    if not future.done():
+                        future.set_exception(e)
+            else:
+                for _, future in batch:
+                    if not future.done():
+                        future.set_result(None)
+            finally:
+                for _ in batch:
+                    self._queue.task_done()
+
+    def _flush(self, writes: List[List[Change]]) -> None:
+        """Persist the staged changes of several requests with one write."""
+        changes = [change for request in writes for change in request]
+        try:
+            self.service._write(changes)
+        except Exception as e:
+            with self.service._commit_lock:
+                for request in writes:
+                    self._unflushed.pop(id(request), None)
+                # Everything staged meanwhile was decided against the failed transitions.
+                dependent = list(self._unflushed.values())
+                self._unflushed.clear()
+                for request in dependent:
+                    self._failed[id(request)] = (request, e)
+                for payment, previous in reversed(changes + [c for request in dependent for c in request]):
+                    self.service._unstage(payment, previous)
+            raise
+        with self.service._commit_lock:
+            for request in writes:
+                self._unflushed.pop(id(request), None)
+
+
+async def _done() -> None:
+    pass
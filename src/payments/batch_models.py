@@ -0,0 +1,33 @@
+from typing import Optional
+from pydantic import BaseModel
+from .payment import Payment
+
+
+class PaymentCreateRequest(BaseModel):
+    """
+    One item of a batch create request.
+
+    Attributes:
+        payment_id (str): Unique identifier for the payment.
+        amount (float): Amount to be paid.
+        payment_method (str): Payment method, parsed like the single create endpoint.
+    """
+    payment_id: str
+    amount: float
+    payment_method: str
+
+
+class BatchItemResult(BaseModel):
+    """
+    Outcome of one item of a batch request.
+
+    Attributes:
+        payment_id (str): Identifier of the item.
+        status_code (int): HTTP status the single-payment endpoint would have returned.
+        payment (Optional[Payment]): Resulting payment when the item succeeded.
+        error (Optional[str]): Error detail when the item was rejected.
+    """
+    payment_id: str
+    status_code: int
+    payment: Optional[Payment] = None
+    error: Optional[str] = None
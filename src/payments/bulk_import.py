@@ -0,0 +1,247 @@
+"""
+Bulk loading and re-validation of payments; see bulk_import_cli for the command line.
+
+Input rows are parsed and validated (parse_payment_method, parse_payment_status
+and the Payment model) in chunks across a process pool, then merged into the
+store with a single PaymentService.import_payments call, i.e. one storage write.
+"""
+import csv
+import json
+import os
+import time
+from collections import deque
+from concurrent.futures import Future, ProcessPoolExecutor
+from dataclasses import dataclass, field
+from itertools import islice
+from typing import Any, Callable, Deque, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+from .payment import Payment
+from .payment_filter import PaymentFilter
+from .payment_method import PaymentMethod, parse_payment_method
+from .payment_service import PaymentService
+from .payment_status import PaymentStatus, parse_payment_status
+from .payment_status_counts import PaymentStatusCounts
+from .validation_strategies import PaymentMethodValidationStrategyFactory, RuleBasedValidationStrategy
+
+# (line or position in the input, payment_id, amount, payment_method, status)
+RawRow = Tuple[int, Any, Any, Any, Any]
+# (line, payment_id, amount, payment_method value, status value)
+ParsedRow = Tuple[int, str, float, str, str]
+# (line, payment_id, message)
+RowError = Tuple[int, str, str]
+# Called with (rows processed so far, seconds elapsed).
+ProgressCallback = Callable[[int, float], None]
+
+DEFAULT_CHUNK_SIZE = 10000
+
+
+@dataclass
+class BulkImportReport:
+    processed: int = 0
+    imported: int = 0
+    seconds: float = 0.0
+    errors: List[RowError] = field(default_factory=list)
+
+    @property
+    def rows_per_second(self) -> float:
+        return self.processed / self.seconds if self.seconds > 0 else 0.0
+
+
+@dataclass
+class RevalidationReport:
+    checked: int = 0
+    valid: int = 0
+    seconds: float = 0.0
+    invalid_ids: List[str] = field(default_factory=list)
+    # Outcome of paying every checked payment, when requested.
+    paid: Optional[int] = None
+    failed: Optional[int] = None
+
+    @property
+    def payments_per_second(self) -> float:
+        return self.checked / self.seconds if self.seconds > 0 else 0.0
+
+
+def read_rows(path: str) -> Iterator[RawRow]:
+    """
+    Yield raw rows from a CSV file (header with payment_id, amount, payment_method
+    and optionally status), a JSON file (payments.json layout or a list of objects),
+    or an NDJSON file (one object per line, as exported by GET /payments?format=ndjson).
+    """
+    ext = os.path.splitext(path)[1].lower()
+    if ext == ".csv":
+        with open(path, "r", encoding="utf-8", newline="") as f:
+            for line, row in enumerate(csv.DictReader(f), start=2):
+                yield line, row.get("payment_id"), row.get("amount"), row.get("payment_method"), row.get("status")
+    elif ext in (".ndjson", ".jsonl"):
+        with open(path, "r", encoding="utf-8") as f:
+            for line, text in enumerate(f, start=1):
+                if text.strip():
+                    yield _object_row(line, None, _loads_or_none(text))
+    else:
+        with open(path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+        if isinstance(data, dict):
+            for position, (pid, fields) in enumerate(data.items(), start=1):
+                yield _object_row(position, pid, fields)
+        else:
+            for position, fields in enumerate(data, start=1):
+                yield _object_row(position, None, fields)
+
+
+def parse_chunk(rows: Sequence[RawRow]) -> Tuple[List[ParsedRow], List[RowError]]:
+    """Validate raw rows; runs in worker processes."""
+    parsed: List[ParsedRow] = []
+    errors: List[RowError] = []
+    for line, payment_id, amount, payment_method, payment_status in rows:
+        try:
+            method = parse_payment_method(payment_method)
+            status = parse_payment_status(payment_status) if payment_status not in (None, "") else PaymentStatus.REGISTRADO
+            payment = Payment(payment_id=payment_id, amount=amount, payment_method=method, status=status)
+        except (ValueError, TypeError) as e:
+            errors.append((line, str(payment_id), str(e).splitlines()[0]))
+            continue
+        parsed.append((line, payment.payment_id, payment.amount, method.value, status.value))
+    return parsed, errors
+
+
+def validate_chunk(args: Tuple[Sequence[Tuple[str, float, str]], Dict, Dict[str, list]]) -> List[bool]:
+    """Validate (payment_id, amount, payment_method value) rows against counts; runs in worker processes."""
+    rows, counts, rules = args
+    factory = PaymentMethodValidationStrategyFactory(rules)
+    status_counts = PaymentStatusCounts(counts)
+    payments = [Payment.model_construct(payment_id=pid, amount=amount, payment_method=PaymentMethod(method),
+                                        status=PaymentStatus.REGISTRADO) for pid, amount, method in rows]
+    results = [False] * len(payments)
+    by_method: Dict[PaymentMethod, List[int]] = {}
+    for i, payment in enumerate(payments):
+        by_method.setdefault(payment.payment_method, []).append(i)
+    for method, positions in by_method.items():
+        strategy = factory.get(method)
+        if strategy is None:
+            continue
+        for i, ok in zip(positions, strategy.validate_batch([payments[i] for i in positions], status_counts)):
+            results[i] = ok
+    return results
+
+
+def import_file(service: PaymentService, path: str, workers: Optional[int] = None,
+                chunk_size: int = DEFAULT_CHUNK_SIZE, progress: Optional[ProgressCallback] = None) -> BulkImportReport:
+    """Parse and validate path in parallel, then import every valid row with one bulk commit."""
+    report = BulkImportReport()
+    start = time.perf_counter()
+    parsed: List[ParsedRow] = []
+    for chunk_parsed, chunk_errors in _map_chunks(parse_chunk, _chunks(read_rows(path), chunk_size), workers):
+        parsed.extend(chunk_parsed)
+        report.errors.extend(chunk_errors)
+        report.processed += len(chunk_parsed) + len(chunk_errors)
+        if progress is not None:
+            progress(report.processed, time.perf_counter() - start)
+
+    payments = [Payment.model_construct(payment_id=pid, amount=amount, payment_method=PaymentMethod(method),
+                                        status=PaymentStatus(status)) for _, pid, amount, method, status in parsed]
+    for (line, pid, *_), result in zip(parsed, service.import_payments(payments)):
+        if isinstance(result, Exception):
+            report.errors.append((line, pid, str(result)))
+        else:
+            report.imported += 1
+    report.errors.sort()
+    report.seconds = time.perf_counter() - start
+    return report
+
+
+def revalidate(service: PaymentService, workers: Optional[int] = None, chunk_size: int = DEFAULT_CHUNK_SIZE,
+               apply: bool = False, progress: Optional[ProgressCallback] = None) -> RevalidationReport:
+    """
+    Check every REGISTRADO payment against the current rules and counts, in parallel
+    (a dry run, like PaymentService.validate_payments). With apply, then pay them all
+    through PaymentService.pay_payments, i.e. in order and with one bulk commit.
+    """
+    report = RevalidationReport()
+    start = time.perf_counter()
+    registered = _all_payments(service, PaymentFilter(status=PaymentStatus.REGISTRADO))
+    counts = service.status_counts.as_dict()
+    rules = _rules_config(service.validation_factory)
+    rows = ((p.payment_id, p.amount, p.payment_method.value) for p in registered)
+    tasks = ((chunk, counts, rules) for chunk in _chunks(rows, chunk_size))
+    validated = _map_chunks(validate_chunk, tasks, workers) if rules is not None else (
+        service.validate_payments(chunk) for chunk in _chunks(registered, chunk_size))
+    for results in validated:
+        for payment, ok in zip(registered[report.checked:report.checked + len(results)], results):
+            if ok:
+                report.valid += 1
+            else:
+                report.invalid_ids.append(payment.payment_id)
+        report.checked += len(results)
+        if progress is not None:
+            progress(report.checked, time.perf_counter() - start)
+
+    if apply and registered:
+        outcomes = service.pay_payments([p.payment_id for p in registered])
+        report.paid = sum(1 for r in outcomes if isinstance(r, Payment) and r.status == PaymentStatus.PAGADO)
+        report.failed = sum(1 for r in outcomes if isinstance(r, Payment) and r.status == PaymentStatus.FALLIDO)
+    report.seconds = time.perf_counter() - start
+    return report
+
+
+def _object_row(position: int, payment_id: Any, fields: Any) -> RawRow:
+    if not isinstance(fields, dict):
+        return position, payment_id, None, None, None
+    return (position, fields.get("payment_id", payment_id), fields.get("amount"),
+            fields.get("payment_method"), fields.get("status"))
+
+
+def _loads_or_none(text: str) -> Any:
+    try:
+        return json.loads(text)
+    except ValueError:
+        return None
+
+
+def _chunks(items: Iterable, size: int) -> Iterator[list]:
+    iterator = iter(items)
+    while True:
+        chunk = list(islice(iterator, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def _map_chunks(func: Callable, tasks: Iterable, workers: Optional[int]) -> Iterator:
+    """Apply func to each task in order, across a process pool unless workers == 1."""
+    workers = workers or os.cpu_count() or 1
+    if workers <= 1:
+        yield from map(func, tasks)
+        return
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        # Keep a bounded number of chunks in flight so the input is not read all at once.
+        pending: Deque[Future] = deque()
+        for task in tasks:
+            pending.append(pool.submit(func, task))
+            if len(pending) >= 2 * workers:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
+
+
+def _all_payments(service: PaymentService, payment_filter: PaymentFilter) -> List[Payment]:
+    payments: List[Payment] = []
+    after = None
+    while True:
+        page = service.list_payments(payment_filter, after, DEFAULT_CHUNK_SIZE)
+        payments.extend(page)
+        if len(page) < DEFAULT_CHUNK_SIZE:
+            return payments
+        after = page[-1].payment_id
+
+
+def _rules_config(factory: PaymentMethodValidationStrategyFactory) -> Optional[Dict[str, list]]:
+    """Rules of every strategy, to rebuild the factory in workers; None if a strategy is not rule based."""
+    rules: Dict[str, list] = {}
+    for method in PaymentMethod:
+        strategy = factory.get(method)
+        if strategy is None:
+            continue
+        if not isinstance(strategy, RuleBasedValidationStrategy):
+            return None
+        rules[method.value] = strategy.rules
+    return rules
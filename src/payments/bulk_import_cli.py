@@ -0,0 +1,81 @@
+"""
+Command-line bulk loader and re-validation pass.
+
+Usage (from src/):
+    python -m payments.bulk_import_cli import payments.csv --data-path data/payments.json [--workers 8]
+    python -m payments.bulk_import_cli revalidate --data-path data/payments.json [--apply]
+
+Pass --lock when the API (or another loader) may be using the same data file;
+it takes the same inter-process lock as PAYMENTS_MULTIPROCESS=1. Open the store
+the way the API does: --archive (PAYMENTS_ARCHIVE=1) is required on archived
+deployments so that ids already in the archive are rejected as duplicates, and
+--lazy follows PAYMENTS_LAZY_LOAD=1.
+"""
+import argparse
+import os
+import sys
+from typing import List, Optional, Sequence
+from .bulk_import import DEFAULT_CHUNK_SIZE, RowError, import_file, revalidate
+from .payment_service import PaymentService
+from .storage import create_payment_storage
+from .validation_strategies import PaymentMethodValidationStrategyFactory
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Bulk import and re-validate payments")
+    parser.add_argument("command", choices=["import", "revalidate"])
+    parser.add_argument("source", nargs="?", help="import: CSV, JSON or NDJSON file")
+    parser.add_argument("--data-path", required=True, help="payments data file")
+    parser.add_argument("--storage", choices=["json", "wal", "binary", "sqlite"], default="json")
+    parser.add_argument("--archive", action="store_true", default=os.environ.get("PAYMENTS_ARCHIVE") == "1",
+                        help="the store archives settled payments (default: PAYMENTS_ARCHIVE=1)")
+    parser.add_argument("--lazy", action="store_true", default=os.environ.get("PAYMENTS_LAZY_LOAD") == "1",
+                        help="load the data file on demand (default: PAYMENTS_LAZY_LOAD=1)")
+    parser.add_argument("--rules", metavar="PATH", help="JSON validation rules, as PAYMENTS_VALIDATION_RULES")
+    parser.add_argument("--lock", action="store_true", help="take the inter-process lock of the data file")
+    parser.add_argument("--workers", type=int, default=None, help="worker processes (default: CPU count)")
+    parser.add_argument("--chunk-size", type=int, default=DEFAULT_CHUNK_SIZE)
+    parser.add_argument("--apply", action="store_true", help="revalidate: pay the REGISTRADO payments")
+    parser.add_argument("--quiet", action="store_true", help="do not report progress")
+    args = parser.parse_args(argv)
+    if args.command == "import" and not args.source:
+        parser.error("import requires a source file")
+
+    service = PaymentService(
+        storage=create_payment_storage(args.storage, args.data_path, lazy=args.lazy, archive=args.archive),
+        process_lock_path=args.data_path + ".lock" if args.lock else None,
+        validation_factory=PaymentMethodValidationStrategyFactory.from_file(args.rules) if args.rules else None,
+    )
+    progress = None if args.quiet else _report_progress
+    try:
+        if args.command == "import":
+            report = import_file(service, args.source, args.workers, args.chunk_size, progress)
+            _print_errors(report.errors)
+            print(f"imported {report.imported} of {report.processed} rows, {len(report.errors)} rejected "
+                  f"in {report.seconds:.2f}s ({report.rows_per_second:,.0f} rows/s)")
+            return 1 if report.errors else 0
+        report = revalidate(service, args.workers, args.chunk_size, args.apply, progress)
+        print(f"checked {report.checked} REGISTRADO payments: {report.valid} valid, "
+              f"{len(report.invalid_ids)} invalid in {report.seconds:.2f}s "
+              f"({report.payments_per_second:,.0f} payments/s)")
+        if report.paid is not None:
+            print(f"applied: {report.paid} PAGADO, {report.failed} FALLIDO")
+        return 0
+    finally:
+        service.close()
+
+
+def _report_progress(processed: int, seconds: float) -> None:
+    rate = processed / seconds if seconds > 0 else 0.0
+    print(f"  {processed:,} rows ({rate:,.0f} rows/s)", file=sys.stderr)
+
+
+def _print_errors(errors: Sequence[RowError], limit: int = 20) -> None:
+    for line, payment_id, message in errors[:limit]:
+        print(f"  row {line} ({payment_id}): {message}", file=sys.stderr)
+    if len(errors) > limit:
+        print(f"  ... and {len(errors) - limit} more", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,95 @@
+import asyncio
+import time
+from collections import OrderedDict
+from typing import Awaitable, Callable, Hashable, Optional, Tuple, Type, TypeVar
+
+T = TypeVar("T")
+
+
+class IdempotencyKeyConflict(Exception):
+    """The idempotency key was already used for a different request."""
+
+
+class _Entry:
+    __slots__ = ("fingerprint", "expires_at", "future")
+
+    def __init__(self, fingerprint: Hashable, expires_at: float, future: asyncio.Future) -> None:
+        self.fingerprint = fingerprint
+        self.expires_at = expires_at
+        self.future = future
+
+
+class IdempotencyCache:
+    """
+    Bounded LRU + TTL cache of operation outcomes keyed by client idempotency keys.
+
+    The first request with a key runs the operation; repeats with the same key and
+    request fingerprint get the stored outcome (result or cached error) without
+    running it again, and concurrent repeats wait for the first one to finish.
+    Only the error types in cached_errors are stored: any other failure drops the
+    key so a retry runs the operation again. Keys are only remembered by this
+    process, so with several workers a retry may reach one that has not seen it.
+    """
+    def __init__(self, max_entries: int = 10000, ttl_seconds: float = 24 * 3600,
+                 cached_errors: Tuple[Type[BaseException], ...] = (ValueError, KeyError),
+                 clock: Callable[[], float] = time.monotonic) -> None:
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.cached_errors = cached_errors
+        self._clock = clock
+        self._entries: "OrderedDict[str, _Entry]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    async def run(self, key: Optional[str], fingerprint: Hashable, operation: Callable[[], Awaitable[T]]) -> T:
+        """
+        Return the outcome of operation() for this key, running it at most once.
+        Without a key the operation simply runs. Raises IdempotencyKeyConflict when
+        the key is reused with a different fingerprint.
+        """
+        if key is None:
+            return await operation()
+        now = self._clock()
+        entry = self._entries.get(key)
+        if entry is not None and entry.expires_at <= now:
+            del self._entries[key]
+            entry = None
+        if entry is not None:
+            if entry.fingerprint != fingerprint:
+                raise IdempotencyKeyConflict("Idempotency-Key was already used for a different request")
+            self._entries.move_to_end(key)
+            self.hits += 1
+            if entry.future.done():
+                return entry.future.result()
+            # Shield the shared future: a cancelled repeat must not cancel the first request.
+            return await asyncio.shield(entry.future)
+
+        self.misses += 1
+        future = asyncio.get_running_loop().create_future()
+        self._entries[key] = _Entry(fingerprint, now + self.ttl_seconds, future)
+        self._evict()
+        try:
+            result = await operation()
+        except self.cached_errors as e:
+            future.set_exception(e)
+            # Mark the exception retrieved in case no repeat ever asks for it.
+            future.exception()
+            raise
+        except BaseException as e:
+            if self._entries.get(key) is not None and self._entries[key].future is future:
+                del self._entries[key]
+            if isinstance(e, Exception):
+                future.set_exception(e)
+                future.exception()
+            else:
+                future.cancel()
+            raise
+        future.set_result(result)
+        return result
+
+    def _evict(self) -> None:
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
@@ -0,0 +1,42 @@
+import threading
+from typing import Optional
+
+try:
+    import fcntl
+except ImportError:  # pragma: no cover - Windows
+    fcntl = None
+
+
+class InterProcessLock:
+    """
+    Exclusive lock shared by every process that opens the same lock file.
+    Threads of the same process are serialized as well.
+    Requires POSIX file locking (fcntl.flock).
+    """
+    def __init__(self, path: str) -> None:
+        if fcntl is None:
+            raise RuntimeError("inter-process locking requires fcntl (POSIX)")
+        self.path = path
+        self._thread_lock = threading.Lock()
+        self._file: Optional[object] = None
+
+    def __enter__(self) -> "InterProcessLock":
+        self._thread_lock.acquire()
+        try:
+            self._file = open(self.path, "a+b")
+            fcntl.flock(self._file.fileno(), fcntl.LOCK_EX)
+        except Exception:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+            self._thread_lock.release()
+            raise
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        try:
+            fcntl.flock(self._file.fileno(), fcntl.LOCK_UN)
+            self._file.close()
+        finally:
+            self._file = None
+            self._thread_lock.release()
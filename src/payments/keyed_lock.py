@@ -0,0 +1,43 @@
+import threading
+from contextlib import ExitStack, contextmanager
+from typing import Dict, Hashable, Iterable, Iterator, List
+
+
+class KeyedLock:
+    """
+    One mutex per key, created on demand and dropped once nobody holds or waits for it.
+    Operations on different keys never block each other.
+    """
+    def __init__(self) -> None:
+        self._guard = threading.Lock()
+        self._entries: Dict[Hashable, List] = {}
+
+    @contextmanager
+    def hold(self, key: Hashable) -> Iterator[None]:
+        """Hold the lock for key for the duration of the with block."""
+        with self._guard:
+            entry = self._entries.get(key)
+            if entry is None:
+                entry = self._entries[key] = [threading.Lock(), 0]
+            entry[1] += 1
+        entry[0].acquire()
+        try:
+            yield
+        finally:
+            entry[0].release()
+            with self._guard:
+                entry[1] -= 1
+                if entry[1] == 0:
+                    del self._entries[key]
+
+    @contextmanager
+    def hold_many(self, keys: Iterable[Hashable]) -> Iterator[None]:
+        """Hold the locks for several keys, acquired in sorted order to avoid deadlocks."""
+        with ExitStack() as stack:
+            for key in sorted(set(keys)):
+                stack.enter_context(self.hold(key))
+            yield
+
+    def __len__(self) -> int:
+        with self._guard:
+            return len(self._entries)
@@ -0,0 +1,202 @@
+import threading
+import time
+from bisect import bisect_left
+from typing import Dict, List, Sequence, Tuple
+
+LabelValues = Tuple[str, ...]
+
+# Seconds, from sub-millisecond in-memory work up to multi-second full rewrites.
+LATENCY_BUCKETS = (0.0001, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+# Bytes, from a handful of payments up to a few hundred MB.
+SIZE_BUCKETS = (1e3, 1e4, 1e5, 1e6, 1e7, 1e8, 1e9)
+
+
+class Counter:
+    """Monotonic counter with optional labels."""
+    kind = "counter"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> None:
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values: Dict[LabelValues, float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, *labels: str, amount: float = 1) -> None:
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def value(self, *labels: str) -> float:
+        return self._values.get(labels, 0)
+
+    def samples(self) -> List[Tuple[str, LabelValues, Tuple[Tuple[str, str], ...], float]]:
+        with self._lock:
+            items = sorted(self._values.items())
+        return [(self.name, labels, (), value) for labels, value in items]
+
+
+class Gauge:
+    """Value that can go up and down, with optional labels."""
+    kind = "gauge"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> None:
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values: Dict[LabelValues, float] = {}
+        self._lock = threading.Lock()
+
+    def set(self, value: float, *labels: str) -> None:
+        with self._lock:
+            self._values[labels] = value
+
+    def inc(self, *labels: str, amount: float = 1) -> None:
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def dec(self, *labels: str, amount: float = 1) -> None:
+        self.inc(*labels, amount=-amount)
+
+    def value(self, *labels: str) -> float:
+        return self._values.get(labels, 0)
+
+    def samples(self) -> List[Tuple[str, LabelValues, Tuple[Tuple[str, str], ...], float]]:
+        with self._lock:
+            items = sorted(self._values.items())
+        return [(self.name, labels, (), value) for labels, value in items]
+
+
+class Histogram:
+    """Cumulative histogram with fixed buckets and optional labels."""
+    kind = "histogram"
+
+    def __init__(self, name: str, documentation: str, buckets: Sequence[float] = LATENCY_BUCKETS,
+                 labelnames: Sequence[str] = ()) -> None:
+        self.name = name
+        self.documentation = documentation
+        self.buckets = tuple(sorted(buckets))
+        self.labelnames = tuple(labelnames)
+        # labels -> [count per bucket (last is +Inf), sum]
+        self._values: Dict[LabelValues, list] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, *labels: str) -> None:
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            entry = self._values.get(labels)
+            if entry is None:
+                entry = self._values[labels] = [[0] * (len(self.buckets) + 1), 0.0]
+            entry[0][index] += 1
+            entry[1] += value
+
+    def time(self, *labels: str) -> "_Timer":
+        """Context manager observing the seconds spent in its block."""
+        return _Timer(self, labels)
+
+    def count(self, *labels: str) -> int:
+        entry = self._values.get(labels)
+        return sum(entry[0]) if entry is not None else 0
+
+    def samples(self) -> List[Tuple[str, LabelValues, Tuple[Tuple[str, str], ...], float]]:
+        with self._lock:
+            items = sorted((labels, (list(counts), total)) for labels, (counts, total) in self._values.items())
+        out = []
+        for labels, (counts, total) in items:
+            cumulative = 0
+            for bound, n in zip(self.buckets + (float("inf"),), counts):
+                cumulative += n
+                out.append((self.name + "_bucket", labels, (("le", _format_value(bound)),), cumulative))
+            out.append((self.name + "_sum", labels, (), total))
+            out.append((self.name + "_count", labels, (), cumulative))
+        return out
+
+
+class _Timer:
+    __slots__ = ("_histogram", "_labels", "_start")
+
+    def __init__(self, histogram: Histogram, labels: LabelValues) -> None:
+        self._histogram = histogram
+        self._labels = labels
+
+    def __enter__(self) -> None:
+        self._start = time.perf_counter()
+
+    def __exit__(self, *exc) -> None:
+        self._histogram.observe(time.perf_counter() - self._start, *self._labels)
+
+
+class MetricsRegistry:
+    """
+    Set of metrics rendered together in the Prometheus text exposition format.
+    Recording only touches a dict under a lock; all formatting happens when
+    render() is called, i.e. when something scrapes the metrics.
+    """
+    def __init__(self) -> None:
+        self._metrics: Dict[str, object] = {}
+
+    def counter(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Counter:
+        return self._register(Counter(name, documentation, labelnames))
+
+    def gauge(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Gauge:
+        return self._register(Gauge(name, documentation, labelnames))
+
+    def histogram(self, name: str, documentation: str, buckets: Sequence[float] = LATENCY_BUCKETS,
+                  labelnames: Sequence[str] = ()) -> Histogram:
+        return self._register(Histogram(name, documentation, buckets, labelnames))
+
+    def render(self) -> str:
+        lines = []
+        for metric in self._metrics.values():
+            lines.append(f"# HELP {metric.name} {metric.documentation}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            for sample_name, labels, extra, value in metric.samples():
+                pairs = list(zip(metric.labelnames, labels)) + list(extra)
+                label_text = "{" + ",".join(f'{k}="{_escape(v)}"' for k, v in pairs) + "}" if pairs else ""
+                lines.append(f"{sample_name}{label_text} {_format_value(value)}")
+        return "\n".join(lines) + "\n"
+
+    def _register(self, metric):
+        if metric.name in self._metrics:
+            raise ValueError(f"metric already registered: {metric.name}")
+        self._metrics[metric.name] = metric
+        return metric
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+REGISTRY = MetricsRegistry()
+
+STAGE_SECONDS = REGISTRY.histogram(
+    "payments_stage_seconds", "Time spent per stage of the payment hot path.", labelnames=("stage",))
+WRITE_SECONDS = REGISTRY.histogram(
+    "payments_write_seconds", "Latency of persisting a batch of payment changes.", labelnames=("backend",))
+FILE_BYTES = REGISTRY.histogram(
+    "payments_file_bytes", "Size of data files when they are rewritten.", SIZE_BUCKETS, labelnames=("file",))
+VALIDATIONS = REGISTRY.counter(
+    "payments_validations_total", "Pay attempts by payment method and resulting status.", ("payment_method", "status"))
+COMMITTED = REGISTRY.counter(
+    "payments_committed_total", "Persisted payment versions by payment method and status.", ("payment_method", "status"))
+PAY_QUEUE_DEPTH = REGISTRY.gauge(
+    "payments_pay_queue_depth", "Pay jobs accepted but not finished yet, by state.", ("state",))
+PAY_QUEUE_LAG_SECONDS = REGISTRY.histogram(
+    "payments_pay_queue_lag_seconds", "Time from accepting a pay job to committing its result.")
+ADMISSION_IN_FLIGHT = REGISTRY.gauge(
+    "payments_admission_in_flight", "Requests admitted and still running, by endpoint class.", ("endpoint_class",))
+ADMISSION_QUEUED = REGISTRY.gauge(
+    "payments_admission_queued", "Requests waiting for admission, by endpoint class.", ("endpoint_class",))
+ADMISSION_WAIT_SECONDS = REGISTRY.histogram(
+    "payments_admission_wait_seconds", "Time admitted requests waited in the admission queue.",
+    labelnames=("endpoint_class",))
+ADMISSION_REJECTED = REGISTRY.counter(
+    "payments_admission_rejected_total", "Requests shed with 503, by endpoint class and reason.",
+    ("endpoint_class", "reason"))
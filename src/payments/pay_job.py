@@ -0,0 +1,60 @@
+from enum import Enum
+from typing import Optional
+from pydantic import BaseModel
+from .payment import Payment
+
+
+class PayJobState(str, Enum):
+    """
+    Enum representing the lifecycle of an asynchronous pay request.
+    """
+    QUEUED = "queued"
+    PROCESSING = "processing"
+    COMPLETED = "completed"
+    REJECTED = "rejected"
+
+
+class PayJob(BaseModel):
+    """
+    A pay request accepted by the asynchronous pay pipeline.
+
+    Attributes:
+        job_id (str): Identifier to poll the job with.
+        payment_id (str): Payment to process.
+        state (PayJobState): Where the job is in the pipeline.
+        enqueued_at (float): Acceptance time, seconds since the epoch.
+        finished_at (Optional[float]): Time the result was committed.
+        status_code (Optional[int]): HTTP status the synchronous pay endpoint would have returned.
+        payment (Optional[Payment]): The PAGADO/FALLIDO payment once completed.
+        error (Optional[str]): Error detail when the job was rejected.
+    """
+    job_id: str
+    payment_id: str
+    state: PayJobState
+    enqueued_at: float
+    finished_at: Optional[float] = None
+    status_code: Optional[int] = None
+    payment: Optional[Payment] = None
+    error: Optional[str] = None
+
+    @property
+    def finished(self) -> bool:
+        return self.state in (PayJobState.COMPLETED, PayJobState.REJECTED)
+
+
+class PayQueueStats(BaseModel):
+    """
+    Snapshot of the asynchronous pay pipeline.
+
+    Attributes:
+        queued (int): Accepted jobs waiting for a worker.
+        processing (int): Jobs handed to a worker whose result is not committed yet.
+        oldest_pending_seconds (float): Age of the oldest unfinished job (0 if none).
+        workers (int): Size of the worker pool.
+        retained_results (int): Finished jobs still available for polling.
+    """
+    queued: int
+    processing: int
+    oldest_pending_seconds: float
+    workers: int
+    retained_results: int
@@ -0,0 +1,324 @@
+import asyncio
+import json
+import os
+import threading
+import time
+import zlib
+from collections import OrderedDict, deque
+from http import HTTPStatus
+from typing import Deque, Dict, Iterable, Iterator, List, Optional, Set, Tuple
+from uuid import uuid4
+from .async_payment_service import AsyncPaymentService
+from .metrics import PAY_QUEUE_DEPTH, PAY_QUEUE_LAG_SECONDS
+from .pay_job import PayJob, PayJobState, PayQueueStats
+from .payment import Payment
+from .payment_status import PaymentStatus
+
+# (job_id, payment_id, enqueued_at)
+JournalEntry = Tuple[str, str, float]
+
+
+class PayJobJournal:
+    """
+    Append-only file of accepted and finished pay jobs, so accepted jobs survive a restart.
+
+    Records use the write-ahead log line format (``<crc32> <json>``); replay stops
+    at the first torn record. Every append is fsynced before returning, because
+    an accepted job must not be lost once the client got 202. The file is rewritten
+    with only the unfinished jobs when opened and once compact_threshold records
+    have accumulated.
+    """
+    def __init__(self, path: str, compact_threshold: int = 10000) -> None:
+        self.path = path
+        self.compact_threshold = compact_threshold
+        self._file = None
+        self._records = 0
+        self._pending: "OrderedDict[str, JournalEntry]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def recover(self) -> List[JournalEntry]:
+        """Return the unfinished jobs in acceptance order and compact the file down to them."""
+        with self._lock:
+            self._pending.clear()
+            for record in self._read():
+                if record.get("op") == "enq":
+                    self._pending[record["job_id"]] = (record["job_id"], record["payment_id"], record["enqueued_at"])
+                elif record.get("op") == "done":
+                    self._pending.pop(record["job_id"], None)
+            self._compact()
+            return list(self._pending.values())
+
+    def append_enqueued(self, entries: Iterable[JournalEntry]) -> None:
+        entries = list(entries)
+        with self._lock:
+            self._append([{"op": "enq", "job_id": job_id, "payment_id": payment_id, "enqueued_at": enqueued_at}
+                          for job_id, payment_id, enqueued_at in entries])
+            for entry in entries:
+                self._pending[entry[0]] = entry
+
+    def append_finished(self, job_ids: Iterable[str]) -> None:
+        job_ids = list(job_ids)
+        with self._lock:
+            self._append([{"op": "done", "job_id": job_id} for job_id in job_ids])
+            for job_id in job_ids:
+                self._pending.pop(job_id, None)
+            if self._records >= self.compact_threshold:
+                self._compact()
+
+    def close(self) -> None:
+        with self._lock:
+            self._close()
+
+    def _append(self, records: List[dict]) -> None:
+        if not records:
+            return
+        if self._file is None:
+            self._file = open(self.path, "ab")
+        self._file.write(b"".join(_encode(record) for record in records))
+        self._file.flush()
+        os.fsync(self._file.fileno())
+        self._records += len(records)
+
+    def _compact(self) -> None:
+        """Atomically replace the file with enqueue records for the unfinished jobs only."""
+        self._close()
+        tmp_path = f"{self.path}.{os.getpid()}.tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(b"".join(_encode({"op": "enq", "job_id": job_id, "payment_id": payment_id,
+                                      "enqueued_at": enqueued_at})
+                             for job_id, payment_id, enqueued_at in self._pending.values()))
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.path)
+        self._records = len(self._pending)
+
+    def _close(self) -> None:
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    def _read(self) -> Iterator[dict]:
+        try:
+            f = open(self.path, "rb")
+        except FileNotFoundError:
+            return
+        with f:
+            for raw in f:
+                checksum, _, body = raw.rstrip(b"\n").partition(b" ")
+                try:
+                    if not raw.endswith(b"\n") or int(checksum, 16) != zlib.crc32(body):
+                        return
+                    yield json.loads(body.decode("utf-8"))
+                except ValueError:
+                    return
+
+
+class AsyncPayPipeline:
+    """
+    Accepts pay requests into a durable queue and processes them in micro-batches.
+
+    submit() journals the job and returns it as soon as it is on disk, so the
+    request path no longer waits for validation or the data file rewrite. A single
+    planner takes whatever is queued (up to max_batch_size jobs) and decides it
+    through AsyncPaymentService.begin_pay_payments, so payments are validated in
+    acceptance order, exactly as consecutive synchronous calls would be. Up to
+    `workers` decided batches wait for their storage write at once. Clients poll
+    get() or block in wait() for the result.
+
+    Unknown or non-REGISTRADO payments are rejected like the synchronous endpoint.
+    Any other failure (e.g. a storage error) puts the batch back at its place in
+    the queue, and processing resumes after retry_delay seconds.
+
+    Jobs still unfinished at shutdown or after a crash are replayed from the
+    journal on the next start. A job whose result was committed just before a
+    crash may therefore be replayed; it is then reported with the payment's
+    current state instead of being rejected as already processed.
+    Finished jobs are kept in memory for polling, up to retained_jobs.
+    """
+    def __init__(self, service: AsyncPaymentService, journal_path: str, workers: int = 4,
+                 max_batch_size: int = 64, retained_jobs: int = 100_000, retry_delay: float = 1.0) -> None:
+        self.service = service
+        self.workers = workers
+        self.max_batch_size = max_batch_size
+        self.retained_jobs = retained_jobs
+        self.retry_delay = retry_delay
+        self.journal = PayJobJournal(journal_path)
+        self._pending: "OrderedDict[str, PayJob]" = OrderedDict()
+        self._finished: "OrderedDict[str, PayJob]" = OrderedDict()
+        self._recovered: Set[str] = set()
+        self._waiters: Dict[str, List[asyncio.Future]] = {}
+        self._processing = 0
+        self._queue: Deque[PayJob] = deque()
+        self._wakeup: Optional[asyncio.Event] = None
+        self._slots: Optional[asyncio.Semaphore] = None
+        self._resume_at = 0.0
+        self._planner: Optional[asyncio.Task] = None
+        self._inflight: Set[asyncio.Task] = set()
+        for job_id, payment_id, enqueued_at in self.journal.recover():
+            self._pending[job_id] = PayJob(job_id=job_id, payment_id=payment_id, state=PayJobState.QUEUED,
+                                           enqueued_at=enqueued_at)
+            self._recovered.add(job_id)
+        self._update_depth()
+
+    async def start(self) -> None:
+        """Start the planner (it also starts on the first submit); replays recovered jobs."""
+        self._ensure_planner()
+
+    async def submit(self, payment_id: str) -> PayJob:
+        """Durably enqueue a pay request; raises KeyError if the payment does not exist."""
+        await self.service.get_payment(payment_id)
+        job = PayJob(job_id=uuid4().hex, payment_id=payment_id, state=PayJobState.QUEUED, enqueued_at=time.time())
+        await asyncio.to_thread(self.journal.append_enqueued, [(job.job_id, job.payment_id, job.enqueued_at)])
+        self._ensure_planner()
+        self._pending[job.job_id] = job
+        self._queue.append(job)
+        self._wakeup.set()
+        self._update_depth()
+        return job
+
+    def get(self, job_id: str) -> Optional[PayJob]:
+        """Return the job, or None if it is unknown or no longer retained."""
+        return self._pending.get(job_id) or self._finished.get(job_id)
+
+    async def wait(self, job_id: str, timeout: float = 0) -> Optional[PayJob]:
+        """Like get, but waits up to timeout seconds for an unfinished job to finish."""
+        job = self.get(job_id)
+        if job is None or job.finished or timeout <= 0:
+            return job
+        future = asyncio.get_running_loop().create_future()
+        self._waiters.setdefault(job_id, []).append(future)
+        try:
+            await asyncio.wait_for(future, timeout)
+        except asyncio.TimeoutError:
+            pass
+        finally:
+            waiters = self._waiters.get(job_id)
+            if waiters and future in waiters:
+                waiters.remove(future)
+                if not waiters:
+                    del self._waiters[job_id]
+        return self.get(job_id)
+
+    def stats(self) -> PayQueueStats:
+        oldest = next(iter(self._pending.values()), None)
+        return PayQueueStats(
+            queued=len(self._pending) - self._processing,
+            processing=self._processing,
+            oldest_pending_seconds=max(0.0, time.time() - oldest.enqueued_at) if oldest is not None else 0.0,
+            workers=self.workers,
+            retained_results=len(self._finished),
+        )
+
+    async def close(self) -> None:
+        """Stop planning; batches already decided are committed, queued jobs stay journaled for the next start."""
+        if self._planner is not None:
+            self._planner.cancel()
+            await asyncio.gather(self._planner, return_exceptions=True)
+            self._planner = None
+        await asyncio.gather(*self._inflight, return_exceptions=True)
+        self.journal.close()
+
+    def _ensure_planner(self) -> None:
+        loop = asyncio.get_running_loop()
+        if self._planner is not None and not self._planner.done() and self._planner.get_loop() is loop:
+            return
+        # First use, or the previous event loop is gone: queue every unfinished job again.
+        for job in self._pending.values():
+            job.state = PayJobState.QUEUED
+        self._queue = deque(self._pending.values())
+        self._processing = 0
+        self._wakeup = asyncio.Event()
+        self._slots = asyncio.Semaphore(self.workers)
+        self._planner = loop.create_task(self._plan())
+        self._update_depth()
+
+    async def _plan(self) -> None:
+        loop = asyncio.get_running_loop()
+        while True:
+            while not self._queue:
+                self._wakeup.clear()
+                await self._wakeup.wait()
+            if self._resume_at > loop.time():
+                await asyncio.sleep(self._resume_at - loop.time())
+                continue
+            await self._slots.acquire()
+            if not self._queue:
+                self._slots.release()
+                continue
+            batch = [self._queue.popleft() for _ in range(min(self.max_batch_size, len(self._queue)))]
+            for job in batch:
+                job.state = PayJobState.PROCESSING
+            self._processing += len(batch)
+            self._update_depth()
+            # The next batch is decided only once this one is; the task itself is not
+            # cancelled by close(), so a decided batch still commits and records its results.
+            decided = loop.create_future()
+            task = loop.create_task(self._process(batch, decided))
+            self._inflight.add(task)
+            task.add_done_callback(self._inflight.discard)
+            await asyncio.shield(decided)
+
+    async def _process(self, batch: List[PayJob], decided: asyncio.Future) -> None:
+        try:
+            try:
+                results, written = await self.service.begin_pay_payments([job.payment_id for job in batch])
+            finally:
+                decided.set_result(None)
+            await written
+        except Exception:
+            self._retry(batch)
+            return
+        finally:
+            self._slots.release()
+        finished_at = time.time()
+        for job, result in zip(batch, results):
+            if isinstance(result, ValueError) and job.job_id in self._recovered:
+                result = await self._replayed_result(job, result)
+            self._finish(job, result, finished_at)
+        self._processing -= len(batch)
+        self._update_depth()
+        await asyncio.to_thread(self.journal.append_finished, [job.job_id for job in batch])
+
+    def _retry(self, batch: List[PayJob]) -> None:
+        """Put a batch that failed for a reason other than its payments back in acceptance order."""
+        for job in batch:
+            job.state = PayJobState.QUEUED
+        self._processing -= len(batch)
+        self._queue = deque(job for job in self._pending.values() if job.state == PayJobState.QUEUED)
+        self._resume_at = asyncio.get_running_loop().time() + self.retry_delay
+        self._wakeup.set()
+        self._update_depth()
+
+    async def _replayed_result(self, job: PayJob, error: ValueError):
+        """A replayed job whose payment is no longer REGISTRADO was committed before the crash."""
+        try:
+            current = await self.service.get_payment(job.payment_id)
+        except KeyError:
+            return error
+        return current if current.status != PaymentStatus.REGISTRADO else error
+
+    def _finish(self, job: PayJob, result, finished_at: float) -> None:
+        self._recovered.discard(job.job_id)
+        if isinstance(result, Payment):
+            job.state, job.status_code, job.payment = PayJobState.COMPLETED, int(HTTPStatus.OK), result
+        else:
+            job.state, job.error = PayJobState.REJECTED, str(result)
+            job.status_code = int(HTTPStatus.NOT_FOUND if isinstance(result, KeyError) else HTTPStatus.BAD_REQUEST)
+        job.finished_at = finished_at
+        PAY_QUEUE_LAG_SECONDS.observe(finished_at - job.enqueued_at)
+        self._pending.pop(job.job_id, None)
+        self._finished[job.job_id] = job
+        while len(self._finished) > self.retained_jobs:
+            self._finished.popitem(last=False)
+        for future in self._waiters.pop(job.job_id, ()):
+            if not future.done() and not future.get_loop().is_closed():
+                future.set_result(None)
+
+    def _update_depth(self) -> None:
+        PAY_QUEUE_DEPTH.set(len(self._pending) - self._processing, "queued")
+        PAY_QUEUE_DEPTH.set(self._processing, "processing")
+
+
+def _encode(record: dict) -> bytes:
+    line = json.dumps(record, separators=(",", ":"), ensure_ascii=False).encode("utf-8")
+    return b"%08x %s\n" % (zlib.crc32(line), line)
@@ -0,0 +1,47 @@
+from enum import Enum
+from typing import Optional
+from pydantic import BaseModel
+from .payment import Payment
+from .payment_status import PaymentStatus
+
+
+class PaymentEventType(str, Enum):
+    """
+    Enum representing the kinds of payment state transitions.
+    """
+    CREATED = "created"
+    UPDATED = "updated"
+    PAID = "paid"
+    FAILED = "failed"
+    REVERTED = "reverted"
+
+
+class PaymentEvent(BaseModel):
+    """
+    A committed payment transition.
+
+    Attributes:
+        sequence (int): Position in the event log, increasing by one per event.
+        cursor (str): Opaque position to resume after this event ("<epoch>-<sequence>").
+        type (PaymentEventType): Kind of transition.
+        payment (Payment): The payment after the transition.
+        occurred_at (float): Commit time, seconds since the epoch.
+    """
+    sequence: int
+    cursor: str
+    type: PaymentEventType
+    payment: Payment
+    occurred_at: float
+
+
+def event_type_for(payment: Payment, previous: Optional[Payment]) -> PaymentEventType:
+    """Classify the transition from previous (None for a creation) to payment."""
+    if previous is None:
+        return PaymentEventType.CREATED
+    if previous.status == PaymentStatus.REGISTRADO and payment.status == PaymentStatus.PAGADO:
+        return PaymentEventType.PAID
+    if previous.status == PaymentStatus.REGISTRADO and payment.status == PaymentStatus.FALLIDO:
+        return PaymentEventType.FAILED
+    if previous.status == PaymentStatus.FALLIDO and payment.status == PaymentStatus.REGISTRADO:
+        return PaymentEventType.REVERTED
+    return PaymentEventType.UPDATED
@@ -0,0 +1,112 @@
+import asyncio
+import threading
+import time
+import uuid
+from typing import Iterable, List, Optional, Tuple
+from .payment import Payment
+from .payment_event import PaymentEvent, event_type_for
+
+
+class EventSequenceExpired(Exception):
+    """The requested position is no longer (or not yet) in the event log; the consumer must resync."""
+
+
+class PaymentEventLog:
+    """
+    Bounded, in-memory log of committed payment transitions (change data capture).
+
+    Every event gets the next sequence number, starting at 1. Consumers read
+    the events after the last sequence they processed, optionally waiting for
+    new ones (long polling). Only the latest `capacity` events are kept: a
+    consumer that falls further behind gets EventSequenceExpired and must resync
+    from GET /payments. Events are local to the process that committed them.
+
+    Sequences restart in every process, so positions handed to clients are
+    cursors "<epoch>-<sequence>" with an epoch unique to this log; a cursor from
+    another process or an earlier run is rejected instead of resuming at an
+    unrelated event.
+    """
+    def __init__(self, capacity: int = 100_000) -> None:
+        self.capacity = capacity
+        self.epoch = uuid.uuid4().hex[:12]
+        # Ring buffer: the event with sequence n is at n % capacity.
+        self._events: List[Optional[PaymentEvent]] = [None] * capacity
+        self._last_sequence = 0
+        self._lock = threading.Lock()
+        self._waiters: List[Tuple[asyncio.AbstractEventLoop, asyncio.Future]] = []
+
+    @property
+    def last_sequence(self) -> int:
+        """Sequence of the latest event (0 if none yet)."""
+        return self._last_sequence
+
+    def cursor(self, sequence: int) -> str:
+        """Cursor for the position after the event with this sequence (0: before the first one)."""
+        return f"{self.epoch}-{sequence}"
+
+    def parse_cursor(self, cursor: str) -> int:
+        """
+        Return the sequence of a cursor. "0" means before the first event. Raises
+        ValueError if it is malformed and EventSequenceExpired if it belongs to
+        another log (another process or an earlier run).
+        """
+        if cursor == "0":
+            return 0
+        epoch, _, sequence = cursor.rpartition("-")
+        if not epoch or not sequence.isdigit():
+            raise ValueError(f"invalid event cursor {cursor!r}")
+        if epoch != self.epoch:
+            raise EventSequenceExpired(f"cursor {cursor!r} belongs to another event log (current epoch {self.epoch})")
+        return int(sequence)
+
+    def publish(self, changes: Iterable[Tuple[Payment, Optional[Payment]]]) -> None:
+        """Append one event per committed (payment, previous) change and wake up waiting readers."""
+        now = time.time()
+        with self._lock:
+            for payment, previous in changes:
+                self._last_sequence += 1
+                self._events[self._last_sequence % self.capacity] = PaymentEvent.model_construct(
+                    sequence=self._last_sequence, cursor=self.cursor(self._last_sequence),
+                    type=event_type_for(payment, previous), payment=payment, occurred_at=now,
+                )
+            waiters, self._waiters = self._waiters, []
+        for loop, future in waiters:
+            loop.call_soon_threadsafe(_wake, future)
+
+    def read(self, after: int = 0, limit: int = 100) -> List[PaymentEvent]:
+        """Return up to limit events with sequence > after; raises EventSequenceExpired (see class docs)."""
+        with self._lock:
+            first = max(1, self._last_sequence - self.capacity + 1)
+            if after < first - 1 or after > self._last_sequence:
+                raise EventSequenceExpired(
+                    f"sequence {after} is outside the retained events ({first - 1}..{self._last_sequence})"
+                )
+            end = min(self._last_sequence, after + limit)
+            return [self._events[sequence % self.capacity] for sequence in range(after + 1, end + 1)]
+
+    async def wait_and_read(self, after: int = 0, limit: int = 100, timeout: float = 0) -> List[PaymentEvent]:
+        """Like read, but waits up to timeout seconds for events when none are available yet."""
+        events = self.read(after, limit)
+        if events or timeout <= 0:
+            return events
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        with self._lock:
+            if self._last_sequence > after:
+                future.set_result(None)
+            else:
+                self._waiters.append((loop, future))
+        try:
+            await asyncio.wait_for(future, timeout)
+        except asyncio.TimeoutError:
+            pass
+        finally:
+            with self._lock:
+                if (loop, future) in self._waiters:
+                    self._waiters.remove((loop, future))
+        return self.read(after, limit)
+
+
+def _wake(future: asyncio.Future) -> None:
+    if not future.done():
+        future.set_result(None)
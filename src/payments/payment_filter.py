@@ -0,0 +1,32 @@
+from typing import Any, Optional
+from pydantic import BaseModel
+from .payment_method import PaymentMethod
+from .payment_status import PaymentStatus
+
+
+class PaymentFilter(BaseModel):
+    """
+    Criteria for listing payments. Unset fields do not filter.
+
+    Attributes:
+        status (Optional[PaymentStatus]): Only payments with this status.
+        payment_method (Optional[PaymentMethod]): Only payments with this method.
+        min_amount (Optional[float]): Only payments with amount >= min_amount.
+        max_amount (Optional[float]): Only payments with amount <= max_amount.
+    """
+    status: Optional[PaymentStatus] = None
+    payment_method: Optional[PaymentMethod] = None
+    min_amount: Optional[float] = None
+    max_amount: Optional[float] = None
+
+    def matches(self, payment: Any) -> bool:
+        """Return True if the payment satisfies every set criterion."""
+        if self.status is not None and payment.status != self.status:
+            return False
+        if self.payment_method is not None and payment.payment_method != self.payment_method:
+            return False
+        if self.min_amount is not None and payment.amount < self.min_amount:
+            return False
+        if self.max_amount is not None and payment.amount > self.max_amount:
+            return False
+        return True
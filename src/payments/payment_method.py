@@ -1,5 +1,6 @@
 from enum import Enum
-from typing import Optional, Tuple
+from functools import lru_cache
+from typing import Dict, Iterable, List, Optional, Tuple
 
 class PaymentMethod(str, Enum):
     """
@@ -8,22 +9,52 @@ class PaymentMethod(str, Enum):
     PAYPAL = "PAYPAL"
     CREDIT_CARD = "CREDIT_CARD"
 
+def _build_aliases() -> Dict[str, PaymentMethod]:
+    """Exact spellings clients commonly send (any separator, upper/lower/title case)."""
+    aliases = {"PayPal": PaymentMethod.PAYPAL}
+    for pm in PaymentMethod:
+        for sep in ("_", "-", " "):
+            spelled = pm.value.replace("_", sep)
+            for alias in (spelled, spelled.lower(), spelled.title()):
+                aliases[alias] = pm
+    return aliases
+
+# Resolves the common spellings with a single dict lookup.
+_ALIASES = _build_aliases()
+
+@lru_cache(maxsize=1024)
+def _lookup_normalized(raw: str) -> Optional[PaymentMethod]:
+    """Memoized slow path for spellings not in _ALIASES (surrounding spaces, mixed case)."""
+    return _ALIASES.get(raw.strip().replace("-", "_").replace(" ", "_").upper())
+
+def lookup_payment_method(raw: Optional[str]) -> Optional[PaymentMethod]:
+    """
+    Same parsing as parse_payment_method, without exceptions:
+    returns the PaymentMethod or None if raw is None or not a known method.
+    """
+    pm = _ALIASES.get(raw) if isinstance(raw, str) else None
+    if pm is None and isinstance(raw, str):
+        pm = _lookup_normalized(raw)
+    return pm
+
 def parse_payment_method(raw: Optional[str]) -> PaymentMethod:
     """Case-insensitive, tolerant parsing for common variants (paypal, credit-card, credit_card)."""
     if raw is None:
         raise ValueError("payment method is None")
-    norm = raw.strip().replace("-", "_").replace(" ", "_").upper()
-    for pm in PaymentMethod:
-        if norm == pm.value:
-            return pm
-    raise ValueError(f"invalid payment method: {raw!r}")
+    pm = lookup_payment_method(raw)
+    if pm is None:
+        raise ValueError(f"invalid payment method: {raw!r}")
+    return pm
+
+def parse_payment_methods(raws: Iterable[Optional[str]]) -> List[Optional[PaymentMethod]]:
+    """Parse a column of raw values at once; invalid entries come back as None."""
+    aliases = _ALIASES
+    return [aliases.get(raw) or lookup_payment_method(raw) for raw in raws]
 
 def try_get_payment_method(raw: Optional[str]) -> Tuple[bool, Optional[PaymentMethod]]:
     """
     Attempts to parse a payment method from a raw string.
     Returns a tuple (success: bool, payment_method: Optional[PaymentMethod]).
     """
-    try:
-        return True, parse_payment_method(raw)
-    except ValueError:
-        return False, None
\ No newline at end of file
+    pm = lookup_payment_method(raw)
+    return pm is not None, pm
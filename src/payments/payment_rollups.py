@@ -0,0 +1,185 @@
+import threading
+import time
+from collections import OrderedDict
+from typing import Callable, Dict, Iterable, List, Mapping, Optional, Tuple
+from .payment import Payment
+from .payment_stats import AmountAggregate, PaymentStatsBucket, PaymentStatsGroup
+from .payment_status_counts import StatusKey
+
+
+class _Aggregate:
+    """
+    count/total/min/max of amounts, with removals. Removing the current min or max
+    makes the bounds stale: from then on min/max only cover the amounts added
+    since, until the bounds of the other payments are read again.
+    """
+    __slots__ = ("count", "total", "min", "max", "stale")
+
+    def __init__(self, aggregate: AmountAggregate = AmountAggregate()) -> None:
+        self.count, self.total, self.min, self.max = aggregate
+        self.stale = False
+
+    def add(self, amount: float) -> None:
+        self.count += 1
+        self.total += amount
+        if amount < self.min:
+            self.min = amount
+        if amount > self.max:
+            self.max = amount
+
+    def remove(self, amount: float) -> None:
+        if not self.count:
+            return
+        self.count -= 1
+        # Reset rather than subtract down to zero, so float error does not accumulate.
+        self.total = self.total - amount if self.count else 0.0
+        if not self.count:
+            self.min, self.max, self.stale = float("inf"), float("-inf"), False
+        elif amount <= self.min or amount >= self.max:
+            self.min, self.max, self.stale = float("inf"), float("-inf"), True
+
+    def bounds(self) -> Tuple[float, float]:
+        return self.min, self.max
+
+
+class PaymentRollups:
+    """
+    count, sum, min and max of amount per (payment_method, status), for the stats endpoint.
+    Kept up to date by PaymentService next to PaymentStatusCounts, so reading the
+    aggregates costs O(groups) instead of a scan of every payment, and memory is
+    O(groups) too. Removing the current min or max of a group makes the next read
+    take the group's bounds from load_bounds (the committed payments of that group,
+    one storage query), combined with the amounts added since. Transitions are
+    applied when staged, before they reach the storage, so the loaded bounds are
+    only kept once every staged transition of the group is committed (see
+    committed()); until then they are re-read on each read.
+    """
+    def __init__(self, aggregates: Mapping[StatusKey, AmountAggregate],
+                 load_bounds: Callable[[StatusKey], Optional[AmountAggregate]]) -> None:
+        self._groups: Dict[StatusKey, _Aggregate] = {key: _Aggregate(a) for key, a in aggregates.items()}
+        self._load_bounds = load_bounds
+        # Staged transitions per group that are not committed to the storage yet.
+        self._pending: Dict[StatusKey, int] = {}
+        self._lock = threading.Lock()
+
+    def move(self, previous: Optional[Payment], payment: Payment) -> None:
+        """Apply a transition from previous (None for a creation) to payment."""
+        with self._lock:
+            if previous is not None:
+                self._group((previous.payment_method, previous.status)).remove(previous.amount)
+            self._group((payment.payment_method, payment.status)).add(payment.amount)
+            self._settle(previous, payment, 1)
+
+    def undo(self, previous: Optional[Payment], payment: Payment) -> None:
+        """Revert move(previous, payment) after the transition failed to persist."""
+        with self._lock:
+            self._group((payment.payment_method, payment.status)).remove(payment.amount)
+            if previous is not None:
+                self._group((previous.payment_method, previous.status)).add(previous.amount)
+            self._settle(previous, payment, -1)
+
+    def committed(self, previous: Optional[Payment], payment: Payment) -> None:
+        """Record that the transition applied by move(previous, payment) is now in the storage."""
+        with self._lock:
+            self._settle(previous, payment, -1)
+
+    def groups(self) -> List[PaymentStatsGroup]:
+        """Non-empty groups ordered by method and status."""
+        with self._lock:
+            groups = []
+            for key, aggregate in sorted(self._groups.items(), key=lambda item: (item[0][0].value, item[0][1].value)):
+                if not aggregate.count:
+                    continue
+                low, high = aggregate.bounds()
+                if aggregate.stale:
+                    loaded = self._load_bounds(key) or AmountAggregate()
+                    low, high = min(low, loaded.min), max(high, loaded.max)
+                    if not self._pending.get(key):
+                        aggregate.min, aggregate.max, aggregate.stale = low, high, False
+                groups.append(PaymentStatsGroup(payment_method=key[0], status=key[1], count=aggregate.count,
+                                                total=aggregate.total, min_amount=low, max_amount=high))
+            return groups
+
+    def _settle(self, previous: Optional[Payment], payment: Payment, delta: int) -> None:
+        keys = {(payment.payment_method, payment.status)}
+        if previous is not None:
+            keys.add((previous.payment_method, previous.status))
+        for key in keys:
+            # Rollups rebuilt after a transition was staged never saw it; do not go below zero.
+            pending = max(0, self._pending.get(key, 0) + delta)
+            if pending:
+                self._pending[key] = pending
+            else:
+                self._pending.pop(key, None)
+
+    def _group(self, key: StatusKey) -> _Aggregate:
+        aggregate = self._groups.get(key)
+        if aggregate is None:
+            aggregate = self._groups[key] = _Aggregate()
+        return aggregate
+
+
+class PaymentActivity:
+    """
+    Per-time-bucket aggregates of the payments that entered each status
+    (created, paid, failed or reverted), keyed by (payment_method, new status).
+
+    Transitions are recorded when committed, in buckets of bucket_seconds, and the
+    latest retained_buckets are kept; queries merge them into coarser buckets.
+    Only transitions committed by this process since it started are covered.
+    """
+    def __init__(self, bucket_seconds: int = 60, retained_buckets: int = 7 * 24 * 60,
+                 clock=time.time) -> None:
+        self.bucket_seconds = bucket_seconds
+        self.retained_buckets = retained_buckets
+        self._clock = clock
+        self._buckets: "OrderedDict[int, Dict[StatusKey, _Aggregate]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def record(self, changes: Iterable[Tuple[Payment, Optional[Payment]]]) -> None:
+        """Record the committed (payment, previous) changes that moved a payment to another status."""
+        bucket_id = int(self._clock() // self.bucket_seconds)
+        with self._lock:
+            bucket = self._buckets.get(bucket_id)
+            for payment, previous in changes:
+                if previous is not None and previous.status == payment.status:
+                    continue
+                if bucket is None:
+                    bucket = self._buckets[bucket_id] = {}
+                    while len(self._buckets) > self.retained_buckets:
+                        self._buckets.popitem(last=False)
+                key = (payment.payment_method, payment.status)
+                aggregate = bucket.get(key)
+                if aggregate is None:
+                    aggregate = bucket[key] = _Aggregate()
+                aggregate.add(payment.amount)
+
+    def buckets(self, bucket_seconds: int, since: Optional[float] = None) -> List[PaymentStatsBucket]:
+        """
+        Aggregates per bucket of bucket_seconds (a multiple of the recording bucket
+        size), oldest first, for buckets starting at or after since.
+        """
+        if bucket_seconds % self.bucket_seconds:
+            raise ValueError(f"bucket must be a multiple of {self.bucket_seconds} seconds")
+        merged: Dict[Tuple[int, StatusKey], _Aggregate] = {}
+        with self._lock:
+            for bucket_id, bucket in self._buckets.items():
+                start = bucket_id * self.bucket_seconds // bucket_seconds * bucket_seconds
+                if since is not None and start < since:
+                    continue
+                for key, aggregate in bucket.items():
+                    target = merged.get((start, key))
+                    if target is None:
+                        target = merged[(start, key)] = _Aggregate()
+                    target.count += aggregate.count
+                    target.total += aggregate.total
+                    target.min = min(target.min, aggregate.min)
+                    target.max = max(target.max, aggregate.max)
+        return [_stats(PaymentStatsBucket, key, aggregate, start=float(start)) for (start, key), aggregate in
+                sorted(merged.items(), key=lambda item: (item[0][0], item[0][1][0].value, item[0][1][1].value))]
+
+
+def _stats(model, key: StatusKey, aggregate: _Aggregate, **extra):
+    low, high = aggregate.bounds()
+    return model(payment_method=key[0], status=key[1], count=aggregate.count, total=aggregate.total,
+                 min_amount=low, max_amount=high, **extra)
@@ -1,122 +1,442 @@
-import json
-from typing import Dict, Union, Optional
+import hashlib
+import threading
+from contextlib import contextmanager
+from typing import Dict, Iterable, Iterator, List, Sequence, Tuple, Union, Optional
+from .interprocess_lock import InterProcessLock
+from .keyed_lock import KeyedLock
+from .metrics import COMMITTED, STAGE_SECONDS, VALIDATIONS, WRITE_SECONDS
 from .payment import Payment
-from .payment_method import PaymentMethod, try_get_payment_method
+from .payment_event_log import PaymentEventLog
+from .payment_filter import PaymentFilter
+from .payment_method import PaymentMethod, lookup_payment_method, parse_payment_methods
+from .payment_rollups import PaymentActivity, PaymentRollups
+from .payment_stats import AmountAggregate, PaymentStats
 from .payment_status import PaymentStatus
-from .validation_strategies import PaymentMethodValidationStrategyFactory
-import os
+from .payment_status_counts import PaymentStatusCounts, StatusKey
+from .storage import BasePaymentStorage, JsonFilePaymentStorage, PaymentSnapshot
+from .validation_strategies import BasePaymentMethodValidationStrategy, PaymentMethodValidationStrategyFactory
 _validation_factory = PaymentMethodValidationStrategyFactory()
 
+# (new version, previous version or None for a creation)
+Change = Tuple[Payment, Optional[Payment]]
+# Per-item outcome of a batch call: the resulting payment or the error that rejected the item.
+BatchResult = Union[Payment, Exception]
+CreateItem = Tuple[str, float, Union[PaymentMethod, str]]
+
+
+def payment_version(payment: Payment) -> str:
+    """
+    Opaque version tag of a payment (for ETags), derived from its content so that
+    every process, before and after a restart, hands out the same tag for it.
+    """
+    return hashlib.blake2b(payment.model_dump_json().encode(), digest_size=8).hexdigest()
+
+
 class PaymentService:
     """
     Service class for managing payment operations:
     - Create, update, pay, and revert payments
-    - Persist payments to disk
+    - Persist payments through a storage backend
     - Validate payment methods and statuses
+    Safe to call from several threads: each payment id has its own lock and
+    every write goes through a single commit path.
     """
-    def __init__(self, data_path: str):
-        """Init service and load persisted payments."""
+    def __init__(self, data_path: Optional[str] = None, storage: Optional[BasePaymentStorage] = None,
+                 process_lock_path: Optional[str] = None,
+                 validation_factory: Optional[PaymentMethodValidationStrategyFactory] = None,
+                 event_log: Optional[PaymentEventLog] = None):
+        """
+        Init service on top of a storage backend.
+        Without an explicit storage, payments are kept in the JSON file at data_path.
+        With process_lock_path, several processes (e.g. uvicorn workers) can share the
+        same store: writes are serialized through that lock file and each operation
+        first picks up the changes made by the other processes.
+        validation_factory supplies the validation strategies (default rules if omitted).
+        Every committed transition is published to event_log (a new log if omitted).
+        """
+        if storage is None:
+            if data_path is None:
+                raise ValueError("data_path or storage is required")
+            storage = JsonFilePaymentStorage(data_path)
         self.data_path = data_path
-        self.payments: Dict[str, Payment] = self._load_from_disk()
+        self.storage = storage
+        self.validation_factory = validation_factory or _validation_factory
+        self.events = event_log if event_log is not None else PaymentEventLog()
+        # Built on first use, so a lazily loading storage is not scanned at startup.
+        self._status_counts: Optional[PaymentStatusCounts] = None
+        self._rollups: Optional[PaymentRollups] = None
+        # Status transitions committed by this process, per minute, for GET /payments/stats.
+        self.activity = PaymentActivity()
+        self._payment_locks = KeyedLock()
+        self._commit_lock = threading.RLock()
+        self._process_lock = InterProcessLock(process_lock_path) if process_lock_path else None
+
+    @property
+    def status_counts(self) -> PaymentStatusCounts:
+        """Counts of payments per (payment_method, status)."""
+        counts = self._status_counts
+        if counts is None:
+            with self._commit_lock:
+                if self._status_counts is None:
+                    self._status_counts = PaymentStatusCounts(self.storage.count_by_method_and_status())
+                counts = self._status_counts
+        return counts
+
+    @property
+    def rollups(self) -> PaymentRollups:
+        """Amount aggregates per (payment_method, status)."""
+        rollups = self._rollups
+        if rollups is None:
+            with self._commit_lock:
+                if self._rollups is None:
+                    self._rollups = PaymentRollups(self.storage.aggregate_by_method_and_status(), self._group_aggregate)
+                rollups = self._rollups
+        return rollups
+
+    @property
+    def is_shared(self) -> bool:
+        """True when the store is shared with other processes."""
+        return self._process_lock is not None
 
     def load_all_payments(self) -> Dict[str, Payment]:
-        """Return a shallow copy of payments."""
-        return dict(self.payments)
+        """Return all payments keyed by id."""
+        if self.is_shared:
+            self._refresh()
+        return self.storage.load_all()
+
+    def snapshot(self) -> PaymentSnapshot:
+        """
+        Return a consistent, read-only view of every payment. For the in-memory
+        backends this is the current version, taken in O(1) without copying or locking.
+        """
+        if self.is_shared:
+            self._refresh()
+        return self.storage.snapshot()
+
+    def stats(self, bucket_seconds: Optional[int] = None, since: Optional[float] = None) -> PaymentStats:
+        """
+        Count, sum, min and max of amount per payment method and status, read from the
+        rollups in O(groups). With bucket_seconds, also the transitions per time
+        bucket since the given time (see PaymentActivity); raises ValueError if
+        bucket_seconds is not a multiple of the recording bucket.
+        """
+        if self.is_shared:
+            self._refresh()
+        buckets = self.activity.buckets(bucket_seconds, since) if bucket_seconds is not None else None
+        return PaymentStats(groups=self.rollups.groups(), buckets=buckets)
+
+    def list_payments(self, payment_filter: Optional[PaymentFilter] = None, after: Optional[str] = None, limit: int = 100) -> List[Payment]:
+        """Return a page of up to limit payments matching the filter, ordered by id after the given cursor id."""
+        if self.is_shared:
+            self._refresh()
+        return self.storage.query(payment_filter or PaymentFilter(), after, limit)
+
+    def get_payment(self, payment_id: str) -> Payment:
+        """Return the payment with this id; raises KeyError if it does not exist."""
+        if self.is_shared:
+            self._refresh()
+        return self._get_payment(payment_id)
+
+    def get_versioned_payment(self, payment_id: str) -> Tuple[Payment, str]:
+        """
+        Return the payment and its version tag (see payment_version); raises KeyError
+        if it does not exist.
+        """
+        payment = self.get_payment(payment_id)
+        return payment, payment_version(payment)
 
     def create_payment(self, payment_id: str, amount: float, payment_method: Union[PaymentMethod, str]) -> Payment:
         """Create and persist a new payment."""
-        if payment_id in self.payments:
-            raise ValueError("Payment with this ID already exists")
-        if not isinstance(payment_method, PaymentMethod):
-            ok, pm = try_get_payment_method(payment_method)
-            if not ok:
-                raise ValueError("invalid payment_method")
-            payment_method = pm
-        new = Payment(payment_id=payment_id, amount=amount, payment_method=payment_method, status=PaymentStatus.REGISTRADO)
-        self._save_all_payments(payment_id, new, dict(self.payments))
+        payment_method = _resolve_payment_method(payment_method)
+        with self._payment_locks.hold(payment_id), self._exclusive():
+            new = self._new_payment(payment_id, amount, payment_method)
+            self._save_payment(new)
         return new
     
     def update_payment(self, payment_id: str, amount: Optional[float], payment_method: Optional[Union[PaymentMethod, str]]) -> Payment:
         """Update mutable fields of a registered payment."""
-        payment = self._get_payment(payment_id)
-        if payment.status == PaymentStatus.REGISTRADO:
-            if amount is not None:
-                payment.amount = amount
-            if payment_method is not None:
-                if not isinstance(payment_method, PaymentMethod):
-                    ok, pm = try_get_payment_method(payment_method)
-                    if not ok:
-                        raise ValueError("invalid payment_method")
-                    payment_method = pm
-                payment.payment_method = payment_method
-            self._save_all_payments(payment_id, payment, dict(self.payments))
-        return payment
+        with self._payment_locks.hold(payment_id), self._exclusive():
+            payment = self._get_payment(payment_id)
+            updated = self._updated_payment(payment, amount, payment_method)
+            if updated is None:
+                return payment
+            self._save_payment(updated, payment)
+        return updated
 
     def pay_payment(self, payment_id: str) -> Payment:
         """Process payment and set status to PAGADO or FALLIDO."""
-        payment = self._get_payment(payment_id)
-        if payment.status != PaymentStatus.REGISTRADO:
-            raise ValueError("Payment invalid status for payment")
-        strategy = _validation_factory.get(payment.payment_method)
-        if strategy is None:
-             raise ValueError("Invalid payment method")
-        ok = strategy.validate(payment, list(self.payments.values()))
-        payment.status = PaymentStatus.PAGADO if ok else PaymentStatus.FALLIDO
-        self._save_all_payments(payment_id, payment, dict(self.payments))
-        return payment
+        with self._payment_locks.hold(payment_id), self._exclusive():
+            payment = self._get_payment(payment_id)
+            with self._commit_lock:
+                paid = self._paid_payment(payment)
+                self._save_payment(paid, payment)
+        return paid
 
     def revert_payment(self, payment_id: str) -> Payment:
         """Revert a failed payment to REGISTRADO."""
-        payment = self._get_payment(payment_id)
-        if payment.status == PaymentStatus.FALLIDO:
-            payment.status = PaymentStatus.REGISTRADO
-            self._save_all_payments(payment_id, payment, dict(self.payments))
-        return payment
+        with self._payment_locks.hold(payment_id), self._exclusive():
+            payment = self._get_payment(payment_id)
+            reverted = self._reverted_payment(payment)
+            if reverted is None:
+                return payment
+            self._save_payment(reverted, payment)
+        return reverted
 
-    def _load_from_disk(self) -> Dict[str, Payment]:
-        """Read payments from disk, skip invalid entries."""
-        try:
-            with open(self.data_path, "r", encoding="utf-8") as f:
-                raw_data = json.load(f)
-            payments: Dict[str, Payment] = {}
-            for pid, p_data in (raw_data or {}).items():
-                try:
-                    payments[pid] = Payment(payment_id=pid, **p_data)
-                except Exception as e:
-                    continue
-
-            return payments
-
-        except FileNotFoundError:
-            return {}
-        except json.JSONDecodeError as e:
-            return {}
-        except Exception as e:
-            return {}
+    def create_payments(self, items: Sequence[CreateItem]) -> List[BatchResult]:
+        """
+        Create several payments given as (payment_id, amount, payment_method).
+        Valid items are persisted with a single storage write; each result is the
+        created Payment or the ValueError that rejected the item.
+        """
+        with self._payment_locks.hold_many(item[0] for item in items), self._exclusive(), self._commit_lock:
+            results, changes = self._plan_creates(items)
+            self._save_changes(changes)
+        return results
+
+    def pay_payments(self, payment_ids: Sequence[str]) -> List[BatchResult]:
+        """
+        Process several payments in order, as consecutive pay_payment calls would.
+        Changes are persisted with a single storage write; each result is the
+        PAGADO/FALLIDO Payment or the ValueError/KeyError that rejected the item.
+        """
+        with self._payment_locks.hold_many(payment_ids), self._exclusive(), self._commit_lock:
+            results, changes = self._plan_pays(payment_ids)
+            self._save_changes(changes)
+        return results
+
+    def import_payments(self, payments: Sequence[Payment]) -> List[BatchResult]:
+        """
+        Insert already validated payments, in any status, with a single storage write
+        (bulk loads and migrations). Each result is the payment or the ValueError that
+        rejected it because its id already exists or repeats within the batch.
+        """
+        with self._payment_locks.hold_many(p.payment_id for p in payments), self._exclusive(), self._commit_lock:
+            results, changes = self._plan_imports(payments)
+            self._save_changes(changes)
+        return results
+
+    def validate_payments(self, payments: Sequence[Payment]) -> List[bool]:
+        """
+        Dry run: whether each payment would pass validation against the current counts.
+        Payments are evaluated column-wise per method and nothing is saved; payments
+        without a strategy are reported invalid.
+        """
+        results = [False] * len(payments)
+        with self._commit_lock:
+            counts = self.status_counts
+            for strategy, positions in self._group_by_strategy(payments).items():
+                group = [payments[i] for i in positions]
+                for i, ok in zip(positions, strategy.validate_batch(group, counts)):
+                    results[i] = ok
+        return results
+
+    def close(self) -> None:
+        """Release the storage backend."""
+        self.storage.close()
+
+    @contextmanager
+    def _exclusive(self) -> Iterator[None]:
+        """Serialize a write with other processes, after picking up their changes."""
+        if self._process_lock is None:
+            yield
+            return
+        with self._process_lock:
+            self._refresh()
+            yield
+
+    def _refresh(self) -> None:
+        """Reload state changed by other processes and rebuild the counts if needed."""
+        with self._commit_lock:
+            if self.storage.refresh():
+                self._status_counts = None
+                self._rollups = None
+
+    def _group_aggregate(self, key: StatusKey) -> Optional[AmountAggregate]:
+        """Committed amount aggregate of one (payment_method, status) group."""
+        return self.storage.aggregate_by_method_and_status(PaymentFilter(payment_method=key[0], status=key[1])).get(key)
 
     def _get_payment(self, payment_id: str) -> Payment:
         """Return payment by id or raise KeyError."""
-        if payment_id not in self.payments:
+        payment = self.storage.get(payment_id)
+        if payment is None:
             raise KeyError("Payment not found")
-        return self.payments[payment_id]
-    
-    def _save_all_payments(self, payment_id: str, payment: Payment, payments_dict: Dict[str, Payment]) -> None:
-        """Persist payments to disk (overwrites file)."""
-        payments_dict[payment_id] = payment
-        self.payments = payments_dict
-        serializable_data = {}
-
-        for pid, p in self.payments.items():
-            if hasattr(p, "model_dump"):
-                data = p.model_dump()
-            elif hasattr(p, "dict"):
-                data = p.dict()  # type: ignore[attr-defined]
+        return payment
+
+    def _new_payment(self, payment_id: str, amount: float, payment_method: PaymentMethod) -> Payment:
+        """Build a REGISTRADO payment for an unused id (not saved)."""
+        if self.storage.contains(payment_id):
+            raise ValueError("Payment with this ID already exists")
+        return Payment(payment_id=payment_id, amount=amount, payment_method=payment_method, status=PaymentStatus.REGISTRADO)
+
+    def _updated_payment(self, payment: Payment, amount: Optional[float], payment_method: Optional[Union[PaymentMethod, str]]) -> Optional[Payment]:
+        """Return a copy of payment with the changes applied, or None if it is not REGISTRADO."""
+        if payment.status != PaymentStatus.REGISTRADO:
+            return None
+        changes = {}
+        if amount is not None:
+            changes["amount"] = amount
+        if payment_method is not None:
+            changes["payment_method"] = _resolve_payment_method(payment_method)
+        return payment.model_copy(update=changes)
+
+    def _paid_payment(self, payment: Payment, payment_rules_ok: Optional[bool] = None) -> Payment:
+        """
+        Validate a REGISTRADO payment and return a PAGADO or FALLIDO copy (not saved).
+        Validation reads counts shared by every payment of the method, so callers hold
+        the commit lock until the resulting transition is staged.
+        payment_rules_ok is the batch result of strategy.check_payment_rules, if known.
+        """
+        if payment.status != PaymentStatus.REGISTRADO:
+            raise ValueError("Payment invalid status for payment")
+        strategy = self.validation_factory.get(payment.payment_method)
+        if strategy is None:
+            raise ValueError("Invalid payment method")
+        with STAGE_SECONDS.time("validation"):
+            if payment_rules_ok is None:
+                ok = strategy.validate(payment, self.status_counts)
             else:
-                data = vars(p)
+                ok = payment_rules_ok and strategy.check_count_rules(payment, self.status_counts)
+        new_status = PaymentStatus.PAGADO if ok else PaymentStatus.FALLIDO
+        VALIDATIONS.inc(payment.payment_method.value, new_status.value)
+        return payment.model_copy(update={"status": new_status})
+
+    def _reverted_payment(self, payment: Payment) -> Optional[Payment]:
+        """Return a REGISTRADO copy of a FALLIDO payment, or None for any other status."""
+        if payment.status != PaymentStatus.FALLIDO:
+            return None
+        return payment.model_copy(update={"status": PaymentStatus.REGISTRADO})
+
+    def _save_payment(self, payment: Payment, previous: Optional[Payment] = None) -> None:
+        """
+        Commit path: persist a payment and stage its transition.
+        Payments are never mutated in place, so readers only ever see committed versions.
+        """
+        with self._commit_lock:
+            self._stage(payment, previous)
+            try:
+                self._write([(payment, previous)])
+            except Exception:
+                self._unstage(payment, previous)
+                raise
+
+    def _plan_creates(self, items: Iterable[CreateItem]) -> Tuple[List[BatchResult], List[Change]]:
+        """Decide and stage a batch of creations (commit lock held)."""
+        items = list(items)
+        methods = parse_payment_methods([item[2] for item in items])
+        results: List[BatchResult] = []
+        created: Dict[str, Payment] = {}
+        for (payment_id, amount, _), payment_method in zip(items, methods):
+            try:
+                if payment_id in created:
+                    raise ValueError("Payment with this ID already exists")
+                if payment_method is None:
+                    raise ValueError("invalid payment_method")
+                new = self._new_payment(payment_id, amount, payment_method)
+            except ValueError as e:
+                results.append(e)
+                continue
+            self._stage(new, None)
+            created[payment_id] = new
+            results.append(new)
+        return results, [(p, None) for p in created.values()]
+
+    def _plan_imports(self, payments: Iterable[Payment]) -> Tuple[List[BatchResult], List[Change]]:
+        """Decide and stage a batch of imported payments (commit lock held)."""
+        results: List[BatchResult] = []
+        imported: Dict[str, Payment] = {}
+        for payment in payments:
+            if payment.payment_id in imported or self.storage.contains(payment.payment_id):
+                results.append(ValueError("Payment with this ID already exists"))
+                continue
+            self._stage(payment, None)
+            imported[payment.payment_id] = payment
+            results.append(payment)
+        return results, [(p, None) for p in imported.values()]
+
+    def _plan_pays(self, payment_ids: Iterable[str]) -> Tuple[List[BatchResult], List[Change]]:
+        """
+        Decide and stage a batch of payments in order (commit lock held).
+        Rules that depend only on the payment are evaluated for the whole batch up
+        front; count-dependent rules run per item, as each transition moves the counts.
+        """
+        payment_ids = list(payment_ids)
+        fetched = {pid: self.storage.get(pid) for pid in dict.fromkeys(payment_ids)}
+        registered = [p for p in fetched.values() if p is not None and p.status == PaymentStatus.REGISTRADO]
+        payment_rules: Dict[str, bool] = {}
+        for strategy, positions in self._group_by_strategy(registered).items():
+            group = [registered[i] for i in positions]
+            payment_rules.update(zip((p.payment_id for p in group), strategy.check_payment_rules(group)))
+        results: List[BatchResult] = []
+        latest: Dict[str, Change] = {}
+        for payment_id in payment_ids:
+            try:
+                if payment_id in latest:
+                    payment = latest[payment_id][0]
+                elif fetched[payment_id] is None:
+                    raise KeyError("Payment not found")
+                else:
+                    payment = fetched[payment_id]
+                paid = self._paid_payment(payment, payment_rules.get(payment_id))
+            except (ValueError, KeyError) as e:
+                results.append(e)
+                continue
+            self._stage(paid, payment)
+            latest[payment_id] = (paid, payment)
+            results.append(paid)
+        return results, list(latest.values())
+
+    def _group_by_strategy(self, payments: Sequence[Payment]) -> Dict[BasePaymentMethodValidationStrategy, List[int]]:
+        """Positions of payments grouped by validation strategy; payments without one are left out."""
+        groups: Dict[BasePaymentMethodValidationStrategy, List[int]] = {}
+        for i, payment in enumerate(payments):
+            strategy = self.validation_factory.get(payment.payment_method)
+            if strategy is not None:
+                groups.setdefault(strategy, []).append(i)
+        return groups
+
+    def _save_changes(self, changes: List[Change]) -> None:
+        """Persist already staged changes in one write, undoing the staging on failure."""
+        if not changes:
+            return
+        try:
+            self._write(changes)
+        except Exception:
+            for payment, previous in reversed(changes):
+                self._unstage(payment, previous)
+            raise
+
+    def _write(self, changes: List[Change]) -> None:
+        """Persist changes with one storage write, then record and publish them."""
+        with WRITE_SECONDS.time(type(self.storage).__name__):
+            self.storage.save_many(payment for payment, _ in changes)
+        rollups = self._rollups
+        for payment, previous in changes:
+            COMMITTED.inc(payment.payment_method.value, payment.status.value)
+            if rollups is not None:
+                rollups.committed(previous, payment)
+        self.activity.record(changes)
+        self.events.publish(changes)
+
+    def _stage(self, payment: Payment, previous: Optional[Payment]) -> None:
+        """Apply a transition from previous (None for a creation) to the in-memory indexes."""
+        self.status_counts.move(_status_key(previous), payment)
+        self.rollups.move(previous, payment)
+
+    def _unstage(self, payment: Payment, previous: Optional[Payment]) -> None:
+        """Undo _stage after the transition failed to persist."""
+        self.status_counts.remove(payment.payment_method, payment.status)
+        if previous is not None:
+            self.status_counts.add(previous.payment_method, previous.status)
+        self.rollups.undo(previous, payment)
+
 
-            data.pop("payment_id", None)
+def _resolve_payment_method(payment_method: Union[PaymentMethod, str]) -> PaymentMethod:
+    """Return payment_method as a PaymentMethod or raise ValueError."""
+    pm = lookup_payment_method(payment_method)
+    if pm is None:
+        raise ValueError("invalid payment_method")
+    return pm
 
-            serializable_data[pid] = data
 
-        with open(self.data_path, "w", encoding="utf-8") as f:
-            json.dump(serializable_data, f, indent=4, ensure_ascii=False)
\ No newline at end of file
+def _status_key(payment: Optional[Payment]) -> Optional[StatusKey]:
+    return (payment.payment_method, payment.status) if payment is not None else None
@@ -0,0 +1,70 @@
+from typing import Any, Dict, Iterable, List, NamedTuple, Optional, Tuple
+from pydantic import BaseModel
+from .payment_method import PaymentMethod
+from .payment_status import PaymentStatus
+
+
+class AmountAggregate(NamedTuple):
+    """count, sum, min and max of the amounts of a group of payments (min/max are inf/-inf when empty)."""
+    count: int = 0
+    total: float = 0.0
+    min: float = float("inf")
+    max: float = float("-inf")
+
+    def add(self, amount: float) -> "AmountAggregate":
+        return AmountAggregate(self.count + 1, self.total + amount, min(self.min, amount), max(self.max, amount))
+
+    def merge(self, other: "AmountAggregate") -> "AmountAggregate":
+        return AmountAggregate(self.count + other.count, self.total + other.total,
+                               min(self.min, other.min), max(self.max, other.max))
+
+
+def aggregate_amounts(payments: Iterable[Any]) -> Dict[Tuple[PaymentMethod, PaymentStatus], AmountAggregate]:
+    """Aggregate the amounts of payments per (payment_method, status) by scanning them."""
+    aggregates: Dict[Tuple[PaymentMethod, PaymentStatus], AmountAggregate] = {}
+    for p in payments:
+        key = (p.payment_method, p.status)
+        aggregates[key] = aggregates.get(key, AmountAggregate()).add(p.amount)
+    return aggregates
+
+
+class PaymentStatsGroup(BaseModel):
+    """
+    Aggregates of amount for one payment method and status.
+
+    Attributes:
+        payment_method (PaymentMethod): Method of the payments in the group.
+        status (PaymentStatus): Status of the payments in the group.
+        count (int): Number of payments.
+        total (float): Sum of their amounts.
+        min_amount (float): Smallest amount.
+        max_amount (float): Largest amount.
+    """
+    payment_method: PaymentMethod
+    status: PaymentStatus
+    count: int
+    total: float
+    min_amount: float
+    max_amount: float
+
+
+class PaymentStatsBucket(PaymentStatsGroup):
+    """
+    Aggregates of the payments that entered a status during one time bucket.
+
+    Attributes:
+        start (float): Start of the bucket, seconds since the epoch.
+    """
+    start: float
+
+
+class PaymentStats(BaseModel):
+    """
+    Response of GET /payments/stats.
+
+    Attributes:
+        groups (List[PaymentStatsGroup]): Current payments by method and status.
+        buckets (Optional[List[PaymentStatsBucket]]): Status transitions per time bucket, when requested.
+    """
+    groups: List[PaymentStatsGroup]
+    buckets: Optional[List[PaymentStatsBucket]] = None
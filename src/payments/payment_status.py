@@ -1,5 +1,5 @@
 from enum import Enum
-from typing import Optional, Tuple
+from typing import Dict, Iterable, List, Optional, Tuple
 
 class PaymentStatus(str, Enum):
     """
@@ -9,28 +9,45 @@ class PaymentStatus(str, Enum):
     PAGADO = "PAGADO"
     FALLIDO = "FALLIDO"
 
+_BY_VALUE: Dict[str, PaymentStatus] = {ps.value: ps for ps in PaymentStatus}
+
+def lookup_payment_status(raw: Optional[str]) -> Optional[PaymentStatus]:
+    """
+    Same parsing as parse_payment_status, without exceptions:
+    returns the PaymentStatus or None if raw is None, empty or not an exact value.
+    """
+    if not isinstance(raw, str):
+        return None
+    ps = _BY_VALUE.get(raw)
+    if ps is None:
+        ps = _BY_VALUE.get(raw.strip())
+    return ps
+
 def parse_payment_status(raw: Optional[str]) -> PaymentStatus:
     """
     Returns the PaymentStatus if the string matches exactly one of the enum values (after strip).
-    Raises ValueError if the string is null, empty, or does not match any enum value.
+    Raises ValueError if the value is null, not a string, empty, or does not match any enum value.
     """
     if raw is None:
         raise ValueError("payment status is None")
-    key = raw.strip()
-    if not key:
+    if not isinstance(raw, str):
+        raise ValueError(f"invalid payment status: {raw!r}")
+    ps = lookup_payment_status(raw)
+    if ps is not None:
+        return ps
+    if not raw.strip():
         raise ValueError("payment status is empty")
-    for ps in PaymentStatus:
-        if key == ps.value:
-            return ps
     raise ValueError(f"invalid payment status: {raw!r}")
 
+def parse_payment_statuses(raws: Iterable[Optional[str]]) -> List[Optional[PaymentStatus]]:
+    """Parse a column of raw values at once; invalid entries come back as None."""
+    by_value = _BY_VALUE
+    return [by_value.get(raw) or lookup_payment_status(raw) for raw in raws]
+
 def try_get_payment_status(raw: Optional[str]) -> Tuple[bool, Optional[PaymentStatus]]:
     """
     Wraps parse_payment_status: returns (True, PaymentStatus) if parsing succeeded,
     or (False, None) if it failed (does not propagate the exception).
     """
-    try:
-        ps = parse_payment_status(raw)
-        return True, ps
-    except ValueError:
-        return False, None
\ No newline at end of file
+    ps = lookup_payment_status(raw)
+    return ps is not None, ps
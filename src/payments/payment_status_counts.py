@@ -0,0 +1,52 @@
+from typing import Any, Dict, Iterable, Optional, Tuple
+from .payment import Payment
+from .payment_method import PaymentMethod
+from .payment_status import PaymentStatus
+
+StatusKey = Tuple[PaymentMethod, PaymentStatus]
+
+
+class PaymentStatusCounts:
+    """
+    Number of payments per (payment_method, status).
+    Kept up to date by PaymentService on every transition so validation
+    strategies can query it in O(1) instead of scanning all payments.
+    """
+    def __init__(self, counts: Optional[Dict[StatusKey, int]] = None) -> None:
+        self._counts: Dict[StatusKey, int] = {k: v for k, v in (counts or {}).items() if v}
+
+    @classmethod
+    def from_payments(cls, payments: Iterable[Any]) -> "PaymentStatusCounts":
+        """Build the counts by scanning payments."""
+        counts = cls()
+        for p in payments:
+            counts.add(p.payment_method, p.status)
+        return counts
+
+    def count(self, payment_method: Any, status: Any) -> int:
+        """Return the number of payments with this method and status."""
+        return self._counts.get((payment_method, status), 0)
+
+    def add(self, payment_method: Any, status: Any) -> None:
+        """Register one more payment with this method and status."""
+        key = (payment_method, status)
+        self._counts[key] = self._counts.get(key, 0) + 1
+
+    def remove(self, payment_method: Any, status: Any) -> None:
+        """Forget one payment with this method and status."""
+        key = (payment_method, status)
+        left = self._counts.get(key, 0) - 1
+        if left > 0:
+            self._counts[key] = left
+        else:
+            self._counts.pop(key, None)
+
+    def move(self, previous: Optional[StatusKey], payment: Payment) -> None:
+        """Apply a transition from previous (method, status), or a creation if None."""
+        if previous is not None:
+            self.remove(*previous)
+        self.add(payment.payment_method, payment.status)
+
+    def as_dict(self) -> Dict[StatusKey, int]:
+        """Return a copy of the non-zero counts."""
+        return dict(self._counts)
@@ -0,0 +1,25 @@
+# src/payments/storage/__init__.py
+
+from .base_payment_storage import BasePaymentStorage
+from .payment_snapshot import PaymentSnapshot
+from .json_file_payment_storage import JsonFilePaymentStorage
+from .write_ahead_log import WriteAheadLog
+from .write_ahead_log_payment_storage import WriteAheadLogPaymentStorage
+from .binary_file_payment_storage import BinaryFilePaymentStorage
+from .sqlite_payment_storage import SQLitePaymentStorage
+from .payment_archive import PaymentArchive
+from .archiving_payment_storage import ArchivingPaymentStorage
+from .payment_storage_factory import create_payment_storage
+
+__all__ = [
+    "BasePaymentStorage",
+    "PaymentSnapshot",
+    "JsonFilePaymentStorage",
+    "WriteAheadLog",
+    "WriteAheadLogPaymentStorage",
+    "BinaryFilePaymentStorage",
+    "SQLitePaymentStorage",
+    "PaymentArchive",
+    "ArchivingPaymentStorage",
+    "create_payment_storage",
+]
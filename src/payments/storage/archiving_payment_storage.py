@@ -0,0 +1,135 @@
+from heapq import merge
+from typing import Dict, Iterable, List, Optional, Tuple
+from ..payment import Payment
+from ..payment_filter import PaymentFilter
+from ..payment_method import PaymentMethod
+from ..payment_status import PaymentStatus
+from ..payment_stats import AmountAggregate
+from .base_payment_storage import BasePaymentStorage
+from .compact_payment import CompactPayment
+from .payment_archive import PaymentArchive
+
+_SETTLED = PaymentFilter(status=PaymentStatus.PAGADO)
+
+
+class ArchivingPaymentStorage(BasePaymentStorage):
+    """
+    Splits payments between a hot backend and a PaymentArchive.
+
+    PAGADO payments never change again, so once segment_size of them have
+    accumulated in the hot backend they are written to a new compressed archive
+    segment and deleted from it. The hot working set (rewritten on saves, held
+    in memory by the file backends) then only holds REGISTRADO and FALLIDO
+    payments plus recently settled ones. Reads by id, listings and counts cover
+    both parts transparently; a payment is archived before it is deleted from
+    the hot backend, and the hot copy wins while both exist.
+    """
+    def __init__(self, hot: BasePaymentStorage, archive: PaymentArchive, segment_size: int = 10000) -> None:
+        self.hot = hot
+        self.archive = archive
+        self.segment_size = segment_size
+        # PAGADO payments waiting in the hot backend; None until first needed.
+        self._settled_in_hot: Optional[int] = None
+
+    def load_all(self) -> Dict[str, Payment]:
+        payments = {p.payment_id: p.to_payment() for p in self.archive.iter_all()}
+        payments.update(self.hot.load_all())
+        return payments
+
+    def get(self, payment_id: str) -> Optional[Payment]:
+        payment = self.hot.get(payment_id)
+        if payment is None:
+            record = self.archive.get(payment_id)
+            payment = record.to_payment() if record is not None else None
+        return payment
+
+    def contains(self, payment_id: str) -> bool:
+        return payment_id in self.archive or self.hot.contains(payment_id)
+
+    def query(self, payment_filter: PaymentFilter, after: Optional[str] = None, limit: int = 100) -> List[Payment]:
+        hot = self.hot.query(payment_filter, after, limit)
+        archived = [r.to_payment() for r in self.archive.query(payment_filter, after, limit)]
+        result: List[Payment] = []
+        last_id = None
+        for payment in merge(hot, archived, key=lambda p: p.payment_id):
+            if payment.payment_id != last_id:
+                result.append(payment)
+                last_id = payment.payment_id
+        return result[:limit]
+
+    def count_by_method_and_status(self) -> Dict[Tuple[PaymentMethod, PaymentStatus], int]:
+        counts = self.hot.count_by_method_and_status()
+        self._settled_in_hot = sum(n for (_, status), n in counts.items() if status == PaymentStatus.PAGADO)
+        for key, n in self.archive.count_by_method_and_status().items():
+            counts[key] = counts.get(key, 0) + n
+        # Ids in both parts (archived, not yet deleted from the hot backend) are counted once.
+        for p in self._overlapping_payments():
+            counts[(p.payment_method, p.status)] -= 1
+        return counts
+
+    def aggregate_by_method_and_status(self, payment_filter: Optional[PaymentFilter] = None
+                                       ) -> Dict[Tuple[PaymentMethod, PaymentStatus], AmountAggregate]:
+        aggregates = self.hot.aggregate_by_method_and_status(payment_filter)
+        for key, aggregate in self.archive.aggregate_by_method_and_status(payment_filter).items():
+            aggregates[key] = aggregates.get(key, AmountAggregate()).merge(aggregate)
+        # Payments in both parts have the same amount in each, so only count and total are off.
+        for p in self._overlapping_payments():
+            key = (p.payment_method, p.status)
+            if key in aggregates and (payment_filter is None or payment_filter.matches(p)):
+                count, total, low, high = aggregates[key]
+                aggregates[key] = AmountAggregate(count - 1, total - p.amount, low, high)
+        return {key: aggregate for key, aggregate in aggregates.items() if aggregate.count}
+
+    def save(self, payment: Payment) -> None:
+        self.save_many([payment])
+
+    def save_many(self, payments: Iterable[Payment]) -> None:
+        payments = list(payments)
+        self.hot.save_many(payments)
+        if self._settled_in_hot is None:
+            self._settled_in_hot = sum(n for (_, status), n in self.hot.count_by_method_and_status().items()
+                                       if status == PaymentStatus.PAGADO)
+        else:
+            self._settled_in_hot += sum(1 for p in payments if p.status == PaymentStatus.PAGADO)
+        if self._settled_in_hot >= self.segment_size:
+            self.archive_settled()
+
+    def archive_settled(self, min_payments: Optional[int] = None) -> int:
+        """
+        Move settled payments from the hot backend into a new archive segment when
+        at least min_payments (default segment_size) are waiting; returns how many moved.
+        """
+        settled = self._settled_hot_payments()
+        self._settled_in_hot = len(settled)
+        if not settled or len(settled) < (self.segment_size if min_payments is None else min_payments):
+            return 0
+        self.archive.add_segment(CompactPayment.from_payment(p) for p in settled)
+        self.hot.delete_many(p.payment_id for p in settled)
+        self._settled_in_hot = 0
+        return len(settled)
+
+    def refresh(self) -> bool:
+        archive_changed = self.archive.refresh()
+        hot_changed = self.hot.refresh()
+        if hot_changed or archive_changed:
+            self._settled_in_hot = None
+        return hot_changed or archive_changed
+
+    def close(self) -> None:
+        self.hot.close()
+
+    def _settled_hot_payments(self) -> List[Payment]:
+        settled: List[Payment] = []
+        after = None
+        while True:
+            page = self.hot.query(_SETTLED, after, 1000)
+            settled.extend(page)
+            if len(page) < 1000:
+                return settled
+            after = page[-1].payment_id
+
+    def _overlapping_payments(self) -> List[Payment]:
+        """Settled payments in both parts: archived, but not deleted from the hot backend yet."""
+        if not len(self.archive) or self._settled_in_hot == 0:
+            return []
+        return [p for p in self._settled_hot_payments() if p.payment_id in self.archive]
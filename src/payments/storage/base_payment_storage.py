@@ -0,0 +1,128 @@
+import os
+from abc import ABC, abstractmethod
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+from ..payment import Payment
+from ..payment_filter import PaymentFilter
+from ..payment_method import PaymentMethod
+from ..payment_stats import AmountAggregate, aggregate_amounts
+from ..payment_status import PaymentStatus
+from .compact_payment import CompactPayment
+from .payment_snapshot import PaymentSnapshot
+
+
+class BasePaymentStorage(ABC):
+    """
+    Persistence backend used by PaymentService.
+    """
+    @abstractmethod
+    def load_all(self) -> Dict[str, Payment]:
+        """Return every stored payment keyed by id."""
+        raise NotImplementedError
+
+    def snapshot(self) -> PaymentSnapshot:
+        """
+        Return a consistent, read-only view of every payment that later writes do
+        not affect. In-memory backends return their current version in O(1);
+        this default copies load_all().
+        """
+        return PaymentSnapshot.from_records({pid: CompactPayment.from_payment(p) for pid, p in self.load_all().items()})
+
+    @abstractmethod
+    def get(self, payment_id: str) -> Optional[Payment]:
+        """Return the payment with this id or None."""
+        raise NotImplementedError
+
+    @abstractmethod
+    def save(self, payment: Payment) -> None:
+        """Insert or replace a payment."""
+        raise NotImplementedError
+
+    def save_many(self, payments: Iterable[Payment]) -> None:
+        """Insert or replace several payments."""
+        for payment in payments:
+            self.save(payment)
+
+    def delete_many(self, payment_ids: Iterable[str]) -> None:
+        """Remove payments by id; unknown ids are ignored. Optional for backends."""
+        raise NotImplementedError(f"{type(self).__name__} does not support deleting payments")
+
+    def contains(self, payment_id: str) -> bool:
+        """Return True if a payment with this id is stored."""
+        return self.get(payment_id) is not None
+
+    @property
+    def in_memory(self) -> bool:
+        """
+        True when get and contains are answered from memory, without I/O or waiting,
+        so callers on an event loop may use them directly.
+        """
+        return False
+
+    def query(self, payment_filter: PaymentFilter, after: Optional[str] = None, limit: int = 100) -> List[Payment]:
+        """
+        Return up to limit payments matching the filter, ordered by payment_id and
+        starting after the given id (keyset pagination).
+        """
+        matching = sorted(
+            (p for pid, p in self.load_all().items()
+             if (after is None or pid > after) and payment_filter.matches(p)),
+            key=lambda p: p.payment_id,
+        )
+        return matching[:limit]
+
+    def refresh(self) -> bool:
+        """
+        Pick up changes written by other processes sharing the same store.
+        Returns True if anything changed since the last load or write.
+        """
+        return False
+
+    def count_by_method_and_status(self) -> Dict[Tuple[PaymentMethod, PaymentStatus], int]:
+        """Return the number of payments per (payment_method, status)."""
+        counts: Dict[Tuple[PaymentMethod, PaymentStatus], int] = {}
+        for p in self.load_all().values():
+            key = (p.payment_method, p.status)
+            counts[key] = counts.get(key, 0) + 1
+        return counts
+
+    def aggregate_by_method_and_status(self, payment_filter: Optional[PaymentFilter] = None
+                                       ) -> Dict[Tuple[PaymentMethod, PaymentStatus], AmountAggregate]:
+        """Return count, sum, min and max of amount per (payment_method, status) of the matching payments."""
+        payment_filter = payment_filter or PaymentFilter()
+        return aggregate_amounts(p for p in self.load_all().values() if payment_filter.matches(p))
+
+    def close(self) -> None:
+        """Release resources held by the backend."""
+
+
+def file_signature(path: str) -> Optional[Tuple[int, int, int]]:
+    """Return (inode, mtime_ns, size) of a file, or None if it does not exist."""
+    try:
+        st = os.stat(path)
+    except FileNotFoundError:
+        return None
+    return (st.st_ino, st.st_mtime_ns, st.st_size)
+
+
+def payment_to_record(p: Payment) -> Dict[str, Any]:
+    """Return the JSON-ready fields of a payment (without its id)."""
+    if hasattr(p, "model_dump"):
+        data = p.model_dump()
+    elif hasattr(p, "dict"):
+        data = p.dict()  # type: ignore[attr-defined]
+    else:
+        data = dict(vars(p))
+
+    data.pop("payment_id", None)
+    return data
+
+
+def records_to_payments(raw_data: Optional[Dict[str, Dict[str, Any]]]) -> Dict[str, Payment]:
+    """Build payments from {id: fields} records, skipping invalid entries."""
+    payments: Dict[str, Payment] = {}
+    for pid, p_data in (raw_data or {}).items():
+        try:
+            payments[pid] = Payment(payment_id=pid, **p_data)
+        except Exception:
+            continue
+    return payments
@@ -0,0 +1,32 @@
+from typing import Dict, Iterable
+from ..metrics import FILE_BYTES, STAGE_SECONDS
+from ..payment import Payment
+from .binary_snapshot import SnapshotFormatError, encode_snapshot, read_snapshot
+from .compact_payment import CompactPayment
+from .json_file_payment_storage import JsonFilePaymentStorage
+
+
+class BinaryFilePaymentStorage(JsonFilePaymentStorage):
+    """
+    Same in-memory store as JsonFilePaymentStorage, persisted as a binary snapshot
+    (see binary_snapshot) instead of indented JSON: smaller files and much cheaper
+    encoding and loading. Existing payments.json files can be converted with
+    python -m payments.storage.snapshot_converter.
+    """
+    def __init__(self, data_path: str) -> None:
+        super().__init__(data_path)
+
+    def _persist(self, changed: Iterable[Payment], deleted: Iterable[str] = ()) -> None:
+        """Rewrite the whole snapshot (see JsonFilePaymentStorage._persist)."""
+        with STAGE_SECONDS.time("serialization"):
+            encoded = encode_snapshot(self._snapshot.values())
+        FILE_BYTES.observe(len(encoded), "binary")
+        self._write_file(encoded)
+
+    def _load_from_disk(self) -> Dict[str, CompactPayment]:
+        """Read payments from disk; a missing or invalid file loads as empty."""
+        try:
+            with STAGE_SECONDS.time("load"):
+                return read_snapshot(self.data_path)
+        except (OSError, SnapshotFormatError):
+            return {}
@@ -0,0 +1,154 @@
+"""
+Binary snapshot format for payments, plus converters to and from payments.json.
+
+Layout (little endian):
+    header   "PAYS" | version u16 | n_methods u8 | n_statuses u8 | count u32
+    tables   n_methods, then n_statuses names, each as len u8 + utf-8 bytes
+    records  count times: id_len u16 | amount f64 | method u8 | status u8 | id utf-8
+
+Method and status codes index the tables stored in the file, so snapshots stay
+readable if the enums gain members or change order. Reads go through a memory
+map: fixed-size fields are unpacked in place and only ids are copied out.
+
+Use python -m payments.storage.snapshot_converter to convert files from the shell.
+"""
+import json
+import mmap
+import os
+import struct
+from typing import Dict, IO, Iterable, Iterator, List, Mapping
+from ..payment_method import PaymentMethod
+from ..payment_status import PaymentStatus
+from .compact_payment import CompactPayment, records_to_compact
+
+MAGIC = b"PAYS"
+VERSION = 1
+_HEADER = struct.Struct("<4sHBBI")
+_RECORD = struct.Struct("<HdBB")
+_METHODS = tuple(PaymentMethod)
+_STATUSES = tuple(PaymentStatus)
+
+
+class SnapshotFormatError(ValueError):
+    """The file is not a valid binary payments snapshot."""
+
+
+def encode_snapshot(payments: Iterable[CompactPayment]) -> bytes:
+    """Encode payments into the binary snapshot layout."""
+    pack = _RECORD.pack
+    body: List[bytes] = []
+    count = 0
+    for p in payments:
+        raw_id = p.payment_id.encode("utf-8")
+        body.append(pack(len(raw_id), p.amount, p.method_code, p.status_code))
+        body.append(raw_id)
+        count += 1
+    tables = b"".join(_encode_name(e.value) for e in _METHODS + _STATUSES)
+    return _HEADER.pack(MAGIC, VERSION, len(_METHODS), len(_STATUSES), count) + tables + b"".join(body)
+
+
+def write_snapshot(path: str, payments: Iterable[CompactPayment]) -> int:
+    """Atomically replace path with a snapshot of payments; returns the file size."""
+    data = encode_snapshot(payments)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(data)
+    os.replace(tmp_path, path)
+    return len(data)
+
+
+def iter_snapshot(buffer) -> Iterator[CompactPayment]:
+    """Yield the payments of a snapshot held in a bytes-like buffer (e.g. an mmap)."""
+    if len(buffer) < _HEADER.size:
+        raise SnapshotFormatError("truncated snapshot header")
+    magic, version, n_methods, n_statuses, count = _HEADER.unpack_from(buffer, 0)
+    if magic != MAGIC or version != VERSION:
+        raise SnapshotFormatError("not a payments snapshot (or unsupported version)")
+    offset = _HEADER.size
+    method_names, offset = _read_names(buffer, offset, n_methods)
+    status_names, offset = _read_names(buffer, offset, n_statuses)
+    # Translate the file's codes to the current CompactPayment codes; unknown names map to None.
+    method_codes = [_code(PaymentMethod, _METHODS, name) for name in method_names]
+    status_codes = [_code(PaymentStatus, _STATUSES, name) for name in status_names]
+
+    unpack_from = _RECORD.unpack_from
+    record_size = _RECORD.size
+    view = memoryview(buffer)
+    try:
+        for _ in range(count):
+            id_len, amount, method, status = unpack_from(buffer, offset)
+            start = offset + record_size
+            offset = start + id_len
+            if offset > len(buffer):
+                raise SnapshotFormatError("truncated snapshot record")
+            method_code = method_codes[method] if method < len(method_codes) else None
+            status_code = status_codes[status] if status < len(status_codes) else None
+            if method_code is None or status_code is None:
+                continue
+            yield CompactPayment(str(view[start:offset], "utf-8"), amount, method_code, status_code)
+    except struct.error as e:
+        raise SnapshotFormatError("truncated snapshot record") from e
+    finally:
+        view.release()
+
+
+def read_snapshot(path: str) -> Dict[str, CompactPayment]:
+    """Read a snapshot through a memory map; records with unknown method or status are skipped."""
+    with open(path, "rb") as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            return {}
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+            return {p.payment_id: p for p in iter_snapshot(mapped)}
+
+
+def dump_compact_json(payments: Mapping[str, CompactPayment], f: IO[str]) -> None:
+    """Write {id: fields} as compact JSON (no indentation or spaces) for exports."""
+    json.dump({pid: p.to_record() for pid, p in payments.items()}, f, separators=(",", ":"), ensure_ascii=False)
+
+
+def json_to_binary(json_path: str, binary_path: str) -> int:
+    """Convert a payments.json file into a binary snapshot; returns the number of payments."""
+    with open(json_path, "r", encoding="utf-8") as f:
+        payments = records_to_compact(json.load(f))
+    write_snapshot(binary_path, payments.values())
+    return len(payments)
+
+
+def binary_to_json(binary_path: str, json_path: str, compact: bool = False) -> int:
+    """
+    Convert a binary snapshot into the payments.json layout; returns the number of payments.
+    compact=False writes the indented layout used by the JSON storage backend.
+    """
+    payments = read_snapshot(binary_path)
+    tmp_path = f"{json_path}.{os.getpid()}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        if compact:
+            dump_compact_json(payments, f)
+        else:
+            json.dump({pid: p.to_record() for pid, p in payments.items()}, f, indent=4, ensure_ascii=False)
+    os.replace(tmp_path, json_path)
+    return len(payments)
+
+
+def _encode_name(name: str) -> bytes:
+    raw = name.encode("utf-8")
+    return bytes([len(raw)]) + raw
+
+
+def _read_names(buffer, offset: int, n: int):
+    names = []
+    for _ in range(n):
+        if offset >= len(buffer):
+            raise SnapshotFormatError("truncated snapshot tables")
+        size = buffer[offset]
+        names.append(bytes(buffer[offset + 1:offset + 1 + size]).decode("utf-8"))
+        offset += 1 + size
+    return names, offset
+
+
+def _code(enum_cls, members, name: str):
+    try:
+        return members.index(enum_cls(name))
+    except ValueError:
+        return None
+
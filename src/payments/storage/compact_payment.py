@@ -0,0 +1,76 @@
+from typing import Any, Dict, Optional
+from ..payment import Payment
+from ..payment_method import PaymentMethod
+from ..payment_status import PaymentStatus
+
+_METHODS = tuple(PaymentMethod)
+_METHOD_CODES = {m: code for code, m in enumerate(_METHODS)}
+_STATUSES = tuple(PaymentStatus)
+_STATUS_CODES = {s: code for code, s in enumerate(_STATUSES)}
+
+
+class CompactPayment:
+    """
+    Memory-lean form of a payment for in-memory stores: four slots, with the
+    method and status interned as small integer codes. Exposes the same read
+    attributes as Payment, so filters and counts work on it directly; convert
+    with to_payment only at the API boundary.
+    """
+    __slots__ = ("payment_id", "amount", "method_code", "status_code")
+
+    def __init__(self, payment_id: str, amount: float, method_code: int, status_code: int) -> None:
+        self.payment_id = payment_id
+        self.amount = amount
+        self.method_code = method_code
+        self.status_code = status_code
+
+    @classmethod
+    def from_payment(cls, p: Any) -> "CompactPayment":
+        return cls(p.payment_id, float(p.amount), _METHOD_CODES[p.payment_method], _STATUS_CODES[p.status])
+
+    @classmethod
+    def from_record(cls, payment_id: str, data: Dict[str, Any]) -> "CompactPayment":
+        """Build from payments.json fields; raises ValueError/KeyError/TypeError if invalid."""
+        return cls(
+            payment_id,
+            float(data["amount"]),
+            _METHOD_CODES[PaymentMethod(data["payment_method"])],
+            _STATUS_CODES[PaymentStatus(data["status"])],
+        )
+
+    @property
+    def payment_method(self) -> PaymentMethod:
+        return _METHODS[self.method_code]
+
+    @property
+    def status(self) -> PaymentStatus:
+        return _STATUSES[self.status_code]
+
+    def to_payment(self) -> Payment:
+        # Fields were validated on the way in, so skip pydantic validation here.
+        return Payment.model_construct(
+            payment_id=self.payment_id,
+            amount=self.amount,
+            payment_method=_METHODS[self.method_code],
+            status=_STATUSES[self.status_code],
+        )
+
+    def to_record(self) -> Dict[str, Any]:
+        """Return the payments.json fields (without the id)."""
+        return {
+            "amount": self.amount,
+            "payment_method": _METHODS[self.method_code].value,
+            "status": _STATUSES[self.status_code].value,
+        }
+
+
+def records_to_compact(raw_data: Optional[Dict[str, Dict[str, Any]]]) -> Dict[str, CompactPayment]:
+    """Build compact payments from {id: fields} records, skipping invalid entries."""
+    payments: Dict[str, CompactPayment] = {}
+    for pid, p_data in (raw_data or {}).items():
+        try:
+            payments[pid] = CompactPayment.from_record(pid, p_data)
+        except (KeyError, TypeError, ValueError):
+            continue
+    return payments
+
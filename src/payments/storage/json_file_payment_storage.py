@@ -0,0 +1,216 @@
+import json
+import os
+import threading
+from bisect import bisect_right
+from itertools import islice
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+from ..metrics import FILE_BYTES, STAGE_SECONDS
+from ..payment import Payment
+from ..payment_filter import PaymentFilter
+from ..payment_method import PaymentMethod
+from ..payment_status import PaymentStatus
+from ..payment_stats import AmountAggregate
+from .base_payment_storage import BasePaymentStorage, file_signature
+from .compact_payment import CompactPayment, records_to_compact
+from .lazy_json_index import LazyJsonIndex
+from .payment_snapshot import PaymentSnapshot
+
+
+class JsonFilePaymentStorage(BasePaymentStorage):
+    """
+    Keeps payments in memory and rewrites the whole JSON file on every write.
+    This is the original payments.json layout: {payment_id: {amount, payment_method, status}}.
+    Payments are held as CompactPayment records in a PaymentSnapshot and converted to
+    Payment on the way out. Each write publishes a new snapshot version that shares
+    untouched data with the previous one; readers never copy or lock the store.
+
+    With lazy=True the file is not parsed at startup: a LazyJsonIndex is built in
+    the background and entries are decoded on first access. Operations that need
+    every payment (load_all, counts, snapshots, the next full rewrite) materialize the rest.
+
+    Snapshots are published under a lock, so a reader materializing the lazy index
+    cannot overwrite a version a writer published meanwhile; reads never take it.
+    """
+    def __init__(self, data_path: str, lazy: bool = False) -> None:
+        self.data_path = data_path
+        self._publish_lock = threading.RLock()
+        self._signature = file_signature(data_path)
+        self._index: Optional[LazyJsonIndex] = None
+        self._snapshot = PaymentSnapshot.from_records({})
+        if lazy:
+            self._index = LazyJsonIndex(data_path)
+            # Entries decoded from the lazy index, and the ids of index and snapshot together.
+            self._decoded: Dict[str, CompactPayment] = {}
+            self._lazy_ids: Optional[List[str]] = None
+            # Ids still in the indexed file that were deleted since it was written.
+            self._tombstones: Set[str] = set()
+        else:
+            self._replace_all(self._load_from_disk())
+
+    def snapshot(self) -> PaymentSnapshot:
+        self._materialize_all()
+        return self._snapshot
+
+    def load_all(self) -> Dict[str, Payment]:
+        """Return a copy of payments."""
+        return {pid: r.to_payment() for pid, r in self.snapshot().items()}
+
+    def get(self, payment_id: str) -> Optional[Payment]:
+        record = self._lookup(payment_id)
+        return record.to_payment() if record is not None else None
+
+    def contains(self, payment_id: str) -> bool:
+        return self._lookup(payment_id) is not None
+
+    @property
+    def in_memory(self) -> bool:
+        index = self._index
+        return index is None or index.ready
+
+    def query(self, payment_filter: PaymentFilter, after: Optional[str] = None, limit: int = 100) -> List[Payment]:
+        if self._index is None:
+            return [r.to_payment() for r in self._snapshot.query(payment_filter, after, limit)]
+        ids = self._ensure_lazy_ids()
+        start = bisect_right(ids, after) if after is not None else 0
+        result: List[Payment] = []
+        for pid in islice(ids, start, None):
+            record = self._lookup(pid)
+            if record is not None and payment_filter.matches(record):
+                result.append(record.to_payment())
+                if len(result) >= limit:
+                    break
+        return result
+
+    def count_by_method_and_status(self) -> Dict[Tuple[PaymentMethod, PaymentStatus], int]:
+        return self.snapshot().count_by_method_and_status()
+
+    def aggregate_by_method_and_status(self, payment_filter: Optional[PaymentFilter] = None
+                                       ) -> Dict[Tuple[PaymentMethod, PaymentStatus], AmountAggregate]:
+        return self.snapshot().aggregate_by_method_and_status(payment_filter)
+
+    def refresh(self) -> bool:
+        """Reload the file if another process replaced it."""
+        with self._publish_lock:
+            signature = file_signature(self.data_path)
+            if signature == self._signature:
+                return False
+            self._signature = signature
+            self._replace_all(self._load_from_disk())
+            return True
+
+    def save(self, payment: Payment) -> None:
+        self.save_many([payment])
+
+    def save_many(self, payments: Iterable[Payment]) -> None:
+        changed = list(payments)
+        with self._publish_lock:
+            self._put_all(changed)
+            self._persist(changed)
+
+    def delete_many(self, payment_ids: Iterable[str]) -> None:
+        with self._publish_lock:
+            self._materialize_all()
+            deleted = [pid for pid in dict.fromkeys(payment_ids) if pid in self._snapshot]
+            if not deleted:
+                return
+            self._snapshot = self._snapshot.with_changes(deletes=deleted)
+            self._persist([], deleted)
+
+    def close(self) -> None:
+        if self._index is not None:
+            self._index.close()
+            self._index = None
+
+    def _lookup(self, payment_id: str) -> Optional[CompactPayment]:
+        """Return the record for an id, decoding it from the lazy index on first access."""
+        record = self._snapshot.get(payment_id)
+        index = self._index
+        if record is None and index is not None and payment_id not in self._tombstones:
+            record = self._decoded.get(payment_id)
+            if record is None:
+                loaded = index.load(payment_id)
+                if loaded is not None:
+                    record = self._decoded.setdefault(payment_id, loaded)
+                elif self._index is None:
+                    # Another thread materialized everything and closed the index meanwhile.
+                    record = self._snapshot.get(payment_id)
+        return record
+
+    def _ensure_lazy_ids(self) -> List[str]:
+        ids = self._lazy_ids
+        if ids is None:
+            ids = self._lazy_ids = sorted(set(self._index.ids()).difference(self._tombstones).union(self._snapshot.sorted_ids))
+        return ids
+
+    def _materialize_all(self) -> None:
+        """Decode every entry still only in the lazy index into the snapshot, then drop the index."""
+        if self._index is None:
+            return
+        # Writers publish under the same lock, so no version is lost between the read and the swap.
+        with self._publish_lock:
+            index = self._index
+            if index is None:
+                return
+            records: Dict[str, CompactPayment] = {}
+            for pid in list(index.ids()):
+                record = self._lookup(pid)
+                if record is not None:
+                    records[pid] = record
+            snapshot = self._snapshot
+            records.update(snapshot.items())
+            self._snapshot = PaymentSnapshot.from_records(records, snapshot.version + 1)
+            self._index = None
+            self._decoded = {}
+            self._lazy_ids = None
+            self._tombstones = set()
+            index.close()
+
+    def _replace_all(self, payments: Dict[str, CompactPayment]) -> None:
+        if self._index is not None:
+            self._index.close()
+            self._index = None
+        self._snapshot = PaymentSnapshot.from_records(payments, self._snapshot.version + 1)
+
+    def _put_all(self, payments: Iterable[Payment]) -> None:
+        """Publish a new snapshot version with payments inserted or replaced."""
+        records = [CompactPayment.from_payment(payment) for payment in payments]
+        if self._index is not None and self._lazy_ids is not None:
+            if any(self._lookup(r.payment_id) is None for r in records):
+                self._lazy_ids = None
+        self._snapshot = self._snapshot.with_changes(records)
+
+    def _persist(self, changed: Iterable[Payment], deleted: Iterable[str] = ()) -> None:
+        """
+        Persist the write that changed and deleted payments (already applied to the
+        snapshot). The whole snapshot is rewritten, so both are unused here; they
+        are for backends that append only the changes (WriteAheadLogPaymentStorage).
+        """
+        self._materialize_all()
+        with STAGE_SECONDS.time("serialization"):
+            serializable_data = {pid: r.to_record() for pid, r in self._snapshot.items()}
+            encoded = json.dumps(serializable_data, indent=4, ensure_ascii=False).encode("utf-8")
+        FILE_BYTES.observe(len(encoded), "json")
+        self._write_file(encoded)
+
+    def _write_file(self, encoded: bytes) -> None:
+        """
+        Atomically replace the data file with encoded. The temporary file is synced
+        before the rename, so a crash never leaves the data file empty or partial.
+        """
+        tmp_path = f"{self.data_path}.{os.getpid()}.tmp"
+        with open(tmp_path, "wb") as f:
+            with STAGE_SECONDS.time("write"):
+                f.write(encoded)
+                f.flush()
+            with STAGE_SECONDS.time("fsync"):
+                os.fsync(f.fileno())
+        os.replace(tmp_path, self.data_path)
+        self._signature = file_signature(self.data_path)
+
+    def _load_from_disk(self) -> Dict[str, CompactPayment]:
+        """Read payments from disk, skip invalid entries."""
+        try:
+            with STAGE_SECONDS.time("load"), open(self.data_path, "r", encoding="utf-8") as f:
+                return records_to_compact(json.load(f))
+        except Exception:
+            return {}
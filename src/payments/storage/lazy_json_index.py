@@ -0,0 +1,81 @@
+import json
+import mmap
+import re
+import threading
+from typing import Dict, Iterable, Optional
+from .compact_payment import CompactPayment
+
+# A top-level entry of payments.json: "<id>": {<flat fields>}. Payment fields are
+# scalars, so the first "key": { ... } pairs found are exactly the top-level ids.
+_ENTRY = re.compile(rb'"((?:[^"\\]|\\.)*)"\s*:\s*(\{[^{}]*\})')
+
+
+class LazyJsonIndex:
+    """
+    id -> byte offset index over a {payment_id: {fields}} JSON file.
+
+    The index is built in a background thread by scanning the memory-mapped file,
+    without decoding or validating entries; each entry is decoded only when load()
+    asks for it. Building the index is much cheaper than json.load plus validation,
+    and callers that never touch payments (e.g. health checks) do not wait for it.
+    """
+    def __init__(self, path: str) -> None:
+        self.path = path
+        self._offsets: Dict[str, int] = {}
+        self._map: Optional[mmap.mmap] = None
+        self._ready = threading.Event()
+        self._thread = threading.Thread(target=self._build, name="payments-index", daemon=True)
+        self._thread.start()
+
+    @property
+    def ready(self) -> bool:
+        """True once the index is built, so lookups no longer block."""
+        return self._ready.is_set()
+
+    def wait(self) -> None:
+        """Block until the index is built."""
+        self._ready.wait()
+
+    def ids(self) -> Iterable[str]:
+        self.wait()
+        return self._offsets.keys()
+
+    def __contains__(self, payment_id: str) -> bool:
+        self.wait()
+        return payment_id in self._offsets
+
+    def load(self, payment_id: str) -> Optional[CompactPayment]:
+        """Decode one entry; None if the id is unknown or its entry is invalid."""
+        self.wait()
+        start = self._offsets.get(payment_id)
+        mapped = self._map
+        if start is None or mapped is None:
+            return None
+        try:
+            end = mapped.find(b"}", start) + 1
+            return CompactPayment.from_record(payment_id, json.loads(mapped[start:end]))
+        except (KeyError, TypeError, ValueError):
+            # Invalid entry, or the index was closed concurrently.
+            return None
+
+    def close(self) -> None:
+        self.wait()
+        if self._map is not None:
+            self._map.close()
+            self._map = None
+        self._offsets = {}
+
+    def _build(self) -> None:
+        try:
+            with open(self.path, "rb") as f:
+                # The mapping keeps the current inode readable even if the file is replaced.
+                self._map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            for match in _ENTRY.finditer(self._map):
+                raw_id = match.group(1)
+                payment_id = json.loads(b'"' + raw_id + b'"') if b"\\" in raw_id else raw_id.decode("utf-8")
+                self._offsets[payment_id] = match.start(2)
+        except (OSError, ValueError):
+            # Missing or empty file (mmap of length 0): nothing to index.
+            self._offsets = {}
+        finally:
+            self._ready.set()
@@ -0,0 +1,193 @@
+import gzip
+import json
+import os
+import threading
+import time
+from bisect import bisect_right
+from collections import OrderedDict
+from heapq import merge
+from itertools import islice
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+from ..payment_filter import PaymentFilter
+from ..payment_method import PaymentMethod
+from ..payment_status import PaymentStatus
+from ..payment_stats import AmountAggregate, aggregate_amounts
+from .base_payment_storage import file_signature
+from .compact_payment import CompactPayment, records_to_compact
+
+_INDEX_NAME = "index.json.gz"
+
+
+class PaymentArchive:
+    """
+    Immutable, gzip-compressed segments of settled payments in a directory.
+
+    Each archival run writes one segment named after its UTC date and a running
+    number (e.g. 2026-10-18-000003.json.gz) holding {payment_id: fields}, so the
+    archive is partitioned by the time payments were settled. index.json.gz maps
+    every segment to its sorted ids and per-method counts and amount aggregates
+    (count, sum, min, max), so stats never decompress segments; it is replaced
+    atomically after the segment is on disk, so a crash never indexes a
+    partial segment. Only the index is read at startup; segments are
+    decompressed on demand and the most recently used ones are cached.
+
+    Readers may run in several threads while one archives: the in-memory index
+    is replaced copy-on-write (readers keep the lists they started with) and
+    the segment cache is guarded by a lock.
+    """
+    def __init__(self, directory: str, cached_segments: int = 4) -> None:
+        self.directory = directory
+        self.cached_segments = cached_segments
+        os.makedirs(directory, exist_ok=True)
+        self._cache: "OrderedDict[str, Dict[str, CompactPayment]]" = OrderedDict()
+        # Guards the segment cache and the publication of a new index.
+        self._lock = threading.Lock()
+        self._load_index()
+
+    @property
+    def index_path(self) -> str:
+        return os.path.join(self.directory, _INDEX_NAME)
+
+    def __len__(self) -> int:
+        return len(self._segment_of)
+
+    def __contains__(self, payment_id: str) -> bool:
+        return payment_id in self._segment_of
+
+    def get(self, payment_id: str) -> Optional[CompactPayment]:
+        segment = self._segment_of.get(payment_id)
+        if segment is None:
+            return None
+        return self._read_segment(segment).get(payment_id)
+
+    def iter_all(self) -> Iterator[CompactPayment]:
+        for segment in self._segments:
+            yield from self._read_segment(segment["name"]).values()
+
+    def query(self, payment_filter: PaymentFilter, after: Optional[str], limit: int) -> List[CompactPayment]:
+        """Up to limit archived payments matching the filter, ordered by id after the cursor."""
+        if payment_filter.status not in (None, PaymentStatus.PAGADO):
+            return []
+        sorted_ids = self._sorted_ids
+        start = bisect_right(sorted_ids, after) if after is not None else 0
+        result: List[CompactPayment] = []
+        for pid in islice(sorted_ids, start, None):
+            record = self.get(pid)
+            if record is not None and payment_filter.matches(record):
+                result.append(record)
+                if len(result) >= limit:
+                    break
+        return result
+
+    def count_by_method_and_status(self) -> Dict[Tuple[PaymentMethod, PaymentStatus], int]:
+        counts: Dict[Tuple[PaymentMethod, PaymentStatus], int] = {}
+        for segment in self._segments:
+            for method, n in segment["counts"].items():
+                key = (PaymentMethod(method), PaymentStatus.PAGADO)
+                counts[key] = counts.get(key, 0) + n
+        return counts
+
+    def aggregate_by_method_and_status(self, payment_filter: Optional[PaymentFilter] = None
+                                       ) -> Dict[Tuple[PaymentMethod, PaymentStatus], AmountAggregate]:
+        """Amount aggregates of the matching archived payments, from the index unless amounts are filtered."""
+        payment_filter = payment_filter or PaymentFilter()
+        if payment_filter.status not in (None, PaymentStatus.PAGADO):
+            return {}
+        if payment_filter.min_amount is not None or payment_filter.max_amount is not None:
+            return aggregate_amounts(r for r in self.iter_all() if payment_filter.matches(r))
+        aggregates: Dict[Tuple[PaymentMethod, PaymentStatus], AmountAggregate] = {}
+        for segment in self._segments:
+            for method, values in self._segment_aggregates(segment).items():
+                key = (PaymentMethod(method), PaymentStatus.PAGADO)
+                if payment_filter.payment_method in (None, key[0]):
+                    aggregates[key] = aggregates.get(key, AmountAggregate()).merge(AmountAggregate(*values))
+        return aggregates
+
+    def add_segment(self, payments: Iterable[CompactPayment]) -> int:
+        """Write payments not archived yet as a new segment; returns how many were written."""
+        records = {p.payment_id: p for p in payments if p.payment_id not in self._segment_of}
+        if not records:
+            return 0
+        name = f"{time.strftime('%Y-%m-%d', time.gmtime())}-{self._next_number():06d}.json.gz"
+        _write_gzip_json(os.path.join(self.directory, name), {pid: p.to_record() for pid, p in records.items()})
+        counts: Dict[str, int] = {}
+        for p in records.values():
+            counts[p.payment_method.value] = counts.get(p.payment_method.value, 0) + 1
+        segment = {"name": name, "ids": sorted(records), "counts": counts,
+                   "aggregates": _method_aggregates(records.values())}
+        segments = self._segments + [segment]
+        _write_gzip_json(self.index_path, {"segments": segments})
+        segment_of = dict(self._segment_of)
+        segment_of.update(dict.fromkeys(segment["ids"], name))
+        self._publish_index(file_signature(self.index_path), segments, segment_of,
+                            list(merge(self._sorted_ids, segment["ids"])))
+        return len(records)
+
+    def refresh(self) -> bool:
+        """Reload the index if another process archived meanwhile."""
+        if file_signature(self.index_path) == self._index_signature:
+            return False
+        self._load_index()
+        return True
+
+    def _load_index(self) -> None:
+        signature = file_signature(self.index_path)
+        try:
+            with gzip.open(self.index_path, "rt", encoding="utf-8") as f:
+                segments = json.load(f)["segments"]
+        except FileNotFoundError:
+            segments = []
+        segment_of: Dict[str, str] = {}
+        for segment in segments:
+            segment_of.update(dict.fromkeys(segment["ids"], segment["name"]))
+        self._publish_index(signature, segments, segment_of, sorted(segment_of))
+
+    def _publish_index(self, signature: Optional[Tuple[int, int, int]], segments: List[dict], segment_of: Dict[str, str],
+                       sorted_ids: List[str]) -> None:
+        """Swap in a new index; the structures handed over are never modified afterwards."""
+        with self._lock:
+            self._index_signature = signature
+            self._segments = segments
+            self._segment_of = segment_of
+            self._sorted_ids = sorted_ids
+
+    def _segment_aggregates(self, segment: dict) -> Dict[str, list]:
+        """
+        Per-method [count, total, min, max] of a segment. Segments indexed before
+        aggregates were kept are read once; the next index rewrite stores theirs.
+        """
+        if "aggregates" not in segment:
+            segment["aggregates"] = _method_aggregates(self._read_segment(segment["name"]).values())
+        return segment["aggregates"]
+
+    def _next_number(self) -> int:
+        return max((int(s["name"][-14:-8]) for s in self._segments), default=0) + 1
+
+    def _read_segment(self, name: str) -> Dict[str, CompactPayment]:
+        with self._lock:
+            records = self._cache.get(name)
+            if records is not None:
+                self._cache.move_to_end(name)
+                return records
+        with gzip.open(os.path.join(self.directory, name), "rt", encoding="utf-8") as f:
+            records = records_to_compact(json.load(f))
+        with self._lock:
+            self._cache[name] = records
+            self._cache.move_to_end(name)
+            while len(self._cache) > self.cached_segments:
+                self._cache.popitem(last=False)
+        return records
+
+
+def _method_aggregates(records: Iterable[CompactPayment]) -> Dict[str, list]:
+    return {method.value: list(aggregate) for (method, _), aggregate in aggregate_amounts(records).items()}
+
+
+def _write_gzip_json(path: str, data) -> None:
+    """Atomically write data as gzip-compressed compact JSON."""
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with gzip.open(tmp_path, "wt", encoding="utf-8") as f:
+        json.dump(data, f, separators=(",", ":"), ensure_ascii=False)
+    with open(tmp_path, "rb") as f:
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
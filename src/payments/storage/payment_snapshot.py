@@ -0,0 +1,183 @@
+from typing import Dict, Iterable, Iterator, List, Mapping, Optional, Tuple
+from ..payment_filter import PaymentFilter
+from ..payment_method import PaymentMethod
+from ..payment_status import PaymentStatus
+from ..payment_stats import AmountAggregate, aggregate_amounts
+from .compact_payment import _METHOD_CODES, _STATUS_CODES, CompactPayment
+from .sorted_id_list import SortedIdList
+
+# Payments are spread over this many shard dicts; a write copies only the shards it touches.
+SHARD_COUNT = 512
+_MASK = SHARD_COUNT - 1
+
+
+class PaymentSnapshot:
+    """
+    Immutable, versioned view of every payment in an in-memory store.
+
+    Writers never modify a published snapshot: with_changes() returns the next
+    version, which shares every untouched shard and every untouched chunk of the
+    sorted id list with its predecessor. Stores publish it by
+    swapping a single reference, so readers grab the current snapshot in O(1)
+    without locks and keep a consistent view for as long as they hold it, while
+    the cost of a write is proportional to the shards it touches, not to the
+    number of payments.
+
+    Sorted id indexes per status and per payment method (indexed by the compact
+    status/method codes) serve filtered queries without scanning every payment;
+    they are copy-on-write as well.
+    """
+    __slots__ = ("version", "_shards", "_sorted_ids", "_size", "_by_status", "_by_method")
+
+    def __init__(self, version: int, shards: Tuple[Dict[str, CompactPayment], ...], sorted_ids: SortedIdList,
+                 by_status: Tuple[SortedIdList, ...], by_method: Tuple[SortedIdList, ...]) -> None:
+        self.version = version
+        self._shards = shards
+        self._sorted_ids = sorted_ids
+        self._size = len(sorted_ids)
+        self._by_status = by_status
+        self._by_method = by_method
+
+    @classmethod
+    def from_records(cls, records: Mapping[str, CompactPayment], version: int = 0) -> "PaymentSnapshot":
+        shards: Tuple[Dict[str, CompactPayment], ...] = tuple({} for _ in range(SHARD_COUNT))
+        by_status: List[List[str]] = [[] for _ in PaymentStatus]
+        by_method: List[List[str]] = [[] for _ in PaymentMethod]
+        sorted_ids = sorted(records)
+        for pid in sorted_ids:
+            record = records[pid]
+            shards[hash(pid) & _MASK][pid] = record
+            by_status[record.status_code].append(pid)
+            by_method[record.method_code].append(pid)
+        return cls(version, shards, SortedIdList.from_sorted(sorted_ids), tuple(map(SortedIdList.from_sorted, by_status)),
+                   tuple(map(SortedIdList.from_sorted, by_method)))
+
+    def __len__(self) -> int:
+        return self._size
+
+    def __contains__(self, payment_id: str) -> bool:
+        return payment_id in self._shards[hash(payment_id) & _MASK]
+
+    def get(self, payment_id: str) -> Optional[CompactPayment]:
+        return self._shards[hash(payment_id) & _MASK].get(payment_id)
+
+    @property
+    def sorted_ids(self) -> SortedIdList:
+        """Every id in ascending order."""
+        return self._sorted_ids
+
+    def values(self) -> Iterator[CompactPayment]:
+        """Every payment, in no particular order."""
+        for shard in self._shards:
+            yield from shard.values()
+
+    def items(self) -> Iterator[Tuple[str, CompactPayment]]:
+        """(id, payment) pairs ordered by id."""
+        for pid in self._sorted_ids:
+            yield pid, self._shards[hash(pid) & _MASK][pid]
+
+    def query(self, payment_filter: PaymentFilter, after: Optional[str] = None, limit: int = 100) -> List[CompactPayment]:
+        """
+        Up to limit payments matching the filter, ordered by id after the cursor.
+        A status or method filter walks the smaller matching index; the amount
+        range is checked on each candidate.
+        """
+        candidates = self._candidates(payment_filter)
+        ids = (candidates if candidates is not None else self._sorted_ids).iter_after(after)
+        result: List[CompactPayment] = []
+        for pid in ids:
+            record = self._shards[hash(pid) & _MASK][pid]
+            if payment_filter.matches(record):
+                result.append(record)
+                if len(result) >= limit:
+                    break
+        return result
+
+    def _candidates(self, payment_filter: PaymentFilter) -> Optional[SortedIdList]:
+        """The smallest index covering the filter, or None to scan every id."""
+        indexes = []
+        if payment_filter.status is not None:
+            indexes.append(self._by_status[_STATUS_CODES[payment_filter.status]])
+        if payment_filter.payment_method is not None:
+            indexes.append(self._by_method[_METHOD_CODES[payment_filter.payment_method]])
+        return min(indexes, key=len, default=None)
+
+    def count_by_method_and_status(self) -> Dict[Tuple[PaymentMethod, PaymentStatus], int]:
+        counts: Dict[Tuple[PaymentMethod, PaymentStatus], int] = {}
+        for record in self.values():
+            key = (record.payment_method, record.status)
+            counts[key] = counts.get(key, 0) + 1
+        return counts
+
+    def aggregate_by_method_and_status(self, payment_filter: Optional[PaymentFilter] = None
+                                       ) -> Dict[Tuple[PaymentMethod, PaymentStatus], AmountAggregate]:
+        """Amount aggregates of the matching payments; a status or method filter walks its index only."""
+        if payment_filter is None:
+            return aggregate_amounts(self.values())
+        candidates = self._candidates(payment_filter)
+        records = self.values() if candidates is None else (self._shards[hash(pid) & _MASK][pid] for pid in candidates)
+        return aggregate_amounts(r for r in records if payment_filter.matches(r))
+
+    def with_changes(self, puts: Iterable[CompactPayment] = (), deletes: Iterable[str] = ()) -> "PaymentSnapshot":
+        """Return the next version with puts inserted or replaced and deletes removed."""
+        shards = list(self._shards)
+        copied = set()
+        changed = set()
+        for record in puts:
+            index = hash(record.payment_id) & _MASK
+            if index not in copied:
+                shards[index] = dict(shards[index])
+                copied.add(index)
+            shards[index][record.payment_id] = record
+            changed.add(record.payment_id)
+        for pid in deletes:
+            index = hash(pid) & _MASK
+            if pid not in shards[index]:
+                continue
+            if index not in copied:
+                shards[index] = dict(shards[index])
+                copied.add(index)
+            del shards[index][pid]
+            changed.add(pid)
+        added: List[str] = []
+        removed: List[str] = []
+        status_changes = _IndexChanges(len(self._by_status))
+        method_changes = _IndexChanges(len(self._by_method))
+        for pid in changed:
+            before = self.get(pid)
+            after = shards[hash(pid) & _MASK].get(pid)
+            if before is None and after is not None:
+                added.append(pid)
+            elif before is not None and after is None:
+                removed.append(pid)
+            status_changes.move(pid, _code(before, "status_code"), _code(after, "status_code"))
+            method_changes.move(pid, _code(before, "method_code"), _code(after, "method_code"))
+        return PaymentSnapshot(self.version + 1, tuple(shards), self._sorted_ids.with_changes(added, removed),
+                               status_changes.apply(self._by_status), method_changes.apply(self._by_method))
+
+
+class _IndexChanges:
+    """Ids to add to and remove from each of a tuple of per-code indexes."""
+    __slots__ = ("added", "removed")
+
+    def __init__(self, size: int) -> None:
+        self.added: List[List[str]] = [[] for _ in range(size)]
+        self.removed: List[List[str]] = [[] for _ in range(size)]
+
+    def move(self, pid: str, before: Optional[int], after: Optional[int]) -> None:
+        """Record that pid's code went from before to after (None when absent)."""
+        if before == after:
+            return
+        if before is not None:
+            self.removed[before].append(pid)
+        if after is not None:
+            self.added[after].append(pid)
+
+    def apply(self, indexes: Tuple[SortedIdList, ...]) -> Tuple[SortedIdList, ...]:
+        return tuple(index.with_changes(added, removed)
+                     for index, added, removed in zip(indexes, self.added, self.removed))
+
+
+def _code(record: Optional[CompactPayment], name: str) -> Optional[int]:
+    return getattr(record, name) if record is not None else None
+
@@ -0,0 +1,36 @@
+from .archiving_payment_storage import ArchivingPaymentStorage
+from .base_payment_storage import BasePaymentStorage
+from .binary_file_payment_storage import BinaryFilePaymentStorage
+from .json_file_payment_storage import JsonFilePaymentStorage
+from .payment_archive import PaymentArchive
+from .sqlite_payment_storage import SQLitePaymentStorage
+from .write_ahead_log_payment_storage import WriteAheadLogPaymentStorage
+
+_BACKENDS = {
+    "json": JsonFilePaymentStorage,
+    "wal": WriteAheadLogPaymentStorage,
+    "binary": BinaryFilePaymentStorage,
+    "sqlite": SQLitePaymentStorage,
+}
+
+
+_LAZY_CAPABLE = (JsonFilePaymentStorage, WriteAheadLogPaymentStorage)
+
+
+def create_payment_storage(kind: str, path: str, lazy: bool = False, archive: bool = False) -> BasePaymentStorage:
+    """
+    Build a storage backend by name ("json", "wal", "binary" or "sqlite").
+    lazy enables on-demand loading for the JSON and WAL backends; SQLite always
+    reads on demand and binary snapshots load fast enough to read eagerly.
+    archive moves settled payments into compressed segments under <path>.archive.
+    """
+    backend = _BACKENDS.get(kind.strip().lower())
+    if backend is None:
+        raise ValueError(f"invalid storage backend: {kind!r}")
+    if lazy and backend in _LAZY_CAPABLE:
+        storage = backend(path, lazy=True)
+    else:
+        storage = backend(path)
+    if archive:
+        storage = ArchivingPaymentStorage(storage, PaymentArchive(path + ".archive"))
+    return storage
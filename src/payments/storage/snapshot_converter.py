@@ -0,0 +1,28 @@
+"""
+Converts between the payments.json layout and binary snapshots.
+
+Usage (from src/):
+    python -m payments.storage.snapshot_converter to-binary payments.json payments.bin
+    python -m payments.storage.snapshot_converter to-json payments.bin payments.json [--compact]
+"""
+import argparse
+from typing import List, Optional
+from .binary_snapshot import binary_to_json, json_to_binary
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="Convert between payments.json and binary snapshots")
+    parser.add_argument("direction", choices=["to-binary", "to-json"])
+    parser.add_argument("source")
+    parser.add_argument("target")
+    parser.add_argument("--compact", action="store_true", help="to-json: write compact JSON instead of indented")
+    args = parser.parse_args(argv)
+    if args.direction == "to-binary":
+        n = json_to_binary(args.source, args.target)
+    else:
+        n = binary_to_json(args.source, args.target, args.compact)
+    print(f"converted {n} payments: {args.source} -> {args.target}")
+
+
+if __name__ == "__main__":
+    main()
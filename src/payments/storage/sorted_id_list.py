@@ -0,0 +1,92 @@
+from bisect import bisect_left, bisect_right
+from itertools import chain, islice
+from typing import Dict, Iterable, Iterator, List, Optional, Sequence
+
+# Ids per chunk when a list is built; a chunk is split once it doubles.
+CHUNK_SIZE = 1024
+
+
+class SortedIdList:
+    """
+    Immutable sorted list of payment ids, stored as chunks of at most
+    2 * CHUNK_SIZE ids.
+
+    with_changes() returns a new list that copies only the chunks it modifies
+    (plus the list of chunk references), so inserting or removing ids costs
+    O(CHUNK_SIZE + len / CHUNK_SIZE) instead of copying every id, and versions
+    share their untouched chunks.
+    """
+    __slots__ = ("_chunks", "_maxes", "_size")
+
+    def __init__(self, chunks: List[List[str]]) -> None:
+        self._chunks = chunks
+        # Last id of each chunk, to find the chunk of an id by bisection.
+        self._maxes = [chunk[-1] for chunk in chunks]
+        self._size = sum(map(len, chunks))
+
+    @classmethod
+    def from_sorted(cls, ids: Sequence[str]) -> "SortedIdList":
+        """Build from ids already in ascending order, without duplicates."""
+        return cls([list(ids[i:i + CHUNK_SIZE]) for i in range(0, len(ids), CHUNK_SIZE)])
+
+    def __len__(self) -> int:
+        return self._size
+
+    def __iter__(self) -> Iterator[str]:
+        return chain.from_iterable(self._chunks)
+
+    def __contains__(self, payment_id: str) -> bool:
+        i = bisect_left(self._maxes, payment_id)
+        if i == len(self._chunks):
+            return False
+        chunk = self._chunks[i]
+        j = bisect_left(chunk, payment_id)
+        return j < len(chunk) and chunk[j] == payment_id
+
+    def iter_after(self, after: Optional[str] = None) -> Iterator[str]:
+        """Ids greater than after (every id if None), in ascending order."""
+        if after is None:
+            return iter(self)
+        i = bisect_right(self._maxes, after)
+        if i == len(self._chunks):
+            return iter(())
+        chunk = self._chunks[i]
+        return chain(islice(chunk, bisect_right(chunk, after), None),
+                     chain.from_iterable(islice(self._chunks, i + 1, None)))
+
+    def with_changes(self, added: Iterable[str] = (), removed: Iterable[str] = ()) -> "SortedIdList":
+        """
+        Return a new list with added ids (not present yet) inserted and removed ids
+        (present) taken out; returns self when there is nothing to change.
+        """
+        added = sorted(added)
+        removed = list(removed)
+        if not added and not removed:
+            return self
+        if not self._chunks:
+            return SortedIdList.from_sorted(added)
+        last = len(self._chunks) - 1
+        gone: Dict[int, set] = {}
+        for pid in removed:
+            gone.setdefault(bisect_left(self._maxes, pid), set()).add(pid)
+        new: Dict[int, List[str]] = {}
+        for pid in added:
+            # The chunk boundaries of this version still order every id correctly.
+            new.setdefault(min(bisect_left(self._maxes, pid), last), []).append(pid)
+        chunks: List[List[str]] = []
+        start = 0
+        for i in sorted(gone.keys() | new.keys()):
+            chunks.extend(self._chunks[start:i])
+            start = i + 1
+            chunk = self._chunks[i]
+            if i in gone:
+                chunk = [pid for pid in chunk if pid not in gone[i]]
+            if i in new:
+                # Both runs are sorted, so this is a linear merge.
+                chunk = sorted(chunk + new[i])
+            if len(chunk) > 2 * CHUNK_SIZE:
+                chunks.extend(chunk[j:j + CHUNK_SIZE] for j in range(0, len(chunk), CHUNK_SIZE))
+            elif chunk:
+                chunks.append(chunk)
+        chunks.extend(self._chunks[start:])
+        return SortedIdList(chunks)
@@ -0,0 +1,189 @@
+import sqlite3
+import threading
+from typing import Dict, Iterable, List, Optional, Tuple
+from ..metrics import STAGE_SECONDS
+from ..payment import Payment
+from ..payment_filter import PaymentFilter
+from ..payment_method import PaymentMethod
+from ..payment_status import PaymentStatus
+from ..payment_stats import AmountAggregate
+from .base_payment_storage import BasePaymentStorage
+
+_SCHEMA = (
+    """CREATE TABLE IF NOT EXISTS payments (
+        payment_id TEXT PRIMARY KEY,
+        amount REAL NOT NULL,
+        payment_method TEXT NOT NULL,
+        status TEXT NOT NULL
+    )""",
+    # payment_id is the second column so filtered listings come out in keyset order.
+    "CREATE INDEX IF NOT EXISTS idx_payments_status ON payments (status, payment_id)",
+    "CREATE INDEX IF NOT EXISTS idx_payments_payment_method ON payments (payment_method, payment_id)",
+    # Amount ranges without a status or method filter.
+    "CREATE INDEX IF NOT EXISTS idx_payments_amount ON payments (amount)",
+    # Amount aggregates per method and status are computed from this index alone.
+    "CREATE INDEX IF NOT EXISTS idx_payments_group_amount ON payments (payment_method, status, amount)",
+)
+_SELECT_ALL = "SELECT payment_id, amount, payment_method, status FROM payments"
+_SELECT_ONE = _SELECT_ALL + " WHERE payment_id = ?"
+_EXISTS = "SELECT 1 FROM payments WHERE payment_id = ?"
+_DELETE = "DELETE FROM payments WHERE payment_id = ?"
+_COUNT_BY_METHOD_AND_STATUS = "SELECT payment_method, status, COUNT(*) FROM payments GROUP BY payment_method, status"
+_AGGREGATE_AMOUNTS = "SELECT payment_method, status, COUNT(*), SUM(amount), MIN(amount), MAX(amount) FROM payments"
+_UPSERT = (
+    "INSERT INTO payments (payment_id, amount, payment_method, status) VALUES (?, ?, ?, ?) "
+    "ON CONFLICT (payment_id) DO UPDATE SET "
+    "amount = excluded.amount, payment_method = excluded.payment_method, status = excluded.status"
+)
+
+_SYNCHRONOUS_MODES = ("NORMAL", "FULL", "EXTRA")
+
+
+class SQLitePaymentStorage(BasePaymentStorage):
+    """
+    Stores payments in an embedded SQLite database (WAL journal mode).
+    Nothing is cached in memory: every read is an indexed query, so the dataset
+    does not need to fit in RAM. The connection is shared between threads
+    behind a lock.
+
+    synchronous sets the durability of commits. FULL (the default) syncs the WAL
+    on every commit, so a write reported as done survives a power failure.
+    NORMAL only syncs at checkpoints: commits are faster, but the last ones can be
+    lost on power failure or an OS crash (never on a process crash).
+    """
+    def __init__(self, db_path: str, synchronous: str = "FULL") -> None:
+        if synchronous not in _SYNCHRONOUS_MODES:
+            raise ValueError(f"invalid synchronous mode: {synchronous!r}")
+        self.db_path = db_path
+        self._conn = sqlite3.connect(db_path, isolation_level=None, check_same_thread=False)
+        self._lock = threading.Lock()
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(f"PRAGMA synchronous={synchronous}")
+        for statement in _SCHEMA:
+            self._conn.execute(statement)
+        self._data_version = self._read_data_version()
+
+    def load_all(self) -> Dict[str, Payment]:
+        payments: Dict[str, Payment] = {}
+        with STAGE_SECONDS.time("load"), self._lock:
+            rows = self._conn.execute(_SELECT_ALL).fetchall()
+        for row in rows:
+            payment = _row_to_payment(row)
+            if payment is not None:
+                payments[payment.payment_id] = payment
+        return payments
+
+    def get(self, payment_id: str) -> Optional[Payment]:
+        with self._lock:
+            row = self._conn.execute(_SELECT_ONE, (payment_id,)).fetchone()
+        return _row_to_payment(row) if row is not None else None
+
+    def contains(self, payment_id: str) -> bool:
+        with self._lock:
+            return self._conn.execute(_EXISTS, (payment_id,)).fetchone() is not None
+
+    def query(self, payment_filter: PaymentFilter, after: Optional[str] = None, limit: int = 100) -> List[Payment]:
+        clauses, params = _filter_clauses(payment_filter)
+        if after is not None:
+            clauses.append("payment_id > ?")
+            params.append(after)
+        sql = _SELECT_ALL
+        if clauses:
+            sql += " WHERE " + " AND ".join(clauses)
+        sql += " ORDER BY payment_id LIMIT ?"
+        params.append(limit)
+        with self._lock:
+            rows = self._conn.execute(sql, params).fetchall()
+        return [p for p in map(_row_to_payment, rows) if p is not None]
+
+    def save(self, payment: Payment) -> None:
+        self.save_many([payment])
+
+    def save_many(self, payments: Iterable[Payment]) -> None:
+        rows = [_payment_to_row(p) for p in payments]
+        with STAGE_SECONDS.time("commit"), self._lock, self._conn:
+            self._conn.execute("BEGIN")
+            self._conn.executemany(_UPSERT, rows)
+
+    def delete_many(self, payment_ids: Iterable[str]) -> None:
+        rows = [(pid,) for pid in payment_ids]
+        with STAGE_SECONDS.time("commit"), self._lock, self._conn:
+            self._conn.execute("BEGIN")
+            self._conn.executemany(_DELETE, rows)
+
+    def refresh(self) -> bool:
+        """Report whether another connection committed since the last check."""
+        version = self._read_data_version()
+        changed = version != self._data_version
+        self._data_version = version
+        return changed
+
+    def count_by_method_and_status(self) -> Dict[Tuple[PaymentMethod, PaymentStatus], int]:
+        counts: Dict[Tuple[PaymentMethod, PaymentStatus], int] = {}
+        with self._lock:
+            rows = self._conn.execute(_COUNT_BY_METHOD_AND_STATUS).fetchall()
+        for method, status, n in rows:
+            try:
+                counts[(PaymentMethod(method), PaymentStatus(status))] = n
+            except ValueError:
+                continue
+        return counts
+
+    def aggregate_by_method_and_status(self, payment_filter: Optional[PaymentFilter] = None
+                                       ) -> Dict[Tuple[PaymentMethod, PaymentStatus], AmountAggregate]:
+        clauses, params = _filter_clauses(payment_filter or PaymentFilter())
+        sql = _AGGREGATE_AMOUNTS
+        if clauses:
+            sql += " WHERE " + " AND ".join(clauses)
+        sql += " GROUP BY payment_method, status"
+        aggregates: Dict[Tuple[PaymentMethod, PaymentStatus], AmountAggregate] = {}
+        with self._lock:
+            rows = self._conn.execute(sql, params).fetchall()
+        for method, status, n, total, low, high in rows:
+            try:
+                aggregates[(PaymentMethod(method), PaymentStatus(status))] = AmountAggregate(n, total, low, high)
+            except ValueError:
+                continue
+        return aggregates
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+    def _read_data_version(self) -> int:
+        with self._lock:
+            return self._conn.execute("PRAGMA data_version").fetchone()[0]
+
+
+def _payment_to_row(p: Payment) -> tuple:
+    return (p.payment_id, float(p.amount), _enum_value(p.payment_method), _enum_value(p.status))
+
+
+def _enum_value(value) -> str:
+    return getattr(value, "value", value)
+
+
+def _row_to_payment(row: tuple) -> Optional[Payment]:
+    payment_id, amount, payment_method, status = row
+    try:
+        return Payment(payment_id=payment_id, amount=amount, payment_method=payment_method, status=status)
+    except Exception:
+        return None
+
+
+def _filter_clauses(payment_filter: PaymentFilter) -> Tuple[List[str], list]:
+    """WHERE conditions and parameters selecting the payments matching the filter."""
+    clauses, params = [], []
+    if payment_filter.status is not None:
+        clauses.append("status = ?")
+        params.append(payment_filter.status.value)
+    if payment_filter.payment_method is not None:
+        clauses.append("payment_method = ?")
+        params.append(payment_filter.payment_method.value)
+    if payment_filter.min_amount is not None:
+        clauses.append("amount >= ?")
+        params.append(payment_filter.min_amount)
+    if payment_filter.max_amount is not None:
+        clauses.append("amount <= ?")
+        params.append(payment_filter.max_amount)
+    return clauses, params
@@ -0,0 +1,196 @@
+import json
+import os
+import zlib
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Set, Tuple
+from ..metrics import FILE_BYTES, STAGE_SECONDS
+from .base_payment_storage import file_signature
+
+
+class WriteAheadLog:
+    """
+    Append-only log of payment mutations backed by a JSON snapshot.
+
+    Each mutation (a put with the full payment fields, or a delete) is appended
+    as one line ``<crc32> <json>`` to ``<snapshot>.wal``.
+    The snapshot keeps the same layout as ``payments.json`` ({id: fields}) and is
+    rewritten only on compaction, so regular writes cost O(1).
+
+    Every append_many call is durable when it returns (one write and one fsync).
+    Group commit happens in the callers: save_many and the asynchronous writer
+    hand over everything queued meanwhile as a single call.
+
+    Attributes:
+        snapshot_path (str): Path of the JSON snapshot.
+        log_path (str): Path of the append-only log.
+        compact_threshold (int): Records in the log before a snapshot is due.
+    """
+    def __init__(self, snapshot_path: str, compact_threshold: int = 10000) -> None:
+        self.snapshot_path = snapshot_path
+        self.log_path = snapshot_path + ".wal"
+        self.compact_threshold = compact_threshold
+        self._file = None
+        self._log_offset = 0
+        self._snapshot_signature = None
+        self._records_in_log = 0
+
+    def recover(self) -> Dict[str, Dict[str, Any]]:
+        """
+        Load the snapshot and replay the log on top of it.
+        Replay stops at the first torn or corrupt record; that tail is cut off
+        by the next append.
+        """
+        state = self._read_snapshot()
+        puts, deleted = self.recover_log()
+        for payment_id in deleted:
+            state.pop(payment_id, None)
+        state.update(puts)
+        return state
+
+    def recover_log(self) -> Tuple[Dict[str, Dict[str, Any]], Set[str]]:
+        """
+        Replay only the log, for callers that read the snapshot themselves: returns
+        the latest fields of each payment put since the snapshot, and the ids whose
+        latest record deletes them (from the snapshot or the log).
+        """
+        self._snapshot_signature = file_signature(self.snapshot_path)
+        puts: Dict[str, Dict[str, Any]] = {}
+        deleted: Set[str] = set()
+        self._log_offset = 0
+        self._records_in_log = 0
+        for end, record in self._read_log(0):
+            if record.get("op") == "put":
+                puts[record["payment_id"]] = record["data"]
+                deleted.discard(record["payment_id"])
+            elif record.get("op") == "del":
+                puts.pop(record["payment_id"], None)
+                deleted.add(record["payment_id"])
+            self._log_offset = end
+            self._records_in_log += 1
+        return puts, deleted
+
+    def read_new_records(self) -> Optional[List[Tuple[str, Dict[str, Any]]]]:
+        """
+        Return the (payment_id, data) records appended by other writers since the last read;
+        data is None for deletions. Returns None when the snapshot was compacted meanwhile
+        and a full recover is needed.
+        """
+        if file_signature(self.snapshot_path) != self._snapshot_signature:
+            return None
+        try:
+            size = os.path.getsize(self.log_path)
+        except FileNotFoundError:
+            size = 0
+        if size < self._log_offset:
+            return None
+        records = []
+        if size > self._log_offset:
+            for end, record in self._read_log(self._log_offset):
+                if record.get("op") == "put":
+                    records.append((record["payment_id"], record["data"]))
+                elif record.get("op") == "del":
+                    records.append((record["payment_id"], None))
+                self._log_offset = end
+                self._records_in_log += 1
+        return records
+
+    def append(self, payment_id: str, data: Dict[str, Any]) -> None:
+        """Append a put record and fsync it."""
+        self.append_many([(payment_id, data)])
+
+    def append_many(self, records: Iterable[Tuple[str, Optional[Dict[str, Any]]]]) -> None:
+        """
+        Append several records with a single write and one fsync; they are on
+        stable storage when this returns. A record with data None deletes the payment.
+        """
+        lines = []
+        with STAGE_SECONDS.time("serialization"):
+            for payment_id, data in records:
+                entry = ({"op": "put", "payment_id": payment_id, "data": data} if data is not None
+                         else {"op": "del", "payment_id": payment_id})
+                line = json.dumps(entry, separators=(",", ":"), ensure_ascii=False).encode("utf-8")
+                lines.append(b"%08x %s\n" % (zlib.crc32(line), line))
+        if not lines:
+            return
+        data = b"".join(lines)
+        with STAGE_SECONDS.time("write"):
+            f = self._open()
+            if os.fstat(f.fileno()).st_size != self._log_offset:
+                # Drop a torn tail left by a crashed writer before appending after it.
+                f.truncate(self._log_offset)
+            f.write(data)
+            f.flush()
+        with STAGE_SECONDS.time("fsync"):
+            os.fsync(f.fileno())
+        self._log_offset += len(data)
+        self._records_in_log += len(lines)
+
+    @property
+    def needs_compaction(self) -> bool:
+        """True once the log holds more records than ``compact_threshold``."""
+        return self._records_in_log >= self.compact_threshold
+
+    def compact(self, state: Dict[str, Dict[str, Any]]) -> None:
+        """Atomically write ``state`` as the new snapshot and truncate the log."""
+        tmp_path = self.snapshot_path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            with STAGE_SECONDS.time("serialization"):
+                json.dump(state, f, separators=(",", ":"), ensure_ascii=False)
+                f.flush()
+            with STAGE_SECONDS.time("fsync"):
+                os.fsync(f.fileno())
+            FILE_BYTES.observe(f.tell(), "wal_snapshot")
+        os.replace(tmp_path, self.snapshot_path)
+        self._snapshot_signature = file_signature(self.snapshot_path)
+        # Replaying the old log over the new snapshot is harmless (puts carry full
+        # state), so a crash before the truncate below does not lose anything.
+        self.close()
+        with open(self.log_path, "wb") as f:
+            os.fsync(f.fileno())
+        self._log_offset = 0
+        self._records_in_log = 0
+
+    def close(self) -> None:
+        """Close the log file."""
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    def _open(self):
+        if self._file is None:
+            self._file = open(self.log_path, "ab")
+        return self._file
+
+    def _read_snapshot(self) -> Dict[str, Dict[str, Any]]:
+        try:
+            with open(self.snapshot_path, "r", encoding="utf-8") as f:
+                return dict(json.load(f) or {})
+        except (FileNotFoundError, json.JSONDecodeError):
+            return {}
+
+    def _read_log(self, start: int) -> Iterator[Tuple[int, Dict[str, Any]]]:
+        """Yield (end offset, record) for each intact record after start; stop at the first bad one."""
+        try:
+            f = open(self.log_path, "rb")
+        except FileNotFoundError:
+            return
+        with f:
+            f.seek(start)
+            offset = start
+            for raw in f:
+                record = self._decode(raw)
+                if record is None:
+                    return
+                offset += len(raw)
+                yield offset, record
+
+    @staticmethod
+    def _decode(raw: bytes) -> Optional[Dict[str, Any]]:
+        if not raw.endswith(b"\n"):
+            return None
+        checksum, _, body = raw.rstrip(b"\n").partition(b" ")
+        try:
+            if int(checksum, 16) != zlib.crc32(body):
+                return None
+            return json.loads(body.decode("utf-8"))
+        except ValueError:
+            return None
@@ -0,0 +1,56 @@
+from itertools import chain
+from typing import Dict, Iterable
+from ..metrics import STAGE_SECONDS
+from ..payment import Payment
+from .base_payment_storage import payment_to_record, records_to_payments
+from .compact_payment import CompactPayment, records_to_compact
+from .json_file_payment_storage import JsonFilePaymentStorage
+from .write_ahead_log import WriteAheadLog
+
+
+class WriteAheadLogPaymentStorage(JsonFilePaymentStorage):
+    """
+    In-memory payments persisted through an append-only WriteAheadLog.
+    data_path holds the snapshot (same layout as JsonFilePaymentStorage), so an
+    existing payments.json can be used as the starting point.
+    With lazy=True only the log is replayed at startup; the snapshot is indexed
+    in the background and decoded on demand.
+    """
+    def __init__(self, data_path: str, lazy: bool = False, **wal_options) -> None:
+        self._wal = WriteAheadLog(data_path, **wal_options)
+        super().__init__(data_path, lazy=lazy)
+        if lazy:
+            puts, deleted = self._wal.recover_log()
+            # Deleted ids may still be in the snapshot file the lazy index reads.
+            self._tombstones.update(deleted)
+            self._snapshot = self._snapshot.with_changes(records_to_compact(puts).values())
+
+    def refresh(self) -> bool:
+        """Replay records appended by other processes, or reload after their compaction."""
+        with self._publish_lock:
+            records = self._wal.read_new_records()
+            if records is None:
+                self._replace_all(records_to_compact(self._wal.recover()))
+                return True
+            latest = dict(records)
+            deleted = [pid for pid, data in latest.items() if data is None]
+            if deleted:
+                self._materialize_all()
+                self._snapshot = self._snapshot.with_changes(deletes=deleted)
+            self._put_all(records_to_payments({pid: data for pid, data in latest.items() if data is not None}).values())
+            return bool(records)
+
+    def close(self) -> None:
+        self._wal.close()
+        super().close()
+
+    def _persist(self, changed: Iterable[Payment], deleted: Iterable[str] = ()) -> None:
+        self._wal.append_many(chain(((p.payment_id, payment_to_record(p)) for p in changed),
+                                    ((pid, None) for pid in deleted)))
+        if self._wal.needs_compaction:
+            self._materialize_all()
+            self._wal.compact({pid: r.to_record() for pid, r in self._snapshot.items()})
+
+    def _load_from_disk(self) -> Dict[str, CompactPayment]:
+        with STAGE_SECONDS.time("load"):
+            return records_to_compact(self._wal.recover())
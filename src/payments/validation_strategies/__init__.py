@@ -1,12 +1,14 @@
 # src/payments/validation_strategies/__init__.py
 
 from .base_payment_method_validation_strategy import BasePaymentMethodValidationStrategy
+from .rule_based_validation_strategy import RuleBasedValidationStrategy
 from .paypal_validation_strategy import PayPalValidationStrategy
 from .creditcard_validation_strategy import CreditCardValidationStrategy
 from .payment_method_validation_strategy_factory import PaymentMethodValidationStrategyFactory
 
 __all__ = [
     "BasePaymentMethodValidationStrategy",
+    "RuleBasedValidationStrategy",
     "PayPalValidationStrategy",
     "CreditCardValidationStrategy",
     "PaymentMethodValidationStrategyFactory",
@@ -1,9 +1,28 @@
 from abc import ABC, abstractmethod
-from typing import List
+from typing import Iterable, List, Sequence, Union
 from ..payment import Payment
+from ..payment_status_counts import PaymentStatusCounts
 
 class BasePaymentMethodValidationStrategy(ABC):
     @abstractmethod
-    def validate(self, payment: Payment, payments: List[Payment]) -> bool:
-        """Validate a payment against strategy rules."""
-        raise NotImplementedError
\ No newline at end of file
+    def validate(self, payment: Payment, payments: Union[PaymentStatusCounts, Iterable[Payment]]) -> bool:
+        """
+        Validate a payment against strategy rules.
+        payments is either the service's PaymentStatusCounts index or the full list of payments.
+        """
+        raise NotImplementedError
+
+    def validate_batch(self, payments: Sequence[Payment], counts: PaymentStatusCounts) -> List[bool]:
+        """Validate several payments against the same counts; one bool per payment."""
+        return [self.validate(p, counts) for p in payments]
+
+    def check_payment_rules(self, payments: Sequence[Payment]) -> List[bool]:
+        """
+        Evaluate, for a whole batch, the rules that depend only on each payment.
+        A payment must pass these and check_count_rules to be valid.
+        """
+        return [True] * len(payments)
+
+    def check_count_rules(self, payment: Payment, counts: PaymentStatusCounts) -> bool:
+        """Evaluate the rules not covered by check_payment_rules (by default, all of them)."""
+        return self.validate(payment, counts)
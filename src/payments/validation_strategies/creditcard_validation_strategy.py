@@ -1,20 +1,13 @@
-from typing import List
-from ..payment import Payment
-from ..payment_status import PaymentStatus
-from .base_payment_method_validation_strategy import BasePaymentMethodValidationStrategy
+from .rule_based_validation_strategy import RuleBasedValidationStrategy
 
 
-class CreditCardValidationStrategy(BasePaymentMethodValidationStrategy):
+class CreditCardValidationStrategy(RuleBasedValidationStrategy):
     """
     Validation strategy for credit card payments.
+    By default, validates that the payment amount is less than 10,000 and
+    there is only one registered payment of the same method.
     """
-    def validate(self, payment: Payment, payments: List[Payment]) -> bool:
-        """
-        Validates that the payment amount is less than 10,000 and
-        there is only one registered payment of the same method.
-        """
-        registered_payments_of_same_method = [
-            p for p in payments
-            if p.payment_method == payment.payment_method and p.status == PaymentStatus.REGISTRADO
-        ]
-        return payment.amount < 10000 and len(registered_payments_of_same_method) == 1
\ No newline at end of file
+    DEFAULT_RULES = (
+        {"rule": "max_amount", "limit": 10000},
+        {"rule": "registered_count", "equals": 1},
+    )
@@ -1,17 +1,32 @@
-from typing import Optional, Dict
+import json
+from typing import Any, Dict, Mapping, Optional, Sequence
 from ..payment_method import PaymentMethod
 from . import BasePaymentMethodValidationStrategy, PayPalValidationStrategy, CreditCardValidationStrategy
 
+RulesConfig = Mapping[str, Sequence[Mapping[str, Any]]]
+
 class PaymentMethodValidationStrategyFactory:
     """
     Factory for retrieving payment method validation strategies.
+    rules maps a payment method name (e.g. "PAYPAL") to the rule list that replaces
+    that strategy's default rules; methods not listed keep their defaults.
     """
-    def __init__(self) -> None:
+    def __init__(self, rules: Optional[RulesConfig] = None) -> None:
+        rules = rules or {}
+        unknown = set(rules) - {m.value for m in PaymentMethod}
+        if unknown:
+            raise ValueError(f"unknown payment methods in validation rules: {sorted(unknown)}")
         self._registry: Dict[PaymentMethod, BasePaymentMethodValidationStrategy] = {
-            PaymentMethod.PAYPAL: PayPalValidationStrategy(),
-            PaymentMethod.CREDIT_CARD: CreditCardValidationStrategy(),
+            PaymentMethod.PAYPAL: PayPalValidationStrategy(rules.get(PaymentMethod.PAYPAL.value)),
+            PaymentMethod.CREDIT_CARD: CreditCardValidationStrategy(rules.get(PaymentMethod.CREDIT_CARD.value)),
         }
 
+    @classmethod
+    def from_file(cls, path: str) -> "PaymentMethodValidationStrategyFactory":
+        """Build the factory from a JSON rules file ({method: [rule, ...]})."""
+        with open(path, "r", encoding="utf-8") as f:
+            return cls(json.load(f))
+
     def get(self, payment_method: PaymentMethod) -> Optional[BasePaymentMethodValidationStrategy]:
         """Return the corresponding strategy or None if it does not exist."""
         return self._registry.get(payment_method)
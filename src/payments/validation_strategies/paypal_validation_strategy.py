@@ -1,13 +1,10 @@
-from typing import List
-from ..payment import Payment
-from .base_payment_method_validation_strategy import BasePaymentMethodValidationStrategy
+from .rule_based_validation_strategy import RuleBasedValidationStrategy
 
-class PayPalValidationStrategy(BasePaymentMethodValidationStrategy):
+class PayPalValidationStrategy(RuleBasedValidationStrategy):
     """
     Validation strategy for PayPal payments.
+    By default, validates that the payment amount is less than 5,000.
     """
-    def validate(self, payment: Payment, payments: List[Payment]) -> bool:
-        """
-        Validates that the payment amount is less than 5,000.
-        """
-        return payment.amount < 5000
\ No newline at end of file
+    DEFAULT_RULES = (
+        {"rule": "max_amount", "limit": 5000},
+    )
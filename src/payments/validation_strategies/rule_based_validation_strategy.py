@@ -0,0 +1,41 @@
+from typing import Any, Iterable, List, Mapping, Optional, Sequence, Union
+from ..payment import Payment
+from ..payment_status_counts import PaymentStatusCounts
+from .base_payment_method_validation_strategy import BasePaymentMethodValidationStrategy
+from .validation_rules import compile_rules
+
+
+class RuleBasedValidationStrategy(BasePaymentMethodValidationStrategy):
+    """
+    Validation strategy driven by declarative rules (see compile_rules).
+    Subclasses set DEFAULT_RULES; a rules argument overrides them.
+    """
+    DEFAULT_RULES: Sequence[Mapping[str, Any]] = ()
+
+    def __init__(self, rules: Optional[Iterable[Mapping[str, Any]]] = None) -> None:
+        self.rules = list(self.DEFAULT_RULES if rules is None else rules)
+        self._compiled = compile_rules(self.rules)
+
+    def validate(self, payment: Payment, payments: Union[PaymentStatusCounts, Iterable[Payment]]) -> bool:
+        """Validates the payment against every configured rule."""
+        return self._compiled.check(payment, _as_counts(payments))
+
+    def validate_batch(self, payments: Sequence[Payment], counts: Union[PaymentStatusCounts, Iterable[Payment]]) -> List[bool]:
+        """Validates several payments against the same counts, payment-only rules column-wise."""
+        counts = _as_counts(counts)
+        return [ok and self._compiled.check_stateful(p, counts)
+                for p, ok in zip(payments, self._compiled.check_columns(payments))]
+
+    def check_payment_rules(self, payments: Sequence[Payment]) -> List[bool]:
+        """Evaluates the payment-only rules (e.g. amount limits) column-wise over the batch."""
+        return self._compiled.check_columns(payments)
+
+    def check_count_rules(self, payment: Payment, counts: PaymentStatusCounts) -> bool:
+        """Evaluates only the rules that depend on the current counts."""
+        return self._compiled.check_stateful(payment, counts)
+
+
+def _as_counts(payments: Union[PaymentStatusCounts, Iterable[Payment]]) -> PaymentStatusCounts:
+    if isinstance(payments, PaymentStatusCounts):
+        return payments
+    return PaymentStatusCounts.from_payments(payments)
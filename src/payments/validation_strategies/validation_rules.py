@@ -0,0 +1,88 @@
+import operator
+from typing import Any, Callable, Dict, Iterable, List, Mapping, Sequence
+from ..payment_status import PaymentStatus
+from ..payment_status_counts import PaymentStatusCounts
+
+# Column predicate: amounts of a batch -> one bool per payment.
+ColumnPredicate = Callable[[Sequence[float]], List[bool]]
+# Predicate that depends on the current counts, evaluated one payment at a time.
+StatefulPredicate = Callable[[Any, PaymentStatusCounts], bool]
+
+
+class CompiledRules:
+    """
+    Validation rules compiled from config.
+
+    Rules that only look at the payment itself are compiled into column predicates
+    evaluated over a whole batch at once; rules that depend on other payments
+    (through PaymentStatusCounts) are kept per item, since each transition changes
+    the counts seen by the next one.
+    """
+    def __init__(self, column_predicates: List[ColumnPredicate], stateful_predicates: List[StatefulPredicate]) -> None:
+        self.column_predicates = column_predicates
+        self.stateful_predicates = stateful_predicates
+
+    def check_columns(self, payments: Sequence[Any]) -> List[bool]:
+        """Evaluate the payment-only rules for a batch; one bool per payment."""
+        result = [True] * len(payments)
+        if not self.column_predicates:
+            return result
+        amounts = [p.amount for p in payments]
+        for predicate in self.column_predicates:
+            result = list(map(operator.and_, result, predicate(amounts)))
+        return result
+
+    def check_stateful(self, payment: Any, counts: PaymentStatusCounts) -> bool:
+        """Evaluate the count-dependent rules for one payment."""
+        return all(predicate(payment, counts) for predicate in self.stateful_predicates)
+
+    def check(self, payment: Any, counts: PaymentStatusCounts) -> bool:
+        """Evaluate every rule for one payment."""
+        return self.check_columns([payment])[0] and self.check_stateful(payment, counts)
+
+
+def _max_amount(rule: Mapping[str, Any]) -> ColumnPredicate:
+    limit = float(rule["limit"])
+    return lambda amounts: [a < limit for a in amounts]
+
+
+def _min_amount(rule: Mapping[str, Any]) -> ColumnPredicate:
+    limit = float(rule["limit"])
+    return lambda amounts: [a >= limit for a in amounts]
+
+
+def _registered_count(rule: Mapping[str, Any]) -> StatefulPredicate:
+    expected = int(rule["equals"])
+    return lambda payment, counts: counts.count(payment.payment_method, PaymentStatus.REGISTRADO) == expected
+
+
+_COLUMN_RULES: Dict[str, Callable[[Mapping[str, Any]], ColumnPredicate]] = {
+    "max_amount": _max_amount,
+    "min_amount": _min_amount,
+}
+_STATEFUL_RULES: Dict[str, Callable[[Mapping[str, Any]], StatefulPredicate]] = {
+    "registered_count": _registered_count,
+}
+
+
+def compile_rules(rules: Iterable[Mapping[str, Any]]) -> CompiledRules:
+    """
+    Compile rule definitions such as:
+        {"rule": "max_amount", "limit": 5000}        amount < limit
+        {"rule": "min_amount", "limit": 1}           amount >= limit
+        {"rule": "registered_count", "equals": 1}    REGISTRADO payments of the same method == equals
+    Raises ValueError for unknown rules or missing parameters.
+    """
+    column, stateful = [], []
+    for rule in rules:
+        name = rule.get("rule")
+        try:
+            if name in _COLUMN_RULES:
+                column.append(_COLUMN_RULES[name](rule))
+            elif name in _STATEFUL_RULES:
+                stateful.append(_STATEFUL_RULES[name](rule))
+            else:
+                raise ValueError(f"unknown validation rule: {name!r}")
+        except (KeyError, TypeError) as e:
+            raise ValueError(f"invalid parameters for validation rule {name!r}: {e}") from e
+    return CompiledRules(column, stateful)
@@ -0,0 +1,78 @@
+import asyncio
+import pytest
+from payments.admission_control import AdmissionController, AdmissionLimit, AdmissionMiddleware, AdmissionRejected
+
+
+def _controller(**limits):
+    return AdmissionController({name: AdmissionLimit.parse(text, priority)
+                                for priority, (name, text) in enumerate(limits.items())}, max_total=1)
+
+
+def test_full_queue_and_expired_deadline_are_rejected():
+    """
+    Requests beyond the queue bound fail at once; queued ones fail when their deadline passes.
+    """
+    async def scenario():
+        controller = _controller(read="1,1,0.05")
+        await controller.acquire("read")
+        waiter = asyncio.ensure_future(controller.acquire("read"))
+        await asyncio.sleep(0)
+        with pytest.raises(AdmissionRejected) as full:
+            await controller.acquire("read")
+        with pytest.raises(AdmissionRejected) as late:
+            await waiter
+        controller.release("read")
+        return full.value, late.value, controller.stats()["read"]
+
+    full, late, stats = asyncio.run(scenario())
+    assert (full.reason, late.reason, full.retry_after) == ("queue_full", "timeout", 1)
+    assert (stats.in_flight, stats.queued, stats.admitted) == (0, 0, 1)
+    assert (stats.rejected_queue_full, stats.rejected_timeout) == (1, 1)
+
+
+def test_freed_slots_go_to_reads_before_bulk_writes():
+    """
+    A read queued after a bulk write is admitted first when the shared slot frees up.
+    """
+    async def scenario():
+        controller = _controller(read="4,4,1", bulk="4,4,1")
+        order = []
+
+        async def request(endpoint_class):
+            await controller.acquire(endpoint_class)
+            order.append(endpoint_class)
+            controller.release(endpoint_class)
+
+        await controller.acquire("bulk")
+        waiters = [asyncio.ensure_future(request("bulk")), asyncio.ensure_future(request("read"))]
+        await asyncio.sleep(0)
+        controller.release("bulk")
+        await asyncio.gather(*waiters)
+        return order
+
+    assert asyncio.run(scenario()) == ["read", "bulk"]
+
+
+def test_middleware_sheds_with_retry_after():
+    """
+    A rejected request gets a 503 with Retry-After; unclassified ones bypass admission.
+    """
+    async def app(scope, receive, send):
+        await send({"type": "http.response.start", "status": 200, "headers": []})
+        await send({"type": "http.response.body", "body": b""})
+
+    async def scenario():
+        controller = _controller(write="1,0,2")
+        middleware = AdmissionMiddleware(app, controller, lambda method, path: None if path == "/" else "write")
+        await controller.acquire("write")
+        responses = []
+
+        async def send(message):
+            if message["type"] == "http.response.start":
+                responses.append((message["status"], dict(message["headers"]).get(b"retry-after")))
+
+        for path in ("/payments/p1", "/"):
+            await middleware({"type": "http", "method": "POST", "path": path}, None, send)
+        return responses
+
+    assert asyncio.run(scenario()) == [(503, b"2"), (200, None)]
@@ -0,0 +1,138 @@
+import asyncio
+import threading
+import pytest
+from payments import PaymentService, PaymentStatus, PaymentMethod
+from payments.async_payment_service import AsyncPaymentService
+from payments.storage import JsonFilePaymentStorage
+
+
+class CountingStorage(JsonFilePaymentStorage):
+    def __init__(self, data_path, fail=False):
+        super().__init__(data_path)
+        self.batches = []
+        self.fail = fail
+        # When set, a failing save_many signals entered and waits for the gate first.
+        self.gate = None
+        self.entered = threading.Event()
+
+    def save_many(self, payments):
+        payments = list(payments)
+        if self.fail:
+            self.entered.set()
+            if self.gate is not None:
+                self.gate.wait(5)
+            raise OSError("disk full")
+        self.batches.append(len(payments))
+        super().save_many(payments)
+
+
+def test_concurrent_writes_share_disk_flushes(tmp_path):
+    """
+    Writes issued concurrently are persisted in fewer save_many calls than requests.
+    """
+    storage = CountingStorage(str(tmp_path / "payments.json"))
+    svc = AsyncPaymentService(PaymentService(storage=storage))
+
+    async def run():
+        await asyncio.gather(*(svc.create_payment(f"p{i}", 10.0, "paypal") for i in range(50)))
+        paid = await asyncio.gather(*(svc.pay_payment(f"p{i}") for i in range(50)))
+        await svc.close()
+        return paid
+
+    paid = asyncio.run(run())
+    assert all(p.status == PaymentStatus.PAGADO for p in paid)
+    assert sum(storage.batches) == 100
+    assert len(storage.batches) < 100
+    assert len(PaymentService(str(tmp_path / "payments.json")).load_all_payments()) == 50
+
+
+def test_pay_and_revert_roundtrip(tmp_path):
+    """
+    The async API mirrors the PaymentService transitions.
+    """
+    svc = AsyncPaymentService(PaymentService(str(tmp_path / "payments.json")))
+
+    async def run():
+        await svc.create_payment("p1", 9000.0, PaymentMethod.PAYPAL)
+        failed = await svc.pay_payment("p1")
+        updated = await svc.update_payment("p1", 100.0, None)
+        reverted = await svc.revert_payment("p1")
+        updated = await svc.update_payment("p1", 100.0, None)
+        paid = await svc.pay_payment("p1")
+        with pytest.raises(KeyError):
+            await svc.pay_payment("missing")
+        return failed, reverted, updated, paid
+
+    failed, reverted, updated, paid = asyncio.run(run())
+    assert failed.status == PaymentStatus.FALLIDO
+    assert reverted.status == PaymentStatus.REGISTRADO
+    assert updated.amount == 100.0
+    assert paid.status == PaymentStatus.PAGADO
+
+
+def test_failed_flush_is_reported_and_rolled_back(tmp_path):
+    """
+    A storage error reaches the caller and the staged counts are undone, and so
+    does every request decided while the failed write was staged: paying c1 fails
+    while the creation of c2 is pending, so it must not be reported either.
+    """
+    storage = CountingStorage(str(tmp_path / "payments.json"))
+    service = PaymentService(storage=storage)
+    svc = AsyncPaymentService(service)
+
+    async def run():
+        await svc.create_payment("c1", 10.0, PaymentMethod.CREDIT_CARD)
+        storage.fail = True
+        with pytest.raises(OSError):
+            await svc.create_payment("p1", 10.0, PaymentMethod.PAYPAL)
+        assert service.status_counts.as_dict() == {(PaymentMethod.CREDIT_CARD, PaymentStatus.REGISTRADO): 1}
+
+        storage.gate = gate = threading.Event()
+        storage.entered.clear()
+        created = asyncio.ensure_future(svc.create_payment("c2", 10.0, PaymentMethod.CREDIT_CARD))
+        await asyncio.to_thread(storage.entered.wait, 5)
+        paid = asyncio.ensure_future(svc.pay_payment("c1"))
+        await asyncio.sleep(0)
+        storage.fail = False
+        gate.set()
+        results = await asyncio.gather(created, paid, return_exceptions=True)
+        assert [type(r) for r in results] == [OSError, OSError]
+        return await svc.pay_payment("c1")
+
+    retried = asyncio.run(run())
+    assert not storage.contains("p1") and not storage.contains("c2")
+    assert retried.status == PaymentStatus.PAGADO
+    assert service.status_counts.as_dict() == {(PaymentMethod.CREDIT_CARD, PaymentStatus.PAGADO): 1}
+
+
+def test_storage_reads_leave_the_loop_unless_in_memory(tmp_path):
+    """
+    SQLite lookups run in a worker thread; in-memory backends decide on the loop once the indexes are built.
+    """
+    import threading
+    from payments.storage import SQLitePaymentStorage
+
+    class RecordingSQLite(SQLitePaymentStorage):
+        threads = set()
+
+        def get(self, payment_id):
+            self.threads.add(threading.current_thread())
+            return super().get(payment_id)
+
+    class RecordingJson(JsonFilePaymentStorage):
+        threads = set()
+
+        def get(self, payment_id):
+            self.threads.add(threading.current_thread())
+            return super().get(payment_id)
+
+    async def run(storage):
+        svc = AsyncPaymentService(PaymentService(storage=storage))
+        await svc.create_payment("p1", 10.0, "paypal")
+        await svc.pay_payment("p1")
+        await svc.close()
+
+    asyncio.run(run(RecordingSQLite(str(tmp_path / "payments.db"))))
+    asyncio.run(run(RecordingJson(str(tmp_path / "payments.json"))))
+    assert threading.main_thread() not in RecordingSQLite.threads
+    assert RecordingJson.threads == {threading.main_thread()}
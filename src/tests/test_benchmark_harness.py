@@ -0,0 +1,25 @@
+from benchmarks.harness import BenchResult, compare, load_baseline, percentile, save_baseline
+
+
+def test_percentile_uses_nearest_rank():
+    """
+    p50/p99 pick an observed latency, not an interpolated one.
+    """
+    values = [float(v) for v in range(1, 101)]
+    assert percentile(values, 50) == 50.0
+    assert percentile(values, 99) == 99.0
+    assert percentile([], 99) == 0.0
+
+
+def test_compare_flags_throughput_and_latency_regressions(tmp_path):
+    """
+    Results saved as a baseline are compared per benchmark and size.
+    """
+    path = str(tmp_path / "baseline.json")
+    save_baseline([BenchResult("pay", 1000, 100, 1.0, 5.0, 10.0)], path)
+    baseline = load_baseline(path)
+
+    assert compare([BenchResult("pay", 1000, 100, 1.1, 5.0, 11.0)], baseline) == []
+    slower = compare([BenchResult("pay", 1000, 100, 2.0, 5.0, 30.0)], baseline)
+    assert [r.metric for r in slower] == ["ops_per_sec", "p99_ms"]
+    assert compare([BenchResult("pay", 10000, 100, 9.0, 5.0, 90.0)], baseline) == []
@@ -0,0 +1,77 @@
+import json
+import pytest
+from payments import PaymentService, PaymentMethod, PaymentStatus
+from payments.storage import BinaryFilePaymentStorage, create_payment_storage
+from payments.storage.binary_snapshot import (
+    SnapshotFormatError, binary_to_json, iter_snapshot, json_to_binary, read_snapshot,
+)
+
+
+def test_binary_storage_round_trips_payments(tmp_path):
+    """
+    Payments written by the binary backend are reloaded unchanged by a new instance.
+    """
+    path = str(tmp_path / "payments.bin")
+    svc = PaymentService(storage=create_payment_storage("binary", path))
+    svc.create_payment("p1", 10.5, PaymentMethod.PAYPAL)
+    svc.create_payment("pé-2", 20.0, PaymentMethod.CREDIT_CARD)
+    svc.pay_payment("p1")
+
+    reloaded = BinaryFilePaymentStorage(path).load_all()
+    assert reloaded["p1"].status == PaymentStatus.PAGADO
+    assert reloaded["pé-2"].amount == 20.0
+    assert reloaded["pé-2"].payment_method == PaymentMethod.CREDIT_CARD
+
+
+@pytest.mark.parametrize("kind", ["json", "binary"])
+def test_data_file_is_synced_before_it_is_replaced(tmp_path, monkeypatch, kind):
+    """
+    Each write syncs the temporary file before renaming it over the data file.
+    """
+    import payments.storage.json_file_payment_storage as json_file_payment_storage
+    path = tmp_path / "payments.data"
+    storage = create_payment_storage(kind, str(path))
+    events = []
+    real_fsync, real_replace = json_file_payment_storage.os.fsync, json_file_payment_storage.os.replace
+    monkeypatch.setattr(json_file_payment_storage.os, "fsync", lambda fd: events.append("fsync") or real_fsync(fd))
+    monkeypatch.setattr(json_file_payment_storage.os, "replace",
+                        lambda src, dst: events.append("replace") or real_replace(src, dst))
+    svc = PaymentService(storage=storage)
+    svc.create_payment("p1", 10.0, PaymentMethod.PAYPAL)
+    svc.pay_payment("p1")
+    assert events == ["fsync", "replace"] * 2
+
+
+def test_converters_round_trip_payments_json(tmp_path):
+    """
+    payments.json -> binary -> JSON keeps every valid entry and drops invalid ones.
+    """
+    original = {
+        "a": {"amount": 1.0, "payment_method": "PAYPAL", "status": "REGISTRADO"},
+        "b": {"amount": 2.5, "payment_method": "CREDIT_CARD", "status": "FALLIDO"},
+        "bad": {"amount": 3.0, "payment_method": "BITCOIN", "status": "REGISTRADO"},
+    }
+    src = tmp_path / "payments.json"
+    src.write_text(json.dumps(original))
+
+    assert json_to_binary(str(src), str(tmp_path / "payments.bin")) == 2
+    assert binary_to_json(str(tmp_path / "payments.bin"), str(tmp_path / "out.json"), compact=True) == 2
+    out = (tmp_path / "out.json").read_text()
+    assert " " not in out
+    del original["bad"]
+    assert json.loads(out) == original
+
+
+def test_invalid_snapshot_is_rejected(tmp_path):
+    """
+    Files without the snapshot header or with truncated records raise SnapshotFormatError.
+    """
+    with pytest.raises(SnapshotFormatError):
+        list(iter_snapshot(b"{}"))
+    path = tmp_path / "payments.bin"
+    source = tmp_path / "payments.json"
+    source.write_text(json.dumps({"a": {"amount": 1, "payment_method": "PAYPAL", "status": "PAGADO"}}))
+    json_to_binary(str(source), str(path))
+    path.write_bytes(path.read_bytes()[:-1])
+    with pytest.raises(SnapshotFormatError):
+        read_snapshot(str(path))
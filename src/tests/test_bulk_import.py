@@ -0,0 +1,96 @@
+import json
+import pytest
+from payments import PaymentMethod, PaymentService, PaymentStatus
+from payments.bulk_import import import_file, revalidate
+from payments.bulk_import_cli import main
+
+
+@pytest.mark.parametrize("workers", [1, 2])
+def test_import_file_reports_invalid_rows_and_duplicates(tmp_path, workers):
+    """Valid rows are imported with one commit; bad and duplicate rows are reported by line."""
+    svc = PaymentService(str(tmp_path / "payments.json"))
+    svc.create_payment("existing", 5.0, PaymentMethod.PAYPAL)
+    source = tmp_path / "in.csv"
+    source.write_text(
+        "payment_id,amount,payment_method,status\n"
+        "a,10.5,paypal,\n"
+        "b,20,credit card,PAGADO\n"
+        "c,ten,PayPal,\n"
+        "d,3,bitcoin,\n"
+        "existing,1,PayPal,\n"
+        "a,2,PayPal,\n",
+        encoding="utf-8")
+
+    report = import_file(svc, str(source), workers=workers, chunk_size=2)
+
+    assert (report.processed, report.imported) == (6, 2)
+    assert [line for line, *_ in report.errors] == [4, 5, 6, 7]
+    assert svc.storage.get("a").amount == 10.5
+    assert svc.storage.get("b").status == PaymentStatus.PAGADO
+    assert svc.status_counts.count(PaymentMethod.CREDIT_CARD, PaymentStatus.PAGADO) == 1
+    reopened = PaymentService(str(tmp_path / "payments.json"))
+    assert set(reopened.load_all_payments()) == {"existing", "a", "b"}
+
+
+def test_import_file_reads_json_and_ndjson(tmp_path):
+    """The payments.json layout and NDJSON exports are accepted as input."""
+    svc = PaymentService(str(tmp_path / "payments.json"))
+    layout = tmp_path / "in.json"
+    layout.write_text(json.dumps({"x": {"amount": 1, "payment_method": "PayPal", "status": "REGISTRADO"}}))
+    lines = tmp_path / "in.ndjson"
+    lines.write_text('{"payment_id": "y", "amount": 2, "payment_method": "PayPal"}\nnot json\n'
+                     '{"payment_id": "z", "amount": 3, "payment_method": "PayPal", "status": 1}\n')
+
+    assert import_file(svc, str(layout), workers=1).imported == 1
+    report = import_file(svc, str(lines), workers=1)
+    assert report.imported == 1
+    assert [line for line, *_ in report.errors] == [2, 3]
+    assert report.errors[1][2] == "invalid payment status: 1"
+    assert set(svc.load_all_payments()) == {"x", "y"}
+
+
+@pytest.mark.parametrize("workers", [1, 2])
+def test_revalidate_is_a_dry_run_unless_applied(tmp_path, workers):
+    """Revalidation matches validate_payments; apply pays the payments in one pass."""
+    svc = PaymentService(str(tmp_path / "payments.json"))
+    svc.create_payment("ok", 10.0, PaymentMethod.PAYPAL)
+    svc.create_payment("big", 9000.0, PaymentMethod.PAYPAL)
+    svc.create_payment("card", 10.0, PaymentMethod.CREDIT_CARD)
+
+    report = revalidate(svc, workers=workers, chunk_size=2)
+    assert (report.checked, report.valid, report.invalid_ids) == (3, 2, ["big"])
+    assert report.paid is None
+    assert svc.status_counts.count(PaymentMethod.PAYPAL, PaymentStatus.REGISTRADO) == 2
+
+    applied = revalidate(svc, workers=workers, apply=True)
+    assert (applied.paid, applied.failed) == (2, 1)
+    assert svc.storage.get("big").status == PaymentStatus.FALLIDO
+
+
+def test_cli_import_exit_status(tmp_path, capsys):
+    """The CLI prints a throughput summary and exits non-zero when rows were rejected."""
+    data = str(tmp_path / "payments.json")
+    source = tmp_path / "in.csv"
+    source.write_text("payment_id,amount,payment_method\na,1,PayPal\n", encoding="utf-8")
+    assert main(["import", str(source), "--data-path", data, "--workers", "1", "--quiet"]) == 0
+    assert "imported 1 of 1 rows" in capsys.readouterr().out
+    assert main(["import", str(source), "--data-path", data, "--workers", "1", "--quiet"]) == 1
+
+
+def test_cli_import_rejects_ids_already_archived(tmp_path, capsys):
+    """With --archive, ids that only live in the archive count as duplicates."""
+    from payments.storage import ArchivingPaymentStorage, PaymentArchive, create_payment_storage
+    data = str(tmp_path / "payments.json")
+    storage = ArchivingPaymentStorage(create_payment_storage("json", data), PaymentArchive(data + ".archive"), segment_size=1)
+    svc = PaymentService(storage=storage)
+    svc.create_payment("a", 1.0, PaymentMethod.PAYPAL)
+    svc.pay_payment("a")
+    assert not storage.hot.contains("a")
+    svc.close()
+    source = tmp_path / "in.csv"
+    source.write_text("payment_id,amount,payment_method\na,2,PayPal\nb,3,PayPal\n", encoding="utf-8")
+
+    assert main(["import", str(source), "--data-path", data, "--archive", "--workers", "1", "--quiet"]) == 1
+    assert "imported 1 of 2 rows" in capsys.readouterr().out
+    reopened = create_payment_storage("json", data, archive=True)
+    assert reopened.get("a").status == PaymentStatus.PAGADO
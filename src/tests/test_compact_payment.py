@@ -0,0 +1,27 @@
+from payments import Payment, PaymentFilter, PaymentMethod, PaymentStatus
+from payments.storage.compact_payment import CompactPayment, records_to_compact
+
+
+def test_roundtrip_preserves_fields():
+    """
+    A payment converted to CompactPayment and back keeps every field.
+    """
+    payment = Payment(payment_id="p1", amount=12.5, payment_method=PaymentMethod.CREDIT_CARD, status=PaymentStatus.FALLIDO)
+    record = CompactPayment.from_payment(payment)
+
+    assert record.to_payment() == payment
+    assert record.to_record() == {"amount": 12.5, "payment_method": "CREDIT_CARD", "status": "FALLIDO"}
+    assert PaymentFilter(status=PaymentStatus.FALLIDO, max_amount=20).matches(record)
+
+
+def test_records_to_compact_skips_invalid_entries():
+    """
+    Entries with unknown methods/statuses or missing fields are skipped on load.
+    """
+    records = records_to_compact({
+        "ok": {"amount": 1, "payment_method": "PAYPAL", "status": "PAGADO"},
+        "bad_method": {"amount": 1, "payment_method": "BITCOIN", "status": "PAGADO"},
+        "missing": {"amount": 1},
+    })
+    assert list(records) == ["ok"]
+    assert records["ok"].status == PaymentStatus.PAGADO
@@ -0,0 +1,83 @@
+import asyncio
+import pytest
+from payments import PaymentService, PaymentMethod, PaymentStatus
+from payments.async_payment_service import AsyncPaymentService
+from payments.idempotency_cache import IdempotencyCache, IdempotencyKeyConflict
+
+
+def test_repeated_key_replays_result_and_cached_error(tmp_path):
+    """
+    Retries with the same key return the first outcome without touching the service.
+    """
+    svc = AsyncPaymentService(PaymentService(str(tmp_path / "payments.json")))
+    cache = IdempotencyCache()
+    calls = []
+
+    def create(pid):
+        calls.append(pid)
+        return svc.create_payment(pid, 10.0, PaymentMethod.PAYPAL)
+
+    async def scenario():
+        first = await cache.run("k1", ("create", "p1"), lambda: create("p1"))
+        again = await cache.run("k1", ("create", "p1"), lambda: create("p1"))
+        assert again is first
+        with pytest.raises(ValueError):
+            await cache.run("k2", ("create", "p1"), lambda: create("p1"))
+        with pytest.raises(ValueError):
+            await cache.run("k2", ("create", "p1"), lambda: create("p1"))
+        with pytest.raises(IdempotencyKeyConflict):
+            await cache.run("k1", ("create", "p2"), lambda: create("p2"))
+        paid = await asyncio.gather(*(cache.run("k3", ("pay", "p1"), lambda: svc.pay_payment("p1")) for _ in range(5)))
+        assert {p.status for p in paid} == {PaymentStatus.PAGADO}
+        await svc.close()
+
+    asyncio.run(scenario())
+    assert calls == ["p1", "p1"]
+
+
+def test_entries_expire_and_are_bounded():
+    """
+    Entries older than the TTL run again, and the least recently used key is evicted.
+    """
+    now = [0.0]
+    cache = IdempotencyCache(max_entries=2, ttl_seconds=10, clock=lambda: now[0])
+    runs = []
+
+    async def op(value):
+        runs.append(value)
+        return value
+
+    async def scenario():
+        await cache.run("a", 1, lambda: op("a"))
+        await cache.run("b", 1, lambda: op("b"))
+        await cache.run("a", 1, lambda: op("a"))
+        await cache.run("c", 1, lambda: op("c"))
+        await cache.run("b", 1, lambda: op("b"))
+        now[0] = 11
+        await cache.run("c", 1, lambda: op("c"))
+
+    asyncio.run(scenario())
+    assert runs == ["a", "b", "c", "b", "c"]
+    assert len(cache) == 2
+
+
+def test_uncached_errors_let_retries_run_again():
+    """
+    Failures outside cached_errors (e.g. a storage error) are not replayed.
+    """
+    cache = IdempotencyCache()
+    attempts = []
+
+    async def flaky():
+        attempts.append(1)
+        if len(attempts) == 1:
+            raise OSError("disk full")
+        return "ok"
+
+    async def scenario():
+        with pytest.raises(OSError):
+            await cache.run("k", 1, flaky)
+        assert await cache.run("k", 1, flaky) == "ok"
+
+    asyncio.run(scenario())
+    assert len(attempts) == 2
@@ -0,0 +1,92 @@
+import json
+from payments import PaymentService, PaymentStatus, PaymentMethod, PaymentFilter
+from payments.storage import JsonFilePaymentStorage, WriteAheadLogPaymentStorage
+
+
+def write_payments_file(path, entries):
+    path.write_text(json.dumps(entries, indent=4), encoding="utf-8")
+
+
+ENTRIES = {
+    "001": {"amount": 4000.0, "payment_method": "PAYPAL", "status": "REGISTRADO"},
+    'we"ird': {"amount": 1.0, "payment_method": "CREDIT_CARD", "status": "PAGADO"},
+    "bad": {"amount": 1.0, "payment_method": "BITCOIN", "status": "PAGADO"},
+    "003": {"amount": 5200.0, "payment_method": "PAYPAL", "status": "FALLIDO"},
+}
+
+
+def test_lazy_storage_matches_eager_storage(tmp_path):
+    """
+    A lazily loaded file exposes the same payments as an eager load.
+    """
+    data_file = tmp_path / "payments.json"
+    write_payments_file(data_file, ENTRIES)
+    lazy = JsonFilePaymentStorage(str(data_file), lazy=True)
+    eager = JsonFilePaymentStorage(str(data_file))
+
+    assert lazy.get('we"ird').status == PaymentStatus.PAGADO
+    assert not lazy.contains("bad")
+    assert [p.payment_id for p in lazy.query(PaymentFilter())] == ["001", "003", 'we"ird']
+    assert lazy.load_all() == eager.load_all()
+    assert lazy.count_by_method_and_status() == eager.count_by_method_and_status()
+
+
+def test_lazy_service_writes_keep_unloaded_payments(tmp_path):
+    """
+    Writing through a lazy storage persists the payments that were never accessed.
+    """
+    data_file = tmp_path / "payments.json"
+    write_payments_file(data_file, ENTRIES)
+    svc = PaymentService(storage=JsonFilePaymentStorage(str(data_file), lazy=True))
+    svc.create_payment("004", 10.0, PaymentMethod.PAYPAL)
+    assert svc.status_counts.count(PaymentMethod.PAYPAL, PaymentStatus.REGISTRADO) == 2
+
+    reloaded = JsonFilePaymentStorage(str(data_file)).load_all()
+    assert set(reloaded) == {"001", "003", "004", 'we"ird'}
+
+
+def test_lazy_write_ahead_log_replays_log_over_indexed_snapshot(tmp_path):
+    """
+    With a lazy WAL storage, log records take precedence over the snapshot.
+    """
+    data_file = tmp_path / "payments.json"
+    write_payments_file(data_file, ENTRIES)
+    svc = PaymentService(storage=WriteAheadLogPaymentStorage(str(data_file)))
+    svc.pay_payment("001")
+    svc.create_payment("005", 1.0, PaymentMethod.PAYPAL)
+    svc.close()
+
+    lazy = WriteAheadLogPaymentStorage(str(data_file), lazy=True)
+    assert lazy.get("001").status == PaymentStatus.PAGADO
+    assert [p.payment_id for p in lazy.query(PaymentFilter(payment_method=PaymentMethod.PAYPAL))] == ["001", "003", "005"]
+
+
+def test_materializing_does_not_drop_a_concurrent_write(tmp_path, monkeypatch):
+    """
+    A write that lands while a reader materializes the lazy index survives in memory and on disk.
+    """
+    import threading
+    import time
+    import payments.storage.json_file_payment_storage as json_storage
+
+    building = threading.Event()
+    from_records = json_storage.PaymentSnapshot.from_records
+
+    def slow_from_records(records, version=0):
+        if threading.current_thread().name == "reader":
+            building.set()
+            time.sleep(0.2)
+        return from_records(records, version)
+
+    monkeypatch.setattr(json_storage.PaymentSnapshot, "from_records", staticmethod(slow_from_records))
+    data_file = tmp_path / "payments.json"
+    write_payments_file(data_file, {"a": ENTRIES["001"]})
+    storage = JsonFilePaymentStorage(str(data_file), lazy=True)
+    reader = threading.Thread(target=storage.snapshot, name="reader")
+    reader.start()
+    building.wait()
+    storage.save_many([PaymentService(str(tmp_path / "other.json")).create_payment("w", 1.0, PaymentMethod.PAYPAL)])
+    reader.join()
+
+    assert sorted(storage.load_all()) == ["a", "w"]
+    assert sorted(json.loads(data_file.read_text())) == ["a", "w"]
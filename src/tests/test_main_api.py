@@ -0,0 +1,199 @@
+import asyncio
+import importlib
+import json
+import sys
+from fastapi.testclient import TestClient
+
+
+def _client(tmp_path, monkeypatch, **env):
+    """A client of a fresh copy of the app, configured through its environment variables."""
+    monkeypatch.setenv("PAYMENTS_DATA_PATH", str(tmp_path / "payments.json"))
+    for name, value in env.items():
+        monkeypatch.setenv(f"PAYMENTS_{name.upper()}", value)
+    monkeypatch.delitem(sys.modules, "main", raising=False)
+    return TestClient(importlib.import_module("main").app)
+
+
+def _create(client, *payments):
+    for payment_id, amount in payments:
+        response = client.post(f"/payments/{payment_id}", params={"amount": amount, "payment_method": "PAYPAL"})
+        assert response.status_code == 201
+
+
+def _first_sse_frame(app, headers=()):
+    """
+    Status and first frame of the event stream. The stream never ends, so the ASGI
+    app is driven directly and the client disconnects after the first frame.
+    """
+    async def run():
+        messages = []
+        disconnected = asyncio.Event()
+
+        async def receive():
+            await disconnected.wait()
+            return {"type": "http.disconnect"}
+
+        async def send(message):
+            if message["type"] == "http.response.start":
+                messages.append(message["status"])
+            elif message.get("body"):
+                messages.append(message["body"].decode())
+                disconnected.set()
+
+        scope = {"type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1", "method": "GET",
+                 "scheme": "http", "path": "/payments/events/stream", "raw_path": b"/payments/events/stream",
+                 "root_path": "", "query_string": b"", "headers": list(headers),
+                 "server": ("testserver", 80), "client": ("testclient", 50000)}
+        await asyncio.wait_for(app(scope, receive, send), 5)
+        return messages
+
+    return asyncio.run(run())
+
+
+def test_get_payment_honours_if_none_match(tmp_path, monkeypatch):
+    """
+    GET answers 200 with an ETag, 304 for that tag, and 200 again for an old one.
+    """
+    with _client(tmp_path, monkeypatch) as client:
+        _create(client, ("p1", 10.0))
+        first = client.get("/payments/p1")
+        etag = first.headers["ETag"]
+        cached = client.get("/payments/p1", headers={"If-None-Match": etag})
+        client.post("/payments/p1/pay")
+        changed = client.get("/payments/p1", headers={"If-None-Match": etag})
+
+    assert (first.status_code, first.json()["status"]) == (200, "REGISTRADO")
+    assert (cached.status_code, cached.headers["ETag"]) == (304, etag)
+    assert (changed.status_code, changed.json()["status"]) == (200, "PAGADO")
+    assert changed.headers["ETag"] != etag
+
+    with _client(tmp_path, monkeypatch) as client:
+        # The tag does not depend on the process that issued it.
+        restarted = client.get("/payments/p1", headers={"If-None-Match": changed.headers["ETag"]})
+    assert restarted.status_code == 304
+
+
+def test_pages_follow_the_next_cursor_and_ndjson_streams_everything(tmp_path, monkeypatch):
+    """
+    limit pages by id with X-Next-Cursor until the last page; format=ndjson returns every match.
+    """
+    with _client(tmp_path, monkeypatch) as client:
+        _create(client, *((f"p{i}", 10.0 + i) for i in range(5)))
+        pages, cursor = [], None
+        while True:
+            params = {"limit": 2, **({"cursor": cursor} if cursor else {})}
+            response = client.get("/payments", params=params)
+            pages.append([p["payment_id"] for p in response.json()])
+            cursor = response.headers.get("X-Next-Cursor")
+            if cursor is None:
+                break
+        filtered = client.get("/payments", params={"min_amount": 12.0, "limit": 10})
+        ndjson = client.get("/payments", params={"format": "ndjson", "max_amount": 11.0})
+        invalid = client.get("/payments", params={"status": "UNKNOWN", "limit": 10})
+
+    assert pages == [["p0", "p1"], ["p2", "p3"], ["p4"]]
+    assert ([p["payment_id"] for p in filtered.json()], "X-Next-Cursor" in filtered.headers) == (["p2", "p3", "p4"], False)
+    assert ndjson.headers["content-type"] == "application/x-ndjson"
+    assert [json.loads(line)["payment_id"] for line in ndjson.text.splitlines()] == ["p0", "p1"]
+    assert invalid.status_code == 400
+
+
+def test_idempotency_key_replays_the_first_response(tmp_path, monkeypatch):
+    """
+    A retried create or pay with the same key gets the first response; reusing the
+    key for a different request is rejected with 422.
+    """
+    with _client(tmp_path, monkeypatch) as client:
+        params = {"amount": 10.0, "payment_method": "PAYPAL"}
+        first = client.post("/payments/p1", params=params, headers={"Idempotency-Key": "k1"})
+        retried = client.post("/payments/p1", params=params, headers={"Idempotency-Key": "k1"})
+        conflict = client.post("/payments/p1", params={**params, "amount": 20.0}, headers={"Idempotency-Key": "k1"})
+        duplicate = client.post("/payments/p1", params=params)
+        paid = client.post("/payments/p1/pay", headers={"Idempotency-Key": "k2"})
+        paid_again = client.post("/payments/p1/pay", headers={"Idempotency-Key": "k2"})
+
+    assert (first.status_code, retried.status_code, retried.json()) == (201, 201, first.json())
+    assert (conflict.status_code, duplicate.status_code) == (422, 400)
+    assert (paid.status_code, paid_again.status_code) == (200, 200)
+    assert paid_again.json() == paid.json() and paid.json()["status"] == "PAGADO"
+
+
+def test_events_resume_from_cursors_and_reject_foreign_ones(tmp_path, monkeypatch):
+    """
+    Polling returns events with X-Last-Sequence; the SSE feed resumes after
+    Last-Event-ID; cursors of another run answer 410 and malformed ones 400.
+    """
+    with _client(tmp_path, monkeypatch) as client:
+        _create(client, ("p1", 10.0))
+        client.post("/payments/p1/pay")
+        polled = client.get("/payments/events", params={"after": "0"})
+        empty = client.get("/payments/events", params={"after": polled.headers["X-Last-Sequence"]})
+        foreign = client.get("/payments/events", params={"after": "0123456789ab-1"})
+        malformed = client.get("/payments/events", params={"after": "x"})
+        foreign_stream = client.get("/payments/events/stream", params={"after": "0123456789ab-1"})
+        app = client.app
+
+    events = polled.json()
+    assert [e["type"] for e in events] == ["created", "paid"]
+    assert polled.headers["X-Last-Sequence"] == events[-1]["cursor"]
+    assert (empty.json(), empty.headers["X-Last-Sequence"]) == ([], events[-1]["cursor"])
+    assert (foreign.status_code, malformed.status_code, foreign_stream.status_code) == (410, 400, 410)
+
+    status, frame = _first_sse_frame(app, headers=[(b"last-event-id", events[0]["cursor"].encode())])
+    assert status == 200
+    assert frame.startswith(f"id: {events[1]['cursor']}\nevent: paid\ndata: ")
+
+
+def test_async_pay_answers_202_with_the_job_location(tmp_path, monkeypatch):
+    """
+    With PAYMENTS_ASYNC_PAY=1, pay answers 202 and the Location serves the job's outcome.
+    """
+    with _client(tmp_path, monkeypatch, async_pay="1") as client:
+        _create(client, ("p1", 10.0))
+        accepted = client.post("/payments/p1/pay")
+        job = client.get(accepted.headers["Location"], params={"wait": 5}).json()
+        missing = client.post("/payments/missing/pay")
+        queue = client.get("/payments/jobs").json()
+        unknown = client.get("/payments/jobs/unknown")
+
+    assert (accepted.status_code, accepted.json()["state"]) == (202, "queued")
+    assert accepted.headers["Location"] == f"/payments/jobs/{accepted.json()['job_id']}"
+    assert (job["state"], job["status_code"], job["payment"]["status"]) == ("completed", 200, "PAGADO")
+    assert (missing.status_code, unknown.status_code) == (404, 404)
+    assert (queue["queued"], queue["processing"]) == (0, 0)
+
+
+def test_stats_group_amounts_and_validate_buckets(tmp_path, monkeypatch):
+    """
+    Stats aggregate amounts per method and status; a bucket that is not a multiple of 60 is a 400.
+    """
+    with _client(tmp_path, monkeypatch) as client:
+        _create(client, ("p1", 10.0), ("p2", 30.0), ("p3", 20.0))
+        client.post("/payments/p1/pay")
+        stats = client.get("/payments/stats", params={"bucket": 60}).json()
+        invalid = client.get("/payments/stats", params={"bucket": 90})
+
+    groups = {(g["status"], g["count"], g["total"], g["min_amount"], g["max_amount"]) for g in stats["groups"]}
+    assert groups == {("REGISTRADO", 2, 50.0, 20.0, 30.0), ("PAGADO", 1, 10.0, 10.0, 10.0)}
+    assert sum(b["count"] for b in stats["buckets"]) == 4
+    assert invalid.status_code == 400
+
+
+def test_saturated_endpoint_class_is_shed_with_503(tmp_path, monkeypatch):
+    """
+    When the read class has no free slot and no queue, reads get 503 + Retry-After
+    while other classes and unlimited endpoints are still served.
+    """
+    with _client(tmp_path, monkeypatch, admission_read="1,0,0.5") as client:
+        controller = sys.modules["main"].admission_controller
+        asyncio.run(controller.acquire("read"))
+        shed = client.get("/payments")
+        created = client.post("/payments/p1", params={"amount": 10.0, "payment_method": "PAYPAL"})
+        health = client.get("/")
+        controller.release("read")
+        served = client.get("/payments")
+        admission = client.get("/admission").json()
+
+    assert (shed.status_code, shed.headers["Retry-After"]) == (503, "1")
+    assert (created.status_code, health.status_code, served.status_code) == (201, 200, 200)
+    assert (admission["read"]["rejected_queue_full"], admission["read"]["admitted"]) == (1, 2)
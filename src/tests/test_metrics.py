@@ -0,0 +1,42 @@
+from payments import PaymentService, PaymentMethod
+from payments.metrics import COMMITTED, STAGE_SECONDS, VALIDATIONS, MetricsRegistry
+
+
+def test_registry_renders_prometheus_text():
+    """
+    Counters and histograms render with labels, cumulative buckets, sum and count.
+    """
+    registry = MetricsRegistry()
+    counter = registry.counter("demo_total", "Demo counter.", ("kind",))
+    histogram = registry.histogram("demo_seconds", "Demo histogram.", buckets=(0.1, 1.0))
+    counter.inc("a")
+    counter.inc("a", amount=2)
+    histogram.observe(0.05)
+    histogram.observe(0.5)
+    histogram.observe(5)
+
+    text = registry.render()
+    assert "# TYPE demo_total counter" in text
+    assert 'demo_total{kind="a"} 3' in text
+    assert 'demo_seconds_bucket{le="0.1"} 1' in text
+    assert 'demo_seconds_bucket{le="1"} 2' in text
+    assert 'demo_seconds_bucket{le="+Inf"} 3' in text
+    assert "demo_seconds_count 3" in text
+
+
+def test_service_records_validation_and_write_metrics(tmp_path):
+    """
+    Paying records the validation stage and counters by payment method and status.
+    """
+    validations = VALIDATIONS.value("CREDIT_CARD", "PAGADO")
+    committed = COMMITTED.value("CREDIT_CARD", "PAGADO")
+    timed = STAGE_SECONDS.count("validation")
+
+    svc = PaymentService(str(tmp_path / "payments.json"))
+    svc.create_payment("p1", 100.0, PaymentMethod.CREDIT_CARD)
+    svc.pay_payment("p1")
+
+    assert VALIDATIONS.value("CREDIT_CARD", "PAGADO") == validations + 1
+    assert COMMITTED.value("CREDIT_CARD", "PAGADO") == committed + 1
+    assert STAGE_SECONDS.count("validation") == timed + 1
+    assert STAGE_SECONDS.count("serialization") > 0
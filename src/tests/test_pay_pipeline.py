@@ -0,0 +1,162 @@
+import asyncio
+import pytest
+from payments import PaymentService, PaymentMethod, PaymentStatus
+from payments.async_payment_service import AsyncPaymentService
+from payments.metrics import PAY_QUEUE_DEPTH
+from payments.pay_job import PayJobState
+from payments.pay_pipeline import AsyncPayPipeline, PayJobJournal
+from payments.storage import JsonFilePaymentStorage
+
+
+class FlakyStorage(JsonFilePaymentStorage):
+    def __init__(self, data_path, failures=0):
+        super().__init__(data_path)
+        self.failures = failures
+
+    def save_many(self, payments):
+        payments = list(payments)
+        if self.failures and any(p.status != PaymentStatus.REGISTRADO for p in payments):
+            self.failures -= 1
+            raise OSError("disk full")
+        super().save_many(payments)
+
+
+def _pipeline(tmp_path, **kwargs):
+    path = str(tmp_path / "payments.json")
+    svc = AsyncPaymentService(PaymentService(path))
+    return svc, AsyncPayPipeline(svc, path + ".payq", **kwargs)
+
+
+def test_submitted_jobs_are_paid_by_the_workers(tmp_path):
+    """
+    submit returns a queued job at once; the workers set PAGADO/FALLIDO, and
+    duplicate or unknown payments are rejected like the synchronous endpoint.
+    """
+    svc, pipeline = _pipeline(tmp_path, workers=2)
+
+    async def run():
+        await svc.create_payment("ok", 10.0, PaymentMethod.PAYPAL)
+        await svc.create_payment("big", 9000.0, PaymentMethod.PAYPAL)
+        first = await pipeline.submit("ok")
+        assert first.state == PayJobState.QUEUED
+        jobs = [first] + [await pipeline.submit(pid) for pid in ("big", "ok")]
+        with pytest.raises(KeyError):
+            await pipeline.submit("missing")
+        finished = [await pipeline.wait(job.job_id, timeout=5) for job in jobs]
+        stats = pipeline.stats()
+        await pipeline.close()
+        await svc.close()
+        return finished, stats
+
+    finished, stats = asyncio.run(run())
+    assert [j.payment.status for j in finished[:2]] == [PaymentStatus.PAGADO, PaymentStatus.FALLIDO]
+    assert (finished[2].state, finished[2].status_code) == (PayJobState.REJECTED, 400)
+    assert (stats.queued, stats.processing, stats.retained_results) == (0, 0, 3)
+    assert PAY_QUEUE_DEPTH.value("queued") == 0
+
+
+def test_batches_are_decided_in_acceptance_order(tmp_path):
+    """
+    With several batches in flight, the credit card rule still sees earlier jobs
+    decided first: of two registered cards only the second one is paid.
+    """
+    svc, pipeline = _pipeline(tmp_path, workers=4, max_batch_size=1)
+
+    async def run():
+        await svc.create_payment("c1", 10.0, PaymentMethod.CREDIT_CARD)
+        await svc.create_payment("c2", 10.0, PaymentMethod.CREDIT_CARD)
+        jobs = [await pipeline.submit(pid) for pid in ("c1", "c2")]
+        finished = [await pipeline.wait(job.job_id, timeout=5) for job in jobs]
+        await pipeline.close()
+        await svc.close()
+        return finished
+
+    finished = asyncio.run(run())
+    assert [j.payment.status for j in finished] == [PaymentStatus.FALLIDO, PaymentStatus.PAGADO]
+
+
+def test_storage_errors_requeue_the_batch(tmp_path):
+    """
+    A failed write leaves the jobs queued and journaled; they are retried and complete.
+    """
+    path = str(tmp_path / "payments.json")
+    svc = AsyncPaymentService(PaymentService(storage=FlakyStorage(path, failures=1)))
+    pipeline = AsyncPayPipeline(svc, path + ".payq", retry_delay=0.01)
+
+    async def run():
+        await svc.create_payment("p1", 10.0, PaymentMethod.PAYPAL)
+        job = await pipeline.submit("p1")
+        job = await pipeline.wait(job.job_id, timeout=5)
+        await pipeline.close()
+        await svc.close()
+        return job
+
+    job = asyncio.run(run())
+    assert (job.state, job.payment.status) == (PayJobState.COMPLETED, PaymentStatus.PAGADO)
+    assert PayJobJournal(path + ".payq").recover() == []
+
+
+def test_unfinished_jobs_are_replayed_after_a_restart(tmp_path):
+    """
+    Jobs accepted but not processed before shutdown are processed on the next start.
+    """
+    path = str(tmp_path / "payments.json")
+    PaymentService(path).create_payment("p1", 10.0, PaymentMethod.PAYPAL)
+    journal = PayJobJournal(path + ".payq")
+    journal.append_enqueued([("job1", "p1", 1.0)])
+    journal.close()
+
+    svc, pipeline = _pipeline(tmp_path)
+    assert pipeline.stats().queued == 1
+
+    async def run():
+        await pipeline.start()
+        job = await pipeline.wait("job1", timeout=5)
+        await pipeline.close()
+        return job
+
+    job = asyncio.run(run())
+    assert job.state == PayJobState.COMPLETED
+    assert PaymentService(path).storage.get("p1").status == PaymentStatus.PAGADO
+    assert PayJobJournal(path + ".payq").recover() == []
+
+
+def test_replayed_job_reports_an_already_committed_result(tmp_path):
+    """
+    A job whose payment was committed before the crash completes with the current payment.
+    """
+    path = str(tmp_path / "payments.json")
+    svc = PaymentService(path)
+    svc.create_payment("p1", 10.0, PaymentMethod.PAYPAL)
+    svc.pay_payment("p1")
+    journal = PayJobJournal(path + ".payq")
+    journal.append_enqueued([("job1", "p1", 1.0)])
+    journal.close()
+
+    _, pipeline = _pipeline(tmp_path)
+
+    async def run():
+        await pipeline.start()
+        job = await pipeline.wait("job1", timeout=5)
+        await pipeline.close()
+        return job
+
+    job = asyncio.run(run())
+    assert (job.state, job.payment.status) == (PayJobState.COMPLETED, PaymentStatus.PAGADO)
+
+
+def test_journal_ignores_torn_tail_and_compacts(tmp_path):
+    """
+    Replay stops at a torn record; compaction keeps only unfinished jobs.
+    """
+    path = str(tmp_path / "jobs.payq")
+    journal = PayJobJournal(path, compact_threshold=3)
+    journal.append_enqueued([("a", "p1", 1.0), ("b", "p2", 2.0)])
+    journal.append_finished(["a"])
+    with open(path, "rb") as f:
+        assert f.read().count(b"\n") == 1
+    with open(path, "ab") as f:
+        f.write(b"0000 {\"op\":")
+    journal.close()
+
+    assert PayJobJournal(path).recover() == [("b", "p2", 2.0)]
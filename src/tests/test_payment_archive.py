@@ -0,0 +1,130 @@
+import sys
+import threading
+import pytest
+from payments import PaymentFilter, PaymentMethod, PaymentService, PaymentStatus
+from payments.storage import ArchivingPaymentStorage, PaymentArchive, create_payment_storage
+from payments.storage.compact_payment import CompactPayment
+
+
+def _archiving_service(tmp_path, kind="json", segment_size=3):
+    path = str(tmp_path / ("payments.db" if kind == "sqlite" else "payments.json"))
+    hot = create_payment_storage(kind, path)
+    storage = ArchivingPaymentStorage(hot, PaymentArchive(path + ".archive"), segment_size=segment_size)
+    return PaymentService(storage=storage), path
+
+
+@pytest.mark.parametrize("kind", ["json", "wal", "sqlite"])
+def test_settled_payments_move_to_archive_and_stay_readable(tmp_path, kind):
+    """
+    Once segment_size payments are PAGADO they leave the hot backend, but reads,
+    listings and counts still see them.
+    """
+    svc, path = _archiving_service(tmp_path, kind)
+    for i in range(4):
+        svc.create_payment(f"p{i}", 10.0, PaymentMethod.PAYPAL)
+    svc.create_payment("big", 9000.0, PaymentMethod.PAYPAL)
+    svc.pay_payments(["p0", "p1", "big", "p2"])
+
+    assert len(svc.storage.archive) == 3
+    assert {p.payment_id for p in svc.storage.hot.load_all().values()} == {"p3", "big"}
+    assert svc.storage.get("p1").status == PaymentStatus.PAGADO
+    assert [p.payment_id for p in svc.list_payments(limit=10)] == ["big", "p0", "p1", "p2", "p3"]
+    assert [p.payment_id for p in svc.list_payments(PaymentFilter(status=PaymentStatus.PAGADO), after="p0")] == ["p1", "p2"]
+    assert svc.storage.count_by_method_and_status()[(PaymentMethod.PAYPAL, PaymentStatus.PAGADO)] == 3
+    with pytest.raises(ValueError):
+        svc.create_payment("p0", 1.0, PaymentMethod.PAYPAL)
+    with pytest.raises(ValueError):
+        svc.pay_payment("p0")
+    svc.close()
+
+    reopened, _ = _archiving_service(tmp_path, kind)
+    assert len(reopened.load_all_payments()) == 5
+    assert reopened.storage.get("p2").amount == 10.0
+
+
+def test_archive_skips_already_archived_ids_after_a_crash(tmp_path):
+    """
+    Payments archived but not yet deleted from the hot backend are not archived twice
+    and are counted once.
+    """
+    svc, path = _archiving_service(tmp_path, segment_size=100)
+    for i in range(3):
+        svc.create_payment(f"p{i}", 10.0, PaymentMethod.PAYPAL)
+    svc.pay_payments(["p0", "p1"])
+    settled = [p for p in svc.storage.hot.load_all().values() if p.status == PaymentStatus.PAGADO]
+    svc.storage.archive.add_segment(CompactPayment.from_payment(p) for p in settled)
+
+    assert svc.storage.count_by_method_and_status()[(PaymentMethod.PAYPAL, PaymentStatus.PAGADO)] == 2
+    assert len(svc.list_payments(limit=10)) == 3
+    assert svc.storage.archive_settled(min_payments=1) == 2
+    assert len(svc.storage.archive) == 2
+    assert set(svc.storage.hot.load_all()) == {"p2"}
+
+
+def test_archived_aggregates_come_from_the_index(tmp_path):
+    """
+    Amount aggregates of archived payments are read from the index, and payments
+    still in both parts are aggregated once.
+    """
+    svc, path = _archiving_service(tmp_path, segment_size=100)
+    for pid, amount in (("p0", 10.0), ("p1", 30.0), ("p2", 20.0)):
+        svc.create_payment(pid, amount, PaymentMethod.PAYPAL)
+    svc.pay_payments(["p0", "p1"])
+    settled = [p for p in svc.storage.hot.load_all().values() if p.status == PaymentStatus.PAGADO]
+    svc.storage.archive.add_segment(CompactPayment.from_payment(p) for p in settled[:1])
+    svc.storage.archive_settled(min_payments=1)
+    svc.create_payment("p3", 40.0, PaymentMethod.PAYPAL)
+    svc.pay_payment("p3")
+    svc.storage.archive.add_segment([CompactPayment.from_payment(svc.storage.get("p3"))])
+
+    archive = PaymentArchive(path + ".archive")
+    archive._read_segment = None
+    paid = (PaymentMethod.PAYPAL, PaymentStatus.PAGADO)
+    assert tuple(archive.aggregate_by_method_and_status()[paid]) == (3, 80.0, 10.0, 40.0)
+    assert archive.aggregate_by_method_and_status(PaymentFilter(status=PaymentStatus.REGISTRADO)) == {}
+    assert {key: tuple(a) for key, a in svc.storage.aggregate_by_method_and_status().items()} == {
+        paid: (3, 80.0, 10.0, 40.0), (PaymentMethod.PAYPAL, PaymentStatus.REGISTRADO): (1, 20.0, 20.0, 20.0)}
+
+
+def test_reads_run_concurrently_with_archiving(tmp_path):
+    """
+    Lookups and listings from several threads, with a one-segment cache evicting
+    constantly, keep finding every archived payment while new segments are added.
+    """
+    archive = PaymentArchive(str(tmp_path / "archive"), cached_segments=1)
+    # Switch threads as often as possible so unguarded cache updates would interleave.
+    switch_interval = sys.getswitchinterval()
+    sys.setswitchinterval(1e-6)
+
+    def segment(n):
+        return [CompactPayment.from_record(f"s{n:02}-{i:02}", {"amount": 1.0, "payment_method": "PAYPAL",
+                                                                "status": "PAGADO"}) for i in range(20)]
+
+    for n in range(4):
+        archive.add_segment(segment(n))
+    errors = []
+    done = threading.Event()
+
+    def read():
+        try:
+            while not done.is_set():
+                for n in range(4):
+                    assert archive.get(f"s{n:02}-07") is not None
+                assert len(archive.query(PaymentFilter(), None, 100)) >= 80
+        except Exception as e:
+            errors.append(e)
+
+    readers = [threading.Thread(target=read) for _ in range(4)]
+    try:
+        for thread in readers:
+            thread.start()
+        for n in range(4, 24):
+            archive.add_segment(segment(n))
+    finally:
+        done.set()
+        for thread in readers:
+            thread.join()
+        sys.setswitchinterval(switch_interval)
+
+    assert errors == []
+    assert len(archive) == 24 * 20
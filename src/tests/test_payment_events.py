@@ -0,0 +1,83 @@
+import asyncio
+import pytest
+from payments import PaymentService, PaymentMethod
+from payments.async_payment_service import AsyncPaymentService
+from payments.payment_event import PaymentEventType
+from payments.payment_event_log import EventSequenceExpired, PaymentEventLog
+
+
+def test_service_publishes_each_committed_transition(tmp_path):
+    """
+    Create, update, pay, fail and revert each publish one event, in commit order.
+    """
+    svc = PaymentService(str(tmp_path / "payments.json"))
+    svc.create_payment("cc1", 50000.0, PaymentMethod.CREDIT_CARD)
+    svc.create_payment("pp1", 60.0, PaymentMethod.PAYPAL)
+    svc.update_payment("cc1", 55000.0, None)
+    svc.pay_payment("cc1")
+    svc.revert_payment("cc1")
+    svc.pay_payments(["pp1"])
+
+    events = svc.events.read(0)
+    assert [e.sequence for e in events] == [1, 2, 3, 4, 5, 6]
+    assert [e.type for e in events] == [
+        PaymentEventType.CREATED, PaymentEventType.CREATED, PaymentEventType.UPDATED,
+        PaymentEventType.FAILED, PaymentEventType.REVERTED, PaymentEventType.PAID,
+    ]
+    assert events[2].payment.amount == 55000.0
+    assert [e.sequence for e in svc.events.read(4, limit=1)] == [5]
+
+
+def test_read_rejects_positions_outside_the_retained_window(tmp_path):
+    """
+    Consumers behind the retained events, or ahead of the log, must resync.
+    """
+    svc = PaymentService(str(tmp_path / "payments.json"), event_log=PaymentEventLog(capacity=2))
+    for i in range(4):
+        svc.create_payment(f"p{i}", 1.0, PaymentMethod.PAYPAL)
+
+    assert [e.sequence for e in svc.events.read(2)] == [3, 4]
+    assert svc.events.read(4) == []
+    with pytest.raises(EventSequenceExpired):
+        svc.events.read(1)
+    with pytest.raises(EventSequenceExpired):
+        svc.events.read(5)
+
+
+def test_cursors_from_another_log_are_rejected(tmp_path):
+    """
+    A cursor carries the log's epoch, so one from a restarted process cannot resume at an unrelated event.
+    """
+    old_log, new_log = PaymentEventLog(capacity=3), PaymentEventLog(capacity=3)
+    svc = PaymentService(str(tmp_path / "payments.json"), event_log=new_log)
+    for i in range(5):
+        svc.create_payment(f"p{i}", 1.0, PaymentMethod.PAYPAL)
+
+    cursor = new_log.read(2, limit=1)[0].cursor
+    assert new_log.parse_cursor(cursor) == 3
+    assert [e.payment.payment_id for e in new_log.read(new_log.parse_cursor(cursor))] == ["p3", "p4"]
+    assert new_log.parse_cursor("0") == 0
+    with pytest.raises(EventSequenceExpired):
+        new_log.parse_cursor(old_log.cursor(3))
+    with pytest.raises(ValueError):
+        new_log.parse_cursor("3")
+
+
+def test_long_poll_wakes_up_on_async_commit(tmp_path):
+    """
+    A waiting reader returns as soon as a write through the async front-end commits.
+    """
+    svc = AsyncPaymentService(PaymentService(str(tmp_path / "payments.json")))
+
+    async def scenario():
+        waiter = asyncio.create_task(svc.service.events.wait_and_read(0, timeout=5))
+        await asyncio.sleep(0.05)
+        assert not waiter.done()
+        await svc.create_payment("p1", 1.0, PaymentMethod.PAYPAL)
+        events = await asyncio.wait_for(waiter, 1)
+        assert await svc.service.events.wait_and_read(1, timeout=0.05) == []
+        await svc.close()
+        return events
+
+    events = asyncio.run(scenario())
+    assert [(e.sequence, e.type) for e in events] == [(1, PaymentEventType.CREATED)]
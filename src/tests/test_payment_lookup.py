@@ -0,0 +1,67 @@
+import asyncio
+import pytest
+from payments import PaymentService, PaymentMethod, PaymentStatus
+from payments.async_payment_service import AsyncPaymentService
+
+
+def test_version_changes_only_when_the_payment_is_committed(tmp_path):
+    """
+    The version tag moves on every write of that payment and not on writes of others.
+    """
+    svc = PaymentService(str(tmp_path / "payments.json"))
+    svc.create_payment("p1", 10.0, PaymentMethod.PAYPAL)
+    payment, v1 = svc.get_versioned_payment("p1")
+    assert payment.status == PaymentStatus.REGISTRADO
+
+    svc.create_payment("p2", 10.0, PaymentMethod.PAYPAL)
+    assert svc.get_versioned_payment("p1")[1] == v1
+
+    svc.pay_payments(["p1"])
+    payment, v2 = svc.get_versioned_payment("p1")
+    assert (payment.status, v2 != v1) == (PaymentStatus.PAGADO, True)
+    with pytest.raises(KeyError):
+        svc.get_versioned_payment("missing")
+
+
+def test_versions_agree_between_service_instances(tmp_path):
+    """
+    Tags depend only on the payment, so another process or a restart hands out the same one.
+    """
+    path = str(tmp_path / "payments.json")
+    svc = PaymentService(path)
+    svc.create_payment("p1", 10.0, PaymentMethod.PAYPAL)
+    assert PaymentService(path).get_versioned_payment("p1")[1] == svc.get_versioned_payment("p1")[1]
+
+
+def test_async_writes_bump_the_version(tmp_path):
+    """
+    Writes batched by the async front-end are versioned like synchronous ones.
+    """
+    svc = PaymentService(str(tmp_path / "payments.json"))
+    front = AsyncPaymentService(svc)
+
+    async def run():
+        await front.create_payment("p1", 10.0, PaymentMethod.PAYPAL)
+        before = svc.get_versioned_payment("p1")[1]
+        await front.pay_payment("p1")
+        await front.close()
+        return before
+
+    before = asyncio.run(run())
+    assert svc.get_versioned_payment("p1")[1] != before
+
+
+def test_shared_store_invalidates_versions_on_foreign_writes(tmp_path):
+    """
+    With a shared store, a write by another process changes the tags this one hands out.
+    """
+    path = str(tmp_path / "payments.json")
+    first = PaymentService(path, process_lock_path=path + ".lock")
+    second = PaymentService(path, process_lock_path=path + ".lock")
+    first.create_payment("p1", 10.0, PaymentMethod.PAYPAL)
+    _, before = second.get_versioned_payment("p1")
+
+    first.pay_payment("p1")
+    payment, after = second.get_versioned_payment("p1")
+    assert payment.status == PaymentStatus.PAGADO
+    assert after != before
@@ -0,0 +1,44 @@
+import pytest
+from payments import PaymentMethod, PaymentStatus
+from payments.payment_method import lookup_payment_method, parse_payment_method, parse_payment_methods, try_get_payment_method
+from payments.payment_status import lookup_payment_status, parse_payment_status, parse_payment_statuses
+
+
+def test_payment_method_aliases_and_normalization():
+    """
+    Common spellings hit the alias table; other variants are normalized like before.
+    """
+    for raw in ("PAYPAL", "paypal", "PayPal", "credit-card", "Credit Card", "credit_card"):
+        assert lookup_payment_method(raw) is not None
+    assert lookup_payment_method("  cReDiT-cArD ") == PaymentMethod.CREDIT_CARD
+    assert lookup_payment_method(PaymentMethod.PAYPAL) == PaymentMethod.PAYPAL
+    assert lookup_payment_method("bitcoin") is None
+    assert lookup_payment_method(None) is None
+    assert try_get_payment_method("credit card") == (True, PaymentMethod.CREDIT_CARD)
+    assert try_get_payment_method("") == (False, None)
+    with pytest.raises(ValueError):
+        parse_payment_method("bitcoin")
+
+
+def test_payment_status_stays_exact_after_strip():
+    """
+    Status parsing accepts exact values (surrounding spaces allowed) only.
+    """
+    assert lookup_payment_status(" PAGADO ") == PaymentStatus.PAGADO
+    assert lookup_payment_status("pagado") is None
+    with pytest.raises(ValueError, match="empty"):
+        parse_payment_status("   ")
+    with pytest.raises(ValueError, match="invalid"):
+        parse_payment_status("pagado")
+
+
+def test_bulk_parsing_returns_none_for_invalid_entries():
+    """
+    Column parsing keeps positions and marks invalid entries with None.
+    """
+    assert parse_payment_methods(["paypal", "nope", None, "CREDIT-CARD"]) == [
+        PaymentMethod.PAYPAL, None, None, PaymentMethod.CREDIT_CARD,
+    ]
+    assert parse_payment_statuses(["FALLIDO", "", "REGISTRADO "]) == [
+        PaymentStatus.FALLIDO, None, PaymentStatus.REGISTRADO,
+    ]
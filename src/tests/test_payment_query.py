@@ -0,0 +1,48 @@
+import pytest
+from payments import PaymentService, PaymentStatus, PaymentMethod, PaymentFilter
+from payments.storage import create_payment_storage
+
+
+@pytest.fixture(params=["json", "wal", "sqlite"])
+def service(request, tmp_path):
+    svc = PaymentService(storage=create_payment_storage(request.param, str(tmp_path / "payments.data")))
+    svc.create_payments([
+        (f"p{i:02d}", float(i), PaymentMethod.PAYPAL if i % 2 else PaymentMethod.CREDIT_CARD)
+        for i in range(30)
+    ])
+    svc.pay_payments(["p01", "p03"])
+    return svc
+
+
+def test_pages_follow_the_cursor_without_gaps(service):
+    """
+    Walking pages with the last id as cursor returns every payment once, in id order.
+    """
+    seen, after = [], None
+    while True:
+        page = service.list_payments(after=after, limit=7)
+        seen.extend(p.payment_id for p in page)
+        if len(page) < 7:
+            break
+        after = page[-1].payment_id
+    assert seen == [f"p{i:02d}" for i in range(30)]
+
+
+def test_filters_by_status_method_and_amount(service):
+    """
+    list_payments applies status, method and amount range filters.
+    """
+    paid = service.list_payments(PaymentFilter(status=PaymentStatus.PAGADO))
+    assert [p.payment_id for p in paid] == ["p01", "p03"]
+
+    ranged = service.list_payments(PaymentFilter(payment_method=PaymentMethod.CREDIT_CARD, min_amount=10, max_amount=14))
+    assert [p.payment_id for p in ranged] == ["p10", "p12", "p14"]
+
+
+def test_new_ids_are_listed_in_order(service):
+    """
+    Payments created after startup are found at their sorted position.
+    """
+    service.create_payment("p15a", 1.0, PaymentMethod.PAYPAL)
+    page = service.list_payments(after="p15", limit=2)
+    assert [p.payment_id for p in page] == ["p15a", "p16"]
@@ -0,0 +1,138 @@
+import asyncio
+import threading
+import pytest
+from payments import Payment, PaymentMethod, PaymentService, PaymentStatus
+from payments.async_payment_service import AsyncPaymentService
+from payments.payment_rollups import PaymentActivity
+from payments.payment_stats import aggregate_amounts
+from payments.storage import JsonFilePaymentStorage, create_payment_storage
+
+
+class FailingStorage(JsonFilePaymentStorage):
+    fail = False
+
+    def save_many(self, payments):
+        if self.fail:
+            raise OSError("disk full")
+        super().save_many(payments)
+
+
+class BlockingStorage(JsonFilePaymentStorage):
+    """Holds save_many until released, once blocked."""
+    def __init__(self, data_path):
+        super().__init__(data_path)
+        self.blocked = False
+        self.entered = threading.Event()
+        self.release = threading.Event()
+
+    def save_many(self, payments):
+        payments = list(payments)
+        if self.blocked:
+            self.entered.set()
+            self.release.wait(5)
+        super().save_many(payments)
+
+
+def _groups(stats):
+    return {(g.payment_method, g.status): (g.count, g.total, g.min_amount, g.max_amount) for g in stats.groups}
+
+
+def test_rollups_follow_every_transition(tmp_path):
+    """
+    Create, update, pay and revert keep the aggregates equal to a full rescan.
+    """
+    svc = PaymentService(str(tmp_path / "payments.json"))
+    svc.create_payment("a", 10.0, PaymentMethod.PAYPAL)
+    svc.create_payment("b", 30.0, PaymentMethod.PAYPAL)
+    svc.create_payment("c", 9000.0, PaymentMethod.PAYPAL)
+    svc.update_payment("b", 20.0, None)
+    svc.pay_payments(["a", "c"])
+    svc.revert_payment("c")
+
+    assert _groups(svc.stats()) == {
+        (PaymentMethod.PAYPAL, PaymentStatus.REGISTRADO): (2, 9020.0, 20.0, 9000.0),
+        (PaymentMethod.PAYPAL, PaymentStatus.PAGADO): (1, 10.0, 10.0, 10.0),
+    }
+    rescanned = aggregate_amounts(svc.load_all_payments().values())
+    assert _groups(svc.stats()) == {key: tuple(aggregate) for key, aggregate in rescanned.items()}
+
+
+@pytest.mark.parametrize("kind", ["json", "sqlite"])
+def test_removing_the_minimum_rereads_the_group_bounds(tmp_path, kind):
+    """
+    Rollups start from the storage aggregates; paying the smallest payment of a
+    group reads that group's bounds again, including amounts staged since.
+    """
+    path = str(tmp_path / ("payments.db" if kind == "sqlite" else "payments.json"))
+    svc = PaymentService(storage=create_payment_storage(kind, path))
+    for pid, amount in (("a", 5.0), ("b", 20.0), ("c", 30.0)):
+        svc.create_payment(pid, amount, PaymentMethod.PAYPAL)
+
+    svc = PaymentService(storage=svc.storage)
+    svc.pay_payment("a")
+    svc.create_payment("d", 7.0, PaymentMethod.PAYPAL)
+    assert _groups(svc.stats()) == {
+        (PaymentMethod.PAYPAL, PaymentStatus.REGISTRADO): (3, 57.0, 7.0, 30.0),
+        (PaymentMethod.PAYPAL, PaymentStatus.PAGADO): (1, 5.0, 5.0, 5.0),
+    }
+
+
+def test_bounds_read_during_an_async_flush_are_not_kept(tmp_path):
+    """
+    Stats read while the update removing a group's minimum is still being written
+    do not pin the old minimum once the write completes.
+    """
+    storage = BlockingStorage(str(tmp_path / "payments.json"))
+    svc = PaymentService(storage=storage)
+    front = AsyncPaymentService(svc)
+
+    async def run():
+        await front.create_payment("a", 5.0, PaymentMethod.PAYPAL)
+        await front.create_payment("b", 50.0, PaymentMethod.PAYPAL)
+        storage.blocked = True
+        update = asyncio.ensure_future(front.update_payment("a", 100.0, None))
+        await asyncio.to_thread(storage.entered.wait, 5)
+        svc.stats()
+        storage.release.set()
+        await update
+        await front.close()
+
+    asyncio.run(run())
+    assert _groups(svc.stats())[(PaymentMethod.PAYPAL, PaymentStatus.REGISTRADO)] == (2, 150.0, 50.0, 100.0)
+
+
+def test_failed_write_rolls_the_aggregates_back(tmp_path):
+    """
+    A transition that fails to persist leaves the rollups as they were.
+    """
+    storage = FailingStorage(str(tmp_path / "payments.json"))
+    svc = PaymentService(storage=storage)
+    svc.create_payment("a", 10.0, PaymentMethod.PAYPAL)
+    before = _groups(svc.stats())
+
+    storage.fail = True
+    with pytest.raises(OSError):
+        svc.pay_payment("a")
+    assert _groups(svc.stats()) == before
+
+
+def test_activity_buckets_merge_into_coarser_buckets():
+    """
+    Status transitions are bucketed by commit time; updates without a status change are ignored.
+    """
+    now = [3600.0]
+    activity = PaymentActivity(clock=lambda: now[0])
+    created = Payment(payment_id="a", amount=5.0, payment_method=PaymentMethod.PAYPAL, status=PaymentStatus.REGISTRADO)
+    paid = created.model_copy(update={"status": PaymentStatus.PAGADO})
+    activity.record([(created, None)])
+    now[0] += 90
+    activity.record([(paid, created), (created.model_copy(update={"amount": 6.0}), created)])
+
+    per_minute = [(b.start, b.status, b.count) for b in activity.buckets(60)]
+    assert per_minute == [(3600.0, PaymentStatus.REGISTRADO, 1), (3660.0, PaymentStatus.PAGADO, 1)]
+    hourly = activity.buckets(3600)
+    assert [(b.start, b.status, b.total) for b in hourly] == [
+        (3600.0, PaymentStatus.PAGADO, 5.0), (3600.0, PaymentStatus.REGISTRADO, 5.0)]
+    assert [b.status for b in activity.buckets(60, since=3660)] == [PaymentStatus.PAGADO]
+    with pytest.raises(ValueError):
+        activity.buckets(90)
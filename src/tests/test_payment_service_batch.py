@@ -0,0 +1,70 @@
+import asyncio
+from payments import PaymentService, PaymentStatus, PaymentMethod
+from payments.async_payment_service import AsyncPaymentService
+from payments.storage import JsonFilePaymentStorage
+
+
+class CountingStorage(JsonFilePaymentStorage):
+    def __init__(self, data_path):
+        super().__init__(data_path)
+        self.batches = []
+
+    def save_many(self, payments):
+        payments = list(payments)
+        self.batches.append(len(payments))
+        super().save_many(payments)
+
+
+def test_create_payments_reports_each_item_and_writes_once(tmp_path):
+    """
+    create_payments returns a result per item and persists valid ones in one write.
+    """
+    storage = CountingStorage(str(tmp_path / "payments.json"))
+    svc = PaymentService(storage=storage)
+    svc.create_payment("old", 1.0, PaymentMethod.PAYPAL)
+
+    results = svc.create_payments([
+        ("p1", 10.0, "paypal"),
+        ("p1", 20.0, "paypal"),
+        ("old", 5.0, "paypal"),
+        ("p2", 30.0, "bitcoin"),
+        ("p3", 40.0, PaymentMethod.CREDIT_CARD),
+    ])
+
+    assert [type(r).__name__ for r in results] == ["Payment", "ValueError", "ValueError", "ValueError", "Payment"]
+    assert storage.batches == [1, 2]
+    assert set(PaymentService(str(tmp_path / "payments.json")).load_all_payments()) == {"old", "p1", "p3"}
+
+
+def test_pay_payments_applies_items_in_order(tmp_path):
+    """
+    pay_payments validates each item against the counts left by the previous ones.
+    """
+    svc = PaymentService(str(tmp_path / "payments.json"))
+    svc.create_payments([("c1", 10.0, "credit_card"), ("c2", 10.0, "credit_card")])
+
+    results = svc.pay_payments(["c1", "c2", "c2", "missing"])
+
+    assert results[0].status == PaymentStatus.FALLIDO
+    assert results[1].status == PaymentStatus.PAGADO
+    assert isinstance(results[2], ValueError)
+    assert isinstance(results[3], KeyError)
+    assert svc.status_counts.count(PaymentMethod.CREDIT_CARD, PaymentStatus.REGISTRADO) == 0
+
+
+def test_async_batches_are_flushed_together(tmp_path):
+    """
+    The async batch API persists each batch with a single storage write.
+    """
+    storage = CountingStorage(str(tmp_path / "payments.json"))
+    svc = AsyncPaymentService(PaymentService(storage=storage))
+
+    async def run():
+        created = await svc.create_payments([(f"p{i}", 10.0, "paypal") for i in range(1000)])
+        paid = await svc.pay_payments([f"p{i}" for i in range(1000)])
+        await svc.close()
+        return created, paid
+
+    created, paid = asyncio.run(run())
+    assert all(p.status == PaymentStatus.PAGADO for p in paid)
+    assert storage.batches == [1000, 1000]
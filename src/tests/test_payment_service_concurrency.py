@@ -0,0 +1,41 @@
+from concurrent.futures import ThreadPoolExecutor
+from payments import PaymentService, PaymentStatus, PaymentMethod, PaymentStatusCounts
+
+
+def test_concurrent_creates_and_pays_are_all_committed(tmp_path):
+    """
+    Creating and paying distinct payments from many threads loses no writes.
+    """
+    svc = PaymentService(str(tmp_path / "payments.json"))
+
+    def create_and_pay(i):
+        svc.create_payment(f"p{i}", 10.0, PaymentMethod.PAYPAL)
+        return svc.pay_payment(f"p{i}").status
+
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        statuses = list(pool.map(create_and_pay, range(40)))
+
+    assert statuses == [PaymentStatus.PAGADO] * 40
+    reloaded = PaymentService(str(tmp_path / "payments.json")).load_all_payments()
+    assert len(reloaded) == 40
+    assert svc.status_counts.as_dict() == PaymentStatusCounts.from_payments(reloaded.values()).as_dict()
+    assert len(svc._payment_locks) == 0
+
+
+def test_concurrent_duplicate_create_succeeds_once(tmp_path):
+    """
+    Only one of several concurrent creates with the same id succeeds.
+    """
+    svc = PaymentService(str(tmp_path / "payments.json"))
+
+    def create(_):
+        try:
+            svc.create_payment("same", 10.0, PaymentMethod.PAYPAL)
+            return True
+        except ValueError:
+            return False
+
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        results = list(pool.map(create, range(16)))
+
+    assert results.count(True) == 1
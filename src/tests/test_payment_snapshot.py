@@ -0,0 +1,86 @@
+import pytest
+from payments import PaymentFilter, PaymentMethod, PaymentService, PaymentStatus
+from payments.storage import PaymentSnapshot, create_payment_storage
+from payments.storage.compact_payment import CompactPayment
+
+
+def _record(pid, status=PaymentStatus.REGISTRADO):
+    return CompactPayment.from_record(pid, {"amount": 1.0, "payment_method": "PAYPAL", "status": status.value})
+
+
+def test_new_versions_share_untouched_shards():
+    """
+    with_changes leaves the original untouched and reuses every shard it did not modify.
+    """
+    base = PaymentSnapshot.from_records({f"p{i}": _record(f"p{i}") for i in range(1000)})
+    updated = base.with_changes([_record("p1", status=PaymentStatus.PAGADO)])
+
+    assert (base.version, updated.version) == (0, 1)
+    assert base.get("p1").status == PaymentStatus.REGISTRADO
+    assert updated.get("p1").status == PaymentStatus.PAGADO
+    assert updated.sorted_ids is base.sorted_ids
+    shared = sum(a is b for a, b in zip(base._shards, updated._shards))
+    assert shared == len(base._shards) - 1
+
+
+def test_inserts_and_deletes_keep_ids_sorted():
+    """
+    Added and removed ids are reflected in a new id list; the old one is not modified.
+    """
+    base = PaymentSnapshot.from_records({pid: _record(pid) for pid in ("b", "d")})
+    updated = base.with_changes([_record("c"), _record("a")], deletes=["d", "missing"])
+
+    assert list(base.sorted_ids) == ["b", "d"]
+    assert list(updated.sorted_ids) == ["a", "b", "c"]
+    assert len(updated) == 3 and "d" not in updated
+    assert [r.payment_id for r in updated.query(PaymentFilter(), after="a", limit=1)] == ["b"]
+
+
+def test_inserts_copy_only_the_affected_id_chunk():
+    """
+    Adding an id copies one chunk of the sorted id list and shares the others.
+    """
+    base = PaymentSnapshot.from_records({f"p{i:05}": _record(f"p{i:05}") for i in range(10000)})
+    updated = base.with_changes([_record("p00001a")])
+
+    chunks = list(zip(base.sorted_ids._chunks, updated.sorted_ids._chunks))
+    assert sum(a is not b for a, b in chunks) == 1
+    assert list(updated.sorted_ids)[:3] == ["p00000", "p00001", "p00001a"]
+
+
+def test_filtered_queries_follow_status_and_method_changes():
+    """
+    The status and method indexes stay in step with updates, so filtered pages equal a full scan.
+    """
+    snapshot = PaymentSnapshot.from_records({f"p{i:02d}": _record(f"p{i:02d}") for i in range(40)})
+    snapshot = snapshot.with_changes(
+        [_record(f"p{i:02d}", status=PaymentStatus.PAGADO) for i in range(0, 40, 3)] + [
+            CompactPayment.from_record("p05", {"amount": 7.0, "payment_method": "CREDIT_CARD", "status": "FALLIDO"})],
+        deletes=["p03", "p06"])
+    snapshot = snapshot.with_changes([_record("p09"), _record("p41", status=PaymentStatus.PAGADO)])
+
+    for payment_filter in (PaymentFilter(status=PaymentStatus.PAGADO),
+                           PaymentFilter(status=PaymentStatus.FALLIDO, payment_method=PaymentMethod.CREDIT_CARD),
+                           PaymentFilter(payment_method=PaymentMethod.PAYPAL, max_amount=1.0)):
+        scanned = [pid for pid, r in snapshot.items() if payment_filter.matches(r)]
+        assert [r.payment_id for r in snapshot.query(payment_filter, limit=100)] == scanned
+        assert [r.payment_id for r in snapshot.query(payment_filter, after=scanned[0], limit=3)] == scanned[1:4]
+    assert len(snapshot._candidates(PaymentFilter(status=PaymentStatus.FALLIDO))) == 1
+
+
+@pytest.mark.parametrize("kind", ["json", "wal", "binary"])
+def test_service_snapshot_is_isolated_from_later_writes(tmp_path, kind):
+    """
+    A snapshot taken by a reader keeps showing the state it was taken at.
+    """
+    svc = PaymentService(storage=create_payment_storage(kind, str(tmp_path / "payments.data")))
+    svc.create_payment("p1", 10.0, PaymentMethod.PAYPAL)
+    before = svc.snapshot()
+
+    svc.pay_payment("p1")
+    svc.create_payment("p2", 10.0, PaymentMethod.PAYPAL)
+
+    assert [(pid, r.status) for pid, r in before.items()] == [("p1", PaymentStatus.REGISTRADO)]
+    after = svc.snapshot()
+    assert after.version > before.version
+    assert [(pid, r.status) for pid, r in after.items()] == [("p1", PaymentStatus.PAGADO), ("p2", PaymentStatus.REGISTRADO)]
@@ -0,0 +1,54 @@
+from payments import PaymentService, PaymentStatus, PaymentMethod, PaymentStatusCounts
+from payments.validation_strategies import CreditCardValidationStrategy
+
+
+class MockPayment:
+    def __init__(self, amount, payment_method, status):
+        self.amount = amount
+        self.payment_method = payment_method
+        self.status = status
+
+
+def test_from_payments_and_move():
+    """
+    Counts built from a list follow transitions applied with move.
+    """
+    counts = PaymentStatusCounts.from_payments([
+        MockPayment(1, PaymentMethod.PAYPAL, PaymentStatus.REGISTRADO),
+        MockPayment(2, PaymentMethod.PAYPAL, PaymentStatus.REGISTRADO),
+    ])
+    assert counts.count(PaymentMethod.PAYPAL, PaymentStatus.REGISTRADO) == 2
+
+    counts.move((PaymentMethod.PAYPAL, PaymentStatus.REGISTRADO), MockPayment(1, PaymentMethod.PAYPAL, PaymentStatus.PAGADO))
+    assert counts.count(PaymentMethod.PAYPAL, PaymentStatus.REGISTRADO) == 1
+    assert counts.count(PaymentMethod.PAYPAL, PaymentStatus.PAGADO) == 1
+
+
+def test_creditcard_strategy_accepts_counts_index():
+    """
+    CreditCardValidationStrategy queries the counts index instead of a list.
+    """
+    strategy = CreditCardValidationStrategy()
+    payment = MockPayment(5000, PaymentMethod.CREDIT_CARD, PaymentStatus.REGISTRADO)
+    counts = PaymentStatusCounts({(PaymentMethod.CREDIT_CARD, PaymentStatus.REGISTRADO): 1})
+    assert strategy.validate(payment, counts)
+    counts.add(PaymentMethod.CREDIT_CARD, PaymentStatus.REGISTRADO)
+    assert not strategy.validate(payment, counts)
+
+
+def test_service_keeps_counts_in_sync(tmp_path):
+    """
+    PaymentService updates its counts on create, update, pay and revert.
+    """
+    svc = PaymentService(str(tmp_path / "payments.json"))
+    svc.create_payment("c1", 100.0, PaymentMethod.CREDIT_CARD)
+    svc.create_payment("c2", 20000.0, PaymentMethod.CREDIT_CARD)
+    svc.update_payment("c2", None, PaymentMethod.PAYPAL)
+
+    assert svc.pay_payment("c1").status == PaymentStatus.PAGADO
+    assert svc.pay_payment("c2").status == PaymentStatus.FALLIDO
+    svc.revert_payment("c2")
+
+    expected = PaymentStatusCounts.from_payments(svc.load_all_payments().values())
+    assert svc.status_counts.as_dict() == expected.as_dict()
+    assert PaymentService(str(tmp_path / "payments.json")).status_counts.as_dict() == expected.as_dict()
@@ -0,0 +1,50 @@
+import multiprocessing
+import pytest
+from payments import PaymentService, PaymentStatus, PaymentMethod
+from payments.storage import create_payment_storage
+
+
+def make_service(kind, data_path):
+    return PaymentService(storage=create_payment_storage(kind, data_path), process_lock_path=data_path + ".lock")
+
+
+@pytest.mark.parametrize("kind", ["json", "wal", "sqlite"])
+def test_services_see_each_other_writes(tmp_path, kind):
+    """
+    Two services sharing a store pick up each other's writes and counts.
+    """
+    data_path = str(tmp_path / "payments.data")
+    first = make_service(kind, data_path)
+    second = make_service(kind, data_path)
+
+    first.create_payment("c1", 100.0, PaymentMethod.CREDIT_CARD)
+    assert "c1" in second.load_all_payments()
+
+    assert second.pay_payment("c1").status == PaymentStatus.PAGADO
+    assert first.load_all_payments()["c1"].status == PaymentStatus.PAGADO
+    assert first.status_counts.count(PaymentMethod.CREDIT_CARD, PaymentStatus.PAGADO) == 1
+    with pytest.raises(ValueError):
+        first.create_payment("c1", 5.0, PaymentMethod.PAYPAL)
+
+
+def _create_many(kind, data_path, worker):
+    svc = make_service(kind, data_path)
+    for i in range(20):
+        svc.create_payment(f"w{worker}-{i}", 1.0, PaymentMethod.PAYPAL)
+    svc.close()
+
+
+@pytest.mark.parametrize("kind", ["json", "wal"])
+def test_concurrent_processes_do_not_lose_writes(tmp_path, kind):
+    """
+    Several processes writing to the same file keep every payment.
+    """
+    data_path = str(tmp_path / "payments.data")
+    ctx = multiprocessing.get_context("fork")
+    workers = [ctx.Process(target=_create_many, args=(kind, data_path, w)) for w in range(4)]
+    for p in workers:
+        p.start()
+    for p in workers:
+        p.join(timeout=30)
+
+    assert len(make_service(kind, data_path).load_all_payments()) == 80
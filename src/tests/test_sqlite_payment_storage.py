@@ -0,0 +1,55 @@
+import pytest
+from payments import Payment, PaymentService, PaymentStatus, PaymentMethod
+from payments.storage import SQLitePaymentStorage, create_payment_storage
+
+
+def test_save_and_get_roundtrip(tmp_path):
+    """
+    A saved payment is returned by get, contains and load_all.
+    """
+    storage = SQLitePaymentStorage(str(tmp_path / "payments.db"))
+    storage.save(Payment(payment_id="p1", amount=10.0, payment_method=PaymentMethod.PAYPAL, status=PaymentStatus.REGISTRADO))
+
+    assert storage.contains("p1")
+    assert not storage.contains("p2")
+    assert storage.get("p1").payment_method == PaymentMethod.PAYPAL
+    assert list(storage.load_all()) == ["p1"]
+    assert storage.get("p2") is None
+
+
+def test_database_uses_wal_and_indexes(tmp_path):
+    """
+    The database runs in WAL journal mode, synchronous=FULL unless asked otherwise,
+    with indexes on status and payment_method.
+    """
+    storage = SQLitePaymentStorage(str(tmp_path / "payments.db"))
+    assert storage._conn.execute("PRAGMA journal_mode").fetchone()[0] == "wal"
+    assert storage._conn.execute("PRAGMA synchronous").fetchone()[0] == 2
+    relaxed = SQLitePaymentStorage(str(tmp_path / "payments.db"), synchronous="NORMAL")
+    assert relaxed._conn.execute("PRAGMA synchronous").fetchone()[0] == 1
+    with pytest.raises(ValueError):
+        SQLitePaymentStorage(str(tmp_path / "payments.db"), synchronous="OFF; DROP TABLE payments")
+    indexes = {row[1] for row in storage._conn.execute("PRAGMA index_list(payments)")}
+    assert {"idx_payments_status", "idx_payments_payment_method"} <= indexes
+
+
+def test_service_on_sqlite_persists_transitions(tmp_path):
+    """
+    PaymentService delegates to SQLite and the state survives reopening the database.
+    """
+    db_path = str(tmp_path / "payments.db")
+    svc = PaymentService(storage=SQLitePaymentStorage(db_path))
+    svc.create_payment("p1", 100.0, "paypal")
+    svc.pay_payment("p1")
+    svc.close()
+
+    reopened = SQLitePaymentStorage(db_path)
+    assert reopened.get("p1").status == PaymentStatus.PAGADO
+
+
+def test_factory_rejects_unknown_backend(tmp_path):
+    """
+    create_payment_storage raises ValueError for unknown backend names.
+    """
+    with pytest.raises(ValueError):
+        create_payment_storage("mongo", str(tmp_path / "x"))
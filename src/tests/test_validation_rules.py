@@ -0,0 +1,71 @@
+import json
+import pytest
+from payments import PaymentService, PaymentStatus, PaymentMethod, PaymentStatusCounts
+from payments.validation_strategies import PaymentMethodValidationStrategyFactory, PayPalValidationStrategy
+from payments.validation_strategies.validation_rules import compile_rules
+
+
+class MockPayment:
+    def __init__(self, payment_id, amount, payment_method, status=PaymentStatus.REGISTRADO):
+        self.payment_id = payment_id
+        self.amount = amount
+        self.payment_method = payment_method
+        self.status = status
+
+
+def test_compiled_rules_evaluate_batch_column_wise():
+    """
+    Amount rules are evaluated for a whole batch; count rules per payment.
+    """
+    rules = compile_rules([
+        {"rule": "min_amount", "limit": 10},
+        {"rule": "max_amount", "limit": 100},
+        {"rule": "registered_count", "equals": 1},
+    ])
+    batch = [MockPayment(str(i), a, PaymentMethod.PAYPAL) for i, a in enumerate([5, 10, 99.9, 100])]
+    assert rules.check_columns(batch) == [False, True, True, False]
+
+    counts = PaymentStatusCounts({(PaymentMethod.PAYPAL, PaymentStatus.REGISTRADO): 2})
+    assert rules.check_stateful(batch[1], counts) is False
+
+
+def test_compile_rules_rejects_unknown_rule_and_missing_parameters():
+    """
+    Invalid configs fail when compiled, not when validating.
+    """
+    with pytest.raises(ValueError):
+        compile_rules([{"rule": "max_velocity", "limit": 3}])
+    with pytest.raises(ValueError):
+        compile_rules([{"rule": "max_amount"}])
+
+
+def test_factory_rules_from_file_override_defaults(tmp_path):
+    """
+    Rules loaded from a file replace the limits of the listed methods only.
+    """
+    rules_path = tmp_path / "rules.json"
+    rules_path.write_text(json.dumps({"PAYPAL": [{"rule": "max_amount", "limit": 100}]}))
+    factory = PaymentMethodValidationStrategyFactory.from_file(str(rules_path))
+
+    paypal = factory.get(PaymentMethod.PAYPAL)
+    assert isinstance(paypal, PayPalValidationStrategy)
+    assert paypal.validate_batch([MockPayment("a", 50, "PAYPAL"), MockPayment("b", 150, "PAYPAL")], []) == [True, False]
+    assert factory.get(PaymentMethod.CREDIT_CARD).rules[0] == {"rule": "max_amount", "limit": 10000}
+
+
+def test_pay_payments_matches_single_pays_with_batch_rules(tmp_path):
+    """
+    Bulk pay gives the same outcomes as paying one by one, and validate_payments is a dry run.
+    """
+    items = [("cc1", 50.0, "credit_card"), ("cc2", 60.0, "credit_card"), ("pp1", 6000.0, "paypal"), ("pp2", 10.0, "paypal")]
+    single = PaymentService(str(tmp_path / "single.json"))
+    bulk = PaymentService(str(tmp_path / "bulk.json"))
+    single.create_payments(items)
+    bulk.create_payments(items)
+
+    assert bulk.validate_payments([bulk.storage.get(pid) for pid, _, _ in items]) == [False, False, False, True]
+    assert bulk.storage.get("pp2").status == PaymentStatus.REGISTRADO
+
+    expected = [single.pay_payment(pid).status for pid, _, _ in items]
+    assert [p.status for p in bulk.pay_payments([pid for pid, _, _ in items])] == expected
+    assert expected == [PaymentStatus.FALLIDO, PaymentStatus.PAGADO, PaymentStatus.FALLIDO, PaymentStatus.PAGADO]
@@ -0,0 +1,104 @@
+import json
+from payments import PaymentFilter, PaymentService, PaymentStatus, PaymentMethod
+from payments.storage import WriteAheadLog, WriteAheadLogPaymentStorage
+
+
+def test_recover_replays_log_over_snapshot(tmp_path):
+    """
+    Records appended to the log are applied on top of the snapshot on recovery.
+    """
+    snapshot = tmp_path / "payments.json"
+    snapshot.write_text(json.dumps({"p1": {"amount": 1.0, "payment_method": "PAYPAL", "status": "REGISTRADO"}}))
+    wal = WriteAheadLog(str(snapshot))
+    wal.append("p1", {"amount": 2.0, "payment_method": "PAYPAL", "status": "PAGADO"})
+    wal.append("p2", {"amount": 3.0, "payment_method": "CREDIT_CARD", "status": "REGISTRADO"})
+    wal.close()
+
+    state = WriteAheadLog(str(snapshot)).recover()
+    assert state["p1"]["status"] == "PAGADO"
+    assert state["p2"]["amount"] == 3.0
+
+
+def test_recover_drops_torn_tail(tmp_path):
+    """
+    A partially written last record (crash mid-append) is ignored and cut off by the next append.
+    """
+    snapshot = tmp_path / "payments.json"
+    wal = WriteAheadLog(str(snapshot))
+    wal.append("p1", {"amount": 1.0, "payment_method": "PAYPAL", "status": "REGISTRADO"})
+    wal.close()
+    with open(tmp_path / "payments.json.wal", "ab") as f:
+        f.write(b'0badc0de {"op":"put","payment_id":"p2"')
+
+    wal = WriteAheadLog(str(snapshot))
+    assert list(wal.recover()) == ["p1"]
+    wal.append("p3", {"amount": 3.0, "payment_method": "PAYPAL", "status": "REGISTRADO"})
+    wal.close()
+    assert list(WriteAheadLog(str(snapshot)).recover()) == ["p1", "p3"]
+
+
+def test_compaction_writes_snapshot_and_truncates_log(tmp_path):
+    """
+    Once the threshold is reached, compaction rewrites the snapshot and empties the log.
+    """
+    snapshot = tmp_path / "payments.json"
+    wal = WriteAheadLog(str(snapshot), compact_threshold=2)
+    data = {"amount": 1.0, "payment_method": "PAYPAL", "status": "REGISTRADO"}
+    wal.append("p1", data)
+    wal.append("p2", data)
+    assert wal.needs_compaction
+    wal.compact({"p1": data, "p2": data})
+
+    assert not wal.needs_compaction
+    assert json.loads(snapshot.read_text()) == {"p1": data, "p2": data}
+    assert (tmp_path / "payments.json.wal").stat().st_size == 0
+
+
+def test_service_with_write_ahead_log_survives_restart(tmp_path):
+    """
+    A PaymentService using the log reloads its mutations after a restart.
+    """
+    data_file = tmp_path / "payments.json"
+    svc = PaymentService(storage=WriteAheadLogPaymentStorage(str(data_file)))
+    svc.create_payment("p1", 100.0, PaymentMethod.PAYPAL)
+    svc.pay_payment("p1")
+    svc.close()
+
+    reloaded = PaymentService(storage=WriteAheadLogPaymentStorage(str(data_file)))
+    assert reloaded.load_all_payments()["p1"].status == PaymentStatus.PAGADO
+
+
+def test_every_append_is_synced_before_returning(tmp_path, monkeypatch):
+    """
+    Each append_many call is fsynced once, so nothing acknowledged is left pending.
+    """
+    import payments.storage.write_ahead_log as write_ahead_log
+    synced = []
+    real_fsync = write_ahead_log.os.fsync
+    monkeypatch.setattr(write_ahead_log.os, "fsync", lambda fd: synced.append(fd) or real_fsync(fd))
+    wal = WriteAheadLog(str(tmp_path / "payments.json"))
+    data = {"amount": 1.0, "payment_method": "PAYPAL", "status": "REGISTRADO"}
+    for i in range(5):
+        wal.append(f"p{i}", data)
+    wal.append_many([("p5", data), ("p6", data)])
+    assert len(synced) == 6
+
+
+def test_lazy_restart_keeps_deletes_of_snapshot_payments(tmp_path):
+    """
+    Deleting a payment already in the compacted snapshot survives a lazy restart, as it does an eager one.
+    """
+    data_file = str(tmp_path / "payments.json")
+    storage = WriteAheadLogPaymentStorage(data_file, compact_threshold=3)
+    svc = PaymentService(storage=storage)
+    for i in range(3):
+        svc.create_payment(f"p{i}", 1.0, PaymentMethod.PAYPAL)
+    storage.delete_many(["p1"])
+    storage.close()
+
+    eager = WriteAheadLogPaymentStorage(data_file)
+    lazy = WriteAheadLogPaymentStorage(data_file, lazy=True)
+    assert sorted(eager.load_all()) == ["p0", "p2"]
+    assert not lazy.contains("p1")
+    assert [p.payment_id for p in lazy.query(PaymentFilter())] == ["p0", "p2"]
+    assert sorted(lazy.load_all()) == ["p0", "p2"]